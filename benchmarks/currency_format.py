@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""Measures the throughput of formatting currency values, comparing a
+copy of currency.format() from before CurrencyFormatter, the current
+currency.format() and the converter with a CurrencyFormatter reused for
+all the values
+
+Usage: python benchmarks/currency_format.py [values]
+"""
+
+import decimal
+import locale
+import random
+import sys
+import time
+
+from kiwi.currency import currency, get_currency_formatter
+from kiwi.datatypes import converter
+
+
+# currency.format() and get_localeconv() before CurrencyFormatter, as the
+# baseline
+
+def old_get_localeconv():
+    conv = locale.localeconv()
+
+    monetary_locale = locale.getlocale(locale.LC_MONETARY)
+    numeric_locale = locale.getlocale(locale.LC_NUMERIC)
+    if monetary_locale[0] == 'pt_BR':
+        conv['p_cs_precedes'] = 1
+        conv['p_sep_by_space'] = 1
+
+    if not monetary_locale[0]:
+        conv["negative_sign"] = '-'
+        conv["currency_symbol"] = '$'
+        conv['mon_thousands_sep'] = ''
+        conv['mon_decimal_point'] = '.'
+        conv['p_sep_by_space'] = 0
+
+    if not numeric_locale[0]:
+        conv['decimal_point'] = '.'
+
+    return conv
+
+
+def old_format(self, symbol=True, precision=None):
+    conv = old_get_localeconv()
+
+    frac_digits = precision or conv.get('frac_digits', 2)
+    if frac_digits == 127:
+        frac_digits = 2
+    value = self.quantize(decimal.Decimal('10') ** -frac_digits)
+
+    groups = conv.get('mon_grouping', [])[:]
+    groups.reverse()
+    if groups:
+        group = groups.pop()
+    else:
+        group = 3
+
+    intparts = []
+    intpart = str(int(abs(value)))
+
+    while True:
+        if not intpart:
+            break
+
+        s = intpart[-group:]
+        intparts.insert(0, s)
+        intpart = intpart[:-group]
+        if not groups:
+            continue
+
+        last = groups.pop()
+        if last != 0:
+            group = last
+
+    if value > 0:
+        sign = conv.get('positive_sign', '')
+    elif value < 0:
+        sign = conv.get('negative_sign', '-')
+    else:
+        sign = ''
+    text = sign + conv.get('mon_thousands_sep', '.').join(intparts)
+
+    if precision is not None or value % 1 != 0:
+        sign_, digits, exponent = value.as_tuple()
+        frac = digits[exponent:] if exponent != 0 else (0, )
+        dec_part = ''.join(str(i) for i in frac)
+        dec_part = dec_part.rjust(frac_digits, '0')
+
+        mon_decimal_point = conv.get('mon_decimal_point', '.')
+        text += mon_decimal_point + dec_part
+
+    currency_symbol = conv.get('currency_symbol', '')
+    if currency_symbol and symbol:
+        if value > 0:
+            cs_precedes = conv.get('p_cs_precedes', 1)
+            sep_by_space = conv.get('p_sep_by_space', 1)
+        else:
+            cs_precedes = conv.get('n_cs_precedes', 1)
+            sep_by_space = conv.get('n_sep_by_space', 1)
+
+        if sep_by_space:
+            space = ' '
+        else:
+            space = ''
+        if cs_precedes:
+            text = currency_symbol + space + text
+        else:
+            text = text + space + currency_symbol
+
+    return text
+
+
+def measure(func, values):
+    start = time.time()
+    func(values)
+    return len(values) / (time.time() - start)
+
+
+def main(args):
+    count = int(args[0]) if args else 200000
+    values = [currency(decimal.Decimal(random.randint(-10 ** 9, 10 ** 9)) /
+                       100)
+              for i in range(count)]
+    as_string = converter.get_converter(currency).as_string
+    formatter = get_currency_formatter()
+
+    print('%-20s %15s' % ('path', 'values/s'))
+    for name, func in [
+            ('before', lambda values: [old_format(value, True, 2)
+                                       for value in values]),
+            ('currency.format', lambda values: [value.format()
+                                                for value in values]),
+            ('converter', lambda values: [as_string(value)
+                                          for value in values]),
+            ('formatter.format_many', formatter.format_many)]:
+        print('%-20s %15.0f' % (name, measure(func, values)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""Measures ObjectList.add_list(clear=True) on a list which already has rows.
+
+Usage: python benchmarks/objectlist_reload.py [rows...]
+"""
+
+import random
+import sys
+import time
+
+from gi.repository import Gtk
+
+from kiwi.ui.objectlist import Column, ObjectList
+
+
+class Item(object):
+    def __init__(self, id):
+        self.id = id
+        self.name = 'item %d' % id
+
+
+def reload(rows, churn):
+    objectlist = ObjectList([Column('id', data_type=int),
+                             Column('name')],
+                            mode=Gtk.SelectionMode.MULTIPLE)
+    items = [Item(i) for i in range(rows)]
+    objectlist.add_list(items)
+    objectlist.select(items[:10])
+
+    # Replace a fraction of the rows by new ones and shuffle a bit,
+    # like a periodic refresh of a query would do
+    changed = int(rows * churn)
+    new_items = items[changed:] + [Item(rows + i) for i in range(changed)]
+    random.shuffle(new_items)
+
+    start = time.time()
+    objectlist.add_list(new_items, clear=True)
+    elapsed = time.time() - start
+
+    assert len(objectlist) == rows
+    objectlist.destroy()
+    return elapsed
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] or [10000, 100000]
+    for rows in sizes:
+        for churn in [0.01, 0.1, 1.0]:
+            elapsed = reload(rows, churn)
+            print('%7d rows, %3d%% churn: %8.3fs' % (
+                rows, churn * 100, elapsed))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""Measures the per-cell cost of rendering an ObjectList column, comparing
+a copy of the cell data callbacks from before they were specialized, the
+current generic ones and the ones specialized in Column.attach()
+
+Usage: python benchmarks/objectlist_render.py [iterations]
+"""
+
+import datetime
+import decimal
+import sys
+import time
+
+from gi.repository import GdkPixbuf, Gtk
+
+from kiwi.accessor import kgetattr
+from kiwi.currency import currency
+from kiwi.datatypes import converter
+from kiwi.python import enum
+from kiwi.ui.objectlist import Column, ObjectList, COL_MODEL, empty_marker
+
+
+class Status(enum):
+    (OPEN, CLOSED) = range(2)
+
+
+class Item(object):
+    def __init__(self):
+        self.name = 'Kiwi'
+        self.quantity = 42
+        self.price = currency('1234.56')
+        self.date = datetime.date(2012, 3, 14)
+        self.status = Status.OPEN
+
+
+COLUMNS = [
+    ('str', Column('name', data_type=str)),
+    ('int', Column('quantity', data_type=int)),
+    ('currency', Column('price', data_type=currency)),
+    ('date', Column('date', data_type=datetime.date)),
+    ('enum', Column('status', data_type=Status)),
+]
+
+
+# The cell data callbacks and Column.as_string() before the callbacks
+# were specialized, as the baseline
+
+def old_as_string(column, data, obj=None):
+    data_type = column.data_type
+    if data is None and data_type != GdkPixbuf.Pixbuf:
+        text = ''
+    elif column.format_func and column.format_func_data is not None and obj:
+        text = column.format_func(obj, column.format_func_data)
+    elif column.format_func and column.format_func_data is None:
+        text = column.format_func(data)
+    elif (column.format or
+          data_type == float or
+          data_type == decimal.Decimal or
+          data_type == currency or
+          data_type == datetime.date or
+          data_type == datetime.datetime or
+          data_type == datetime.time or
+          issubclass(data_type, enum)):
+        conv = converter.get_converter(data_type)
+        text = conv.as_string(data, format=column.format or None)
+    elif data_type is bool:
+        text = data
+    else:
+        text = str(data)
+
+    return text
+
+
+def old_cell_data_text_func(tree_column, renderer, model, treeiter,
+                            col_data):
+    column, renderer_prop = col_data
+    row = model[treeiter]
+    obj = row[COL_MODEL]
+    if column.editable_attribute and obj is not empty_marker:
+        data = kgetattr(obj, column.editable_attribute, None)
+        if isinstance(renderer, Gtk.CellRendererToggle):
+            renderer.set_property('activatable', data)
+        elif isinstance(renderer, Gtk.CellRendererText):
+            renderer.set_property('editable', data)
+        else:
+            raise AssertionError
+
+    data = kgetattr(obj, column.attribute, None)
+    text = old_as_string(column, data, obj)
+
+    objectlist = column._objectlist
+    if objectlist.cell_data_func and obj is not empty_marker:
+        text = objectlist.cell_data_func(column, renderer, obj, text)
+
+    if obj is empty_marker:
+        if isinstance(renderer, Gtk.CellRendererText):
+            renderer.set_property(renderer_prop, '')
+    else:
+        try:
+            renderer.set_property(renderer_prop, text)
+        except TypeError:
+            renderer.set_property(renderer_prop, str(text))
+
+    if column.renderer_func:
+        column.renderer_func(renderer, obj)
+
+
+def old_cell_data_combo_func(tree_column, renderer, model, treeiter,
+                             col_data):
+    column, renderer_prop = col_data
+    row = model[treeiter]
+    obj = row[COL_MODEL]
+    data = kgetattr(obj, column.attribute, None)
+    text = old_as_string(column, data, obj)
+    renderer.set_property('text', text.lower().capitalize())
+
+
+def measure(func, args, iterations):
+    start = time.time()
+    for i in range(iterations):
+        func(*args)
+    return (time.time() - start) / iterations * 1e6
+
+
+def main(args):
+    iterations = int(args[0]) if args else 20000
+    objectlist = ObjectList([column for name, column in COLUMNS])
+    objectlist.append(Item())
+    model = objectlist.get_model()
+    treeiter = model.get_iter_first()
+
+    print('%-10s %12s %12s %12s' % ('column', 'before', 'generic',
+                                    'specialized'))
+    for name, column in COLUMNS:
+        renderer = column._renderer
+        prop = column._renderer_prop
+        args = (column.treeview_column, renderer, model, treeiter,
+                (column, prop))
+        if name == 'enum':
+            old = old_cell_data_combo_func
+            generic = column._cell_data_combo_func
+            specialized = column._create_cell_data_combo_func()
+        else:
+            old = old_cell_data_text_func
+            generic = column._cell_data_text_func
+            specialized = column._create_cell_data_text_func(renderer, prop)
+        print('%-10s %10.2fus %10.2fus %10.2fus' % (
+            name,
+            measure(old, args, iterations),
+            measure(generic, args, iterations),
+            measure(specialized, args, iterations)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
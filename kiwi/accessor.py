@@ -33,10 +33,11 @@ important differences:
       it the next time the value is retrieved.
 """
 
+import array
+import itertools
 import logging
-import types
+import operator
 import warnings
-import collections
 
 log = logging.getLogger('kiwi.accessor')
 
@@ -49,7 +50,7 @@ def get_default_getter(model, attr_name, cache):
     if getattr() is to be used a tuple in the format (model,
     attr_name) is returned."""
     func = getattr(model, "get_%s" % attr_name, None)
-    if isinstance(func, collections.Callable):
+    if callable(func):
         log.info('kgetattr based get_%s method is deprecated, '
                  'replace it with a property' % attr_name)
         return func
@@ -65,41 +66,39 @@ def get_default_setter(model, attr_name, cache):
     if setattr() is to be used a tuple in the format (model,
     attr_name) is returned."""
     func = getattr(model, "set_%s" % attr_name, None)
-    if isinstance(func, collections.Callable):
+    if callable(func):
         log.info('ksetattr based set_%s method is deprecated, '
                  'replace it with a property' % attr_name)
         return func
     else:
         return (model, attr_name)
 
-# The _*_cache dictionaries cache the objects, attributes and callables
-# (called `accessor tuples' here) we retrieve values from. If possible,
-# we use weakrefs to avoid holding hard references to objects, allowing
-# them to be garbage collected.  Certain objects (ZODB.Persistent for
-# one) cannot be weakref()ed and *will* leak - be sure to call
-# clear_attr_cache() if you need them released.
+# The _*_cache dictionaries cache how an attribute is accessed (called
+# `accessors' here) for each class, so the cost and the memory used do
+# not grow with the number of instances, and ids of dead objects being
+# reused is not a problem. Only accessors which do not depend on the
+# instance are cached: attributes and get_foo/set_foo methods. The
+# classes with get_getter()/get_setter() can answer differently for
+# each instance, so those are called on each access.
 #
 # Key structure:
-#   (objref_or_weakref, attrname)
+#   class -> attrname
 #
-# Value structure (accessor tuples):
+# Value structure (accessors):
 #
-#   kgetattr: (access_code, data1, data2)
-#   ksetattr: (access_code, data1, data2, value_mode)
+#   kgetattr: (getter, plain)
+#     getter(obj) returns the value; when plain is True it is an
+#     attribute lookup and an AttributeError means the default is used
+#   ksetattr: (setter, attrname)
+#     setter(obj, value) sets the value, setattr is used when setter
+#     is None
 #
-# Access codes:
-#
-# 0: data1()                 unbound methods and functions (data2 is None)
-# 1: data2(data1())          bound methods and weakref
-# 2: getattr(data1(), data2) using straight getattr and weakref
-# 3: data2(data1)            bound methods (no weakref)
-# 4: getattr(data1, data2)   using straight getattr (no weakref)
+# The dot paths are split once and kept in _paths.
 
-import weakref
 _kgetattr_cache = {}
-_kgetattr_wref = {}
 _ksetattr_cache = {}
-_ksetattr_wref = {}
+_paths = {}
+_numpy = None
 
 
 class CacheControl(object):
@@ -113,11 +112,9 @@ class CacheControl(object):
         self.cacheable = 0
 
     def invalidate(self):
-        key = self.key
-        if key in _kgetattr_cache:
-            del _kgetattr_cache[key]
-        if key in _ksetattr_cache:
-            del _ksetattr_cache[key]
+        cls, name = self.key
+        _kgetattr_cache.get(cls, {}).pop(name, None)
+        _ksetattr_cache.get(cls, {}).pop(name, None)
 
 
 class _AttrUnset:
@@ -132,59 +129,100 @@ class DefaultValue(Exception):
     """
 
 
-def kgetattr_guard(wref):
-    try:
-        key = _kgetattr_wref[id(wref)][0]
-        del _kgetattr_wref[id(wref)]
-        del _kgetattr_cache[key]
-    except KeyError:
-        # This path is used only when the program terminates.
-        pass
+def _split_path(attr_name):
+    names = _paths.get(attr_name)
+    if names is None:
+        names = _paths[attr_name] = tuple(attr_name.split("."))
+    return names
 
 
-def ksetattr_guard(wref):
-    try:
-        key = _ksetattr_wref[id(wref)][0]
-        del _ksetattr_wref[id(wref)]
-        del _ksetattr_cache[key]
-    except KeyError:
-        # This path is used only when the program terminates.
-        pass
+def _call_getter(func):
+    # Accessors which are not called with the instance
+    return lambda obj: func()
+
+
+def _get_getter(obj, name):
+    """Returns the accessor to get the attribute name of obj, caching it
+    for the class of obj when it does not depend on the instance
+    """
+    cls = obj.__class__
+    get_getter = getattr(cls, 'get_getter', None)
+    cache = CacheControl((cls, name))
+    if get_getter is None:
+        func = getattr(cls, "get_%s" % name, None)
+        if callable(func):
+            warnings.warn(
+                'kgetattr based get_%s method is deprecated, '
+                'replace it with a property' % name, DeprecationWarning,
+                stacklevel=3)
+            accessor = (func, False)
+        else:
+            accessor = (operator.attrgetter(name), True)
+    else:
+        # get_getter() can answer differently for each instance, so it
+        # is called on every access
+        cache.disable()
+        # DefaultValue is handled by kgetattr
+        func = get_getter(obj, name, cache)
+        if isinstance(func, tuple):
+            data1, data2 = func
+            accessor = (_call_getter(lambda: getattr(data1, data2)), True)
+        else:
+            accessor = (_call_getter(func), False)
+
+    if cache.cacheable:
+        getters = _kgetattr_cache.get(cls)
+        if getters is None:
+            getters = _kgetattr_cache[cls] = {}
+        getters[name] = accessor
+    return accessor
+
 
+def _get_setter(model, name):
+    """Returns the accessor to set the attribute name of model, caching it
+    for the class of model when it does not depend on the instance
+    """
+    cls = model.__class__
+    get_setter = getattr(cls, 'get_setter', None)
+    cache = CacheControl((cls, name))
+    if get_setter is None:
+        func = getattr(cls, "set_%s" % name, None)
+        if callable(func):
+            log.info('ksetattr based set_%s method is deprecated, '
+                     'replace it with a property' % name)
+            accessor = (func, name)
+        else:
+            accessor = (None, name)
+    else:
+        # get_setter() can answer differently for each instance, so it
+        # is called on every access
+        cache.disable()
+        func = get_setter(model, name, cache)
+        if isinstance(func, tuple):
+            data1, data2 = func
+            accessor = (lambda obj, value: setattr(data1, data2, value),
+                        data2)
+        else:
+            accessor = (lambda obj, value: func(value), name)
 
-# 1. Break up attr_name into parts
+    if cache.cacheable:
+        setters = _ksetattr_cache.get(cls)
+        if setters is None:
+            setters = _ksetattr_cache[cls] = {}
+        setters[name] = accessor
+    return accessor
+
+
+# 1. Break up attr_name into parts, using the precompiled path
 # 2. Loop around main lookup code for each part:
-#     2.1. Try and get accessor tuple out of cache
-#     2.2. If not there, generate tuple from callable and store it
-#     2.3. Use accessor tuple to grab value
+#     2.1. Try and get the accessor of the class out of the cache
+#     2.2. If not there, look it up and store it
+#     2.3. Use the accessor to grab value
 #     2.4. Value wasn't found, return default or raise ValueError
 #   Use value as obj in next iteration
 # 3. Return value
 
-def kgetattr(
-    model,
-    attr_name,
-    default=_AttrUnset,
-    flat=0,
-    # bind to local variables for speed:
-    ref=weakref.ref,
-    TupleType=tuple,
-    MethodType=types.MethodType,
-    split=str.split,
-    kgetattr_guard=kgetattr_guard,
-    getattr=getattr,
-    dummycache=CacheControl((None, None)),
-    # constants:
-    # access opcodes:
-    LAMBDA_ACCESS=0,
-    METHOD_ACCESS=1,
-    TUPLE_ACCESS=2,
-    NWR_METHOD_ACCESS=3,
-    NWR_TUPLE_ACCESS=4,
-    # FAST tuples do not store the object, as the input object
-    # is also the accesses object.
-    FAST_METHOD_ACCESS=5,
-    FAST_TUPLE_ACCESS=6):
+def kgetattr(model, attr_name, default=_AttrUnset, flat=0):
     """Returns the value associated with the attribute in model
     named by attr_name. If default is provided and model does not
     have an attribute called attr_name, the default value is
@@ -193,145 +231,45 @@ def kgetattr(
 
     # 1. Break up attr_name into parts
     if flat or "." not in attr_name:
-        names = [attr_name, ]
+        names = (attr_name, )
     else:
-        try:
-            names = attr_name.split(".")
-        except AttributeError:
-            names = split(attr_name, ".")
+        names = _split_path(attr_name)
+        warnings.warn(
+            'kgetattr dot-notation %s is deprecated, '
+            'replace it with a property' % (attr_name, ), DeprecationWarning,
+            stacklevel=2)
 
-        if len(names) > 1:
-            warnings.warn(
-                'kgetattr dot-notation %s is deprecated, '
-                'replace it with a property' % (attr_name, ), DeprecationWarning,
-                stacklevel=2)
+    return _kgetattr_names(model, names, default)
+
+
+def _kgetattr_names(obj, names, default):
     # 2. Loop around main lookup code for each part:
-    obj = model
     for name in names:
-        key = (id(obj), name)
         # First time round, obj is the model. Every subsequent loop, obj
         # is the subattribute value indicated by the current part in
         # [names]. The last loop grabs the target value and returns it.
-
         try:
-            # 2.1 Fetch the opcode tuple from the cache.
-            objref, icode, data1, data2 = _kgetattr_cache[key]
+            # 2.1 Fetch the accessor from the cache.
+            getter, plain = _kgetattr_cache[obj.__class__][name]
         except KeyError:
-            # 2.2. If not there, generate tuple from callable and store it
+            # 2.2. If not there, look it up and store it
             try:
-                get_getter = obj.__class__.get_getter
-                cache = CacheControl(key)
-            except AttributeError:
-                # This is needed so that the check below if the result is
-                # cacheable can be done. The inbuilt get_getter always
-                # allows caching.
-                cache = dummycache
-                get_getter = None
-
-                func = getattr(obj, "get_%s" % name, None)
-                if isinstance(func, collections.Callable):
-                    warnings.warn(
-                        'kgetattr based get_%s method is deprecated, '
-                        'replace it with a property' % name, DeprecationWarning,
-                        stacklevel=2)
-                    icode = FAST_METHOD_ACCESS
-                    data1 = func.__func__
-                    data2 = None
-                else:
-                    icode = FAST_TUPLE_ACCESS
-                    data1 = None
-                    data2 = name
+                getter, plain = _get_getter(obj, name)
+            except DefaultValue:
+                if default is _AttrUnset:
+                    raise
+                return default
 
-            if get_getter is not None:
-                try:
-                    func = get_getter(obj, name, cache)
-                except DefaultValue:
-                    if default == _AttrUnset:
-                        raise
-                    return default
-
-                if isinstance(func, TupleType):
-                    data1, data2 = func
-                    if data1 == obj:
-                        data1 = None
-                        icode = FAST_TUPLE_ACCESS
-                    else:
-                        try:
-                            data1 = ref(data1, kgetattr_guard)
-                            _kgetattr_wref[id(data1)] = (key, data1)
-                            icode = TUPLE_ACCESS
-                        except TypeError:
-                            icode = NWR_TUPLE_ACCESS
-
-                elif isinstance(func, MethodType):
-                    data1 = func.__func__
-                    data2 = func.__self__
-                    if data2 == obj:
-                        data2 = None
-                        icode = FAST_METHOD_ACCESS
-                    else:
-                        try:
-                            data2 = ref(func.__self__, kgetattr_guard)
-                            _kgetattr_wref[id(data2)] = (key, data2)
-                            icode = METHOD_ACCESS
-                        except TypeError:
-                            data2 = func.__self__
-                            icode = NWR_METHOD_ACCESS
-                else:
-                    icode = LAMBDA_ACCESS
-                    data1 = func
-                    data2 = None
-            if cache.cacheable:
-                # Store access opcode:
-                # objref or obj are used as a protection against id-aliasing
-                # as we use just a plain id(obj) in the cache entry key.
-                #
-                # We either have to use a weakref, so we get to know when the
-                # object dies. We just remove the cache entry containing the
-                # weakref, _kgetattr_wref is used to associate which key has
-                # to be killed for a given weakref.
-
-                try:
-                    objref = ref(obj, kgetattr_guard)
-                    _kgetattr_wref[id(objref)] = (key, objref)
-                    _kgetattr_cache[key] = (objref, icode, data1, data2)
-                except TypeError:
-                    # it's not weakrefable (probably ZODB!)
-                    # store a hard reference.
-                    _kgetattr_cache[key] = (obj, icode, data1, data2)
-            else:
-                if key in _kgetattr_cache:
-                    del _kgetattr_cache[key]
-
-        # 2.3. Use accessor tuple to grab value
+        # 2.3. Use the accessor to grab value
         try:
-            if icode == FAST_METHOD_ACCESS:
-                obj = data1(obj)
-            elif icode == FAST_TUPLE_ACCESS:
-                obj = getattr(obj, data2, default)
-                if obj is _AttrUnset:
-                    raise AttributeError(
-                        "%r object has no attribute %r" % (model, data2))
-            elif icode == TUPLE_ACCESS:
-                o = data1()
-                obj = getattr(o, data2, default)
-                if obj is _AttrUnset:
-                    raise AttributeError(
-                        "%r object has no attribute %r" % (o, data2))
-            elif icode == NWR_TUPLE_ACCESS:
-                obj = getattr(data1, data2)
-            elif icode == NWR_METHOD_ACCESS:
-                obj = data1(data2)
-            elif icode == METHOD_ACCESS:
-                obj = data1(data2())
-            elif icode == LAMBDA_ACCESS:
-                obj = data1()
-            else:
-                raise AssertionError("Unknown tuple type in _kgetattr_cache")
-
+            obj = getter(obj)
+        except AttributeError:
+            if not plain or default is _AttrUnset:
+                raise
+            obj = default
         # 2.4. Value wasn't found, return default or raise ValueError
         except DefaultValue:
-            if default == _AttrUnset:
+            if default is _AttrUnset:
                 raise
             return default
 
@@ -341,35 +279,114 @@ def kgetattr(
     return obj
 
 
+def _get_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy
+
+
+def _get_class_getter(model, name):
+    # The accessor of name for all the instances of the class of model,
+    # None if it depends on the instance
+    getters = _kgetattr_cache.get(model.__class__)
+    if getters is None or name not in getters:
+        try:
+            _get_getter(model, name)
+        except DefaultValue:
+            return None
+        getters = _kgetattr_cache.get(model.__class__)
+        if getters is None:
+            return None
+    return getters.get(name)
+
+
+def kgetattr_many(models, attr_names, default=_AttrUnset, flat=0,
+                  typecode=None):
+    """Returns the values of attributes for a sequence of models, like
+    calling kgetattr() for each of them. The accessors are looked up once
+    for each run of models of the same class instead of once per model.
+    This is used by the ObjectList to sort, sum and export the rows.
+
+    :param models: an iterable of models, it is only iterated once
+    :param attr_names: an attribute name or a list of attribute names
+    :param default: the value used when a model does not have the
+      attribute, if it is not provided AttributeError is raised
+    :param flat: if True, no dot path parsing will be done
+    :param typecode: if not None, the values are returned in a numpy
+      array of this type, or an :mod:`array` array when numpy is not
+      installed. It must be an :mod:`array` typecode like 'd' or 'q'
+      and all the values must be numbers
+    :returns: a list of values when attr_names is a string, otherwise
+      a list with the values of each attribute
+    """
+    single = isinstance(attr_names, str)
+    if single:
+        attr_names = [attr_names]
+
+    # (first name, the rest of the dot path)
+    paths = []
+    for attr_name in attr_names:
+        if flat or "." not in attr_name:
+            paths.append((attr_name, ()))
+        else:
+            warnings.warn(
+                'kgetattr dot-notation %s is deprecated, '
+                'replace it with a property' % (attr_name, ),
+                DeprecationWarning, stacklevel=2)
+            names = _split_path(attr_name)
+            paths.append((names[0], names[1:]))
+
+    columns = [[] for path in paths]
+    columns_paths = list(zip(columns, paths))
+    get_class = operator.attrgetter('__class__')
+    for cls, run in itertools.groupby(models, get_class):
+        run = list(run)
+        for column, (name, rest) in columns_paths:
+            accessor = _get_class_getter(run[0], name)
+            if accessor is not None:
+                getter, plain = accessor
+                try:
+                    values = list(map(getter, run))
+                except (AttributeError, DefaultValue):
+                    # Some of the models need the default value
+                    pass
+                else:
+                    if rest:
+                        values = [_kgetattr_names(value, rest, default)
+                                  for value in values]
+                    column.extend(values)
+                    continue
+
+            names = (name, ) + rest
+            column.extend(_kgetattr_names(model, names, default)
+                          for model in run)
+
+    if typecode is not None:
+        numpy = _get_numpy()
+        if numpy:
+            columns = [numpy.array(column, dtype=typecode)
+                       for column in columns]
+        else:
+            columns = [array.array(typecode, column) for column in columns]
+
+    if single:
+        return columns[0]
+    return columns
+
+
 # A general algo for ksetattr:
 #
 # 1. Use attr_name to kgetattr the target object, and get the real attribute
-# 2. Try and get accessor tuple from cache
-# 3. If not there, generate accessor tuple and store it
+# 2. Try and get the accessor of the class from the cache
+# 3. If not there, look it up and store it
 # 4. Set value to target object's attribute
 
-def ksetattr(
-    model,
-    attr_name,
-    value,
-    flat=0,
-
-    # bind to local variables for speed:
-    ref=weakref.ref,
-    TupleType=tuple,
-    MethodType=types.MethodType,
-    ksetattr_guard=ksetattr_guard,
-    getattr=getattr,
-    dummycache=CacheControl((None, None)),
-
-    # constants:
-    LAMBDA_ACCESS=0,
-    METHOD_ACCESS=1,
-    TUPLE_ACCESS=2,
-    NWR_METHOD_ACCESS=3,
-    NWR_TUPLE_ACCESS=4,
-    FAST_METHOD_ACCESS=5,
-    FAST_TUPLE_ACCESS=6):
+def ksetattr(model, attr_name, value, flat=0):
     """Set the value associated with the attribute in model
     named by attr_name. If flat=1 is specified, no dot path parsing will
     be done."""
@@ -387,101 +404,18 @@ def ksetattr(
             attr_name = attr_name[lastdot + 1:]
 
     # At this point we only have a flat attribute and the right model.
-    key = (id(model), attr_name)
-
     try:
-        # 2. Try and get accessor tuple from cache
-        objref, icode, data1, data2 = _ksetattr_cache[key]
+        # 2. Try and get the accessor from the cache
+        setter, name = _ksetattr_cache[model.__class__][attr_name]
     except KeyError:
-        # 3. If not there, generate accessor tuple and store it
-        #    cache = CacheControl(key)
-        try:
-            get_setter = model.__class__.get_setter
-            cache = CacheControl(key)
-        except AttributeError:
-            # No get_setter found:
-            get_setter = None
-            # This is needed so the entry storing code can check if it's ok
-            # to cache.
-            cache = dummycache
-
-            func = getattr(model, "set_%s" % attr_name, None)
-            if isinstance(func, collections.Callable):
-                log.info('ksetattr based set_%s method is deprecated, '
-                         'replace it with a property' % attr_name)
-                icode = FAST_METHOD_ACCESS
-                data1 = func.__func__
-                data2 = None
-            else:
-                icode = FAST_TUPLE_ACCESS
-                data1 = None
-                data2 = attr_name
-
-        if get_setter is not None:
-            func = get_setter(model, attr_name, cache)
-
-            if isinstance(func, TupleType):
-                data1, data2 = func
-                if data1 == model:
-                    data1 = None
-                    icode = FAST_TUPLE_ACCESS
-                else:
-                    try:
-                        data1 = ref(data1, ksetattr_guard)
-                        _ksetattr_wref[id(data1)] = (key, data1)
-                        icode = TUPLE_ACCESS
-                    except TypeError:
-                        icode = NWR_TUPLE_ACCESS
-            elif isinstance(func, MethodType):
-                data1 = func.__func__
-                data2 = func.__self__
-                if data2 == model:
-                    data2 = None
-                    icode = FAST_METHOD_ACCESS
-                else:
-                    try:
-                        data2 = ref(data2, ksetattr_guard)
-                        _ksetattr_wref[id(data2)] = (key, data2)
-                        icode = METHOD_ACCESS
-                    except TypeError:
-                        data2 = func.__self__
-                        icode = NWR_METHOD_ACCESS
-            else:
-                icode = LAMBDA_ACCESS
-                data1 = func
-                data2 = None
-
-        if cache.cacheable:
-            # store the access opcode.
-            # for the use of model/objref as first value in the opcode tuple
-            # see the kgetattr comments.
-            try:
-                objref = ref(model, ksetattr_guard)
-                _ksetattr_wref[id(objref)] = (key, objref)
-                _ksetattr_cache[key] = (objref, icode, data1, data2)
-            except TypeError:
-                # it's not weakref-able, store a hard reference.
-                _ksetattr_cache[key] = (model, icode, data1, data2)
-        else:
-            if key in _ksetattr_cache:
-                del _ksetattr_cache.has_key[key]
-
-    if icode == FAST_TUPLE_ACCESS:
-        setattr(model, data2, value)
-    elif icode == FAST_METHOD_ACCESS:
-        data1(model, value)
-    elif icode == TUPLE_ACCESS:
-        setattr(data1(), data2, value)
-    elif icode == NWR_TUPLE_ACCESS:
-        setattr(data1, data2, value)
-    elif icode == NWR_METHOD_ACCESS:
-        data1(data2, value)
-    elif icode == METHOD_ACCESS:
-        data1(data2(), value)
-    elif icode == LAMBDA_ACCESS:
-        data1(value)
+        # 3. If not there, look it up and store it
+        setter, name = _get_setter(model, attr_name)
+
+    # 4. Set value to target object's attribute
+    if setter is None:
+        setattr(model, name, value)
     else:
-        raise AssertionError("Unknown tuple type in _ksetattr_cache")
+        setter(model, value)
 
 
 def enable_attr_cache():
@@ -489,18 +423,12 @@ def enable_attr_cache():
     versions that do not support weakrefs (1.5.x and earlier). Be
     warned, using the cache in these versions causes leaked
     references to accessor methods and models!"""
-    global _kgetattr_cache, _ksetattr_cache, _kgetattr_wref, _ksetattr_wref
-    _kgetattr_cache = {}
-    _ksetattr_cache = {}
-    _kgetattr_wref = {}
-    _ksetattr_wref = {}
+    clear_attr_cache()
 
 
 def clear_attr_cache():
-    """Clears the kgetattr cache. It must be called repeatedly to
-    avoid memory leaks in Python 2.0 and earlier."""
-    global _kgetattr_cache, _ksetattr_cache, _kgetattr_wref, _ksetattr_wref
-    _kgetattr_cache = {}
-    _ksetattr_cache = {}
-    _kgetattr_wref = {}
-    _ksetattr_wref = {}
+    """Clears the kgetattr cache. The accessors are cached per class, so
+    this is only needed to release classes which are not used anymore."""
+    _kgetattr_cache.clear()
+    _ksetattr_cache.clear()
+    _paths.clear()
@@ -28,8 +28,8 @@ import gettext
 import decimal
 import six
 
-from kiwi.datatypes import ValidationError, ValueUnset
-from kiwi.datatypes import converter, get_localeconv, filter_locale
+from kiwi.datatypes import BaseConverter, ValidationError, ValueUnset
+from kiwi.datatypes import converter, get_locale_snapshot
 from kiwi.enums import Alignment
 
 _ = lambda m: gettext.dgettext('kiwi', m)
@@ -49,13 +49,12 @@ class currency(decimal.Decimal):
         :type value: string or number
         """
         if isinstance(value, six.string_types):
-            conv = get_localeconv()
-            currency_symbol = conv.get('currency_symbol')
-            text = value.strip(currency_symbol)
+            snapshot = get_locale_snapshot()
+            text = value.strip(snapshot.currency_symbol)
             # if we cannot convert it using locale information, still try to
             # create
             try:
-                text = filter_locale(text, monetary=True)
+                text = snapshot.filter(text, monetary=True)
                 value = currency._converter.from_string(text,
                                                         filter=False)
             except ValidationError:
@@ -77,88 +76,142 @@ class currency(decimal.Decimal):
         return decimal.Decimal.__new__(cls, value)
 
     def format(self, symbol=True, precision=None):
-        conv = get_localeconv()
+        return get_currency_formatter(symbol, precision).format(self)
+
+    def __repr__(self):
+        return '<currency %s>' % self.format()
+
+
+class CurrencyFormatter(object):
+    """Formats currency values according to the monetary conventions of a
+    locale. Everything that does not depend on the value is computed
+    once, use :func:`get_currency_formatter` to get the formatter of the
+    current locale.
+
+    :param snapshot: the :class:`kiwi.datatypes.LocaleSnapshot` of the
+      locale
+    :param symbol: whether to include the currency symbol
+    :param precision: the number of decimal digits, which are always
+      included. If it is None the digits of the locale are used and
+      they are only included when the value has a decimal part
+    """
+
+    def __init__(self, snapshot, symbol=True, precision=None):
+        conv = snapshot.conv
+        self.symbol = symbol
+        self.precision = precision
 
         frac_digits = precision or conv.get('frac_digits', 2)
         # Decimal.quantize can't handle a precision of 127, which is
         # the default value for glibc/python. Fallback to 2
         if frac_digits == 127:
             frac_digits = 2
-        value = self.quantize(decimal.Decimal('10') ** -frac_digits)
-
-        # Grouping (eg thousand separator) of integer part
-        groups = conv.get('mon_grouping', [])[:]
-        groups.reverse()
-        if groups:
-            group = groups.pop()
+        self._frac_digits = frac_digits
+        self._quantum = decimal.Decimal('10') ** -frac_digits
+        self._decimal_point = conv.get('mon_decimal_point', '.')
+        self._thousands_sep = conv.get('mon_thousands_sep', '.')
+
+        # Grouping (eg thousand separator) of the integer part, the sizes
+        # of the groups from the right, the last one is repeated
+        groups = list(conv.get('mon_grouping', [])) or [3]
+        sizes = [groups[0]]
+        for size in groups[1:]:
+            # if 0 reuse last one, see struct lconv in locale.h
+            sizes.append(size or sizes[-1])
+        self._group_sizes = sizes
+
+        # sign, text before and text after the number, for positive,
+        # negative and zero values
+        self._positive = self._get_layout(conv, 'p', conv.get(
+            'positive_sign', ''))
+        self._negative = self._get_layout(conv, 'n', conv.get(
+            'negative_sign', '-'))
+        self._zero = self._get_layout(conv, 'n', '')
+
+    def _get_layout(self, conv, prefix, sign):
+        currency_symbol = conv.get('currency_symbol', '')
+        if not currency_symbol or not self.symbol:
+            return sign, '', ''
+        if conv.get(prefix + '_sep_by_space', 1):
+            space = ' '
         else:
-            group = 3
-
-        intparts = []
+            space = ''
+        if conv.get(prefix + '_cs_precedes', 1):
+            return sign, currency_symbol + space, ''
+        return sign, '', space + currency_symbol
 
-        # We're iterating over every character in the integer part
-        # make sure to remove the negative sign, it'll be added later
-        intpart = str(int(abs(value)))
+    def _group(self, intpart):
+        sizes = self._group_sizes
+        if len(intpart) <= sizes[0]:
+            return intpart
 
-        while True:
-            if not intpart:
+        intparts = []
+        end = len(intpart)
+        for size in sizes:
+            intparts.append(intpart[max(end - size, 0):end])
+            end -= size
+            if end <= 0:
                 break
-
-            s = intpart[-group:]
-            intparts.insert(0, s)
-            intpart = intpart[:-group]
-            if not groups:
-                continue
-
-            last = groups.pop()
-            # if 0 reuse last one, see struct lconv in locale.h
-            if last != 0:
-                group = last
-
-        # Add the sign, and the list of decmial parts, which now are grouped
-        # properly and can be joined by mon_thousand_sep
+        size = sizes[-1]
+        while end > 0:
+            intparts.append(intpart[max(end - size, 0):end])
+            end -= size
+        intparts.reverse()
+        return self._thousands_sep.join(intparts)
+
+    def format(self, value):
+        """Formats a value
+
+        :param value: a currency, a decimal or an integer
+        :returns: the formatted value
+        """
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(value)
+        value = value.quantize(self._quantum)
         if value > 0:
-            sign = conv.get('positive_sign', '')
+            sign, before, after = self._positive
         elif value < 0:
-            sign = conv.get('negative_sign', '-')
+            sign, before, after = self._negative
         else:
-            sign = ''
-        currency = sign + conv.get('mon_thousands_sep', '.').join(intparts)
+            sign, before, after = self._zero
+
+        intpart, frac = format(abs(value), 'f').partition('.')[::2]
+        text = self._group(intpart)
 
         # Only add decimal part if it has one, is this correct?
-        if precision is not None or value % 1 != 0:
-            sign_, digits, exponent = value.as_tuple()
-            frac = digits[exponent:] if exponent != 0 else (0, )
-            dec_part = ''.join(str(i) for i in frac)
+        if self.precision is not None or frac.strip('0'):
             # Add 0s to complete the required precision
-            dec_part = dec_part.rjust(frac_digits, '0')
+            text += self._decimal_point + (frac or '0').rjust(
+                self._frac_digits, '0')
+        return before + sign + text + after
 
-            mon_decimal_point = conv.get('mon_decimal_point', '.')
-            currency += mon_decimal_point + dec_part
+    def format_many(self, values):
+        """Formats a sequence of values, see :meth:`format`
 
-        # If requested include currency symbol
-        currency_symbol = conv.get('currency_symbol', '')
-        if currency_symbol and symbol:
-            if value > 0:
-                cs_precedes = conv.get('p_cs_precedes', 1)
-                sep_by_space = conv.get('p_sep_by_space', 1)
-            else:
-                cs_precedes = conv.get('n_cs_precedes', 1)
-                sep_by_space = conv.get('n_sep_by_space', 1)
-
-            if sep_by_space:
-                space = ' '
-            else:
-                space = ''
-            if cs_precedes:
-                currency = currency_symbol + space + currency
-            else:
-                currency = currency + space + currency_symbol
-
-        return currency
+        :param values: an iterable of currencies, decimals or integers
+        :returns: a list with the formatted values
+        """
+        format_value = self.format
+        return [format_value(value) for value in values]
 
-    def __repr__(self):
-        return '<currency %s>' % self.format()
+
+# (LocaleSnapshot, symbol, precision) -> CurrencyFormatter
+_formatters = {}
+
+
+def get_currency_formatter(symbol=True, precision=None):
+    """Returns the :class:`CurrencyFormatter` of the current locale, they
+    are created once and reused.
+
+    :param symbol: whether to include the currency symbol
+    :param precision: the number of decimal digits, or None to use the
+      ones of the locale
+    """
+    key = (get_locale_snapshot(), symbol, precision)
+    formatter = _formatters.get(key)
+    if formatter is None:
+        formatter = _formatters[key] = CurrencyFormatter(*key)
+    return formatter
 
 _DecimalConverter = type(converter.get_converter(decimal.Decimal))
 
@@ -189,7 +242,34 @@ class _CurrencyConverter(_DecimalConverter):
         if precision is None:
             precision = self.precision
 
-        return value.format(symbol, precision)
+        return get_currency_formatter(symbol, precision).format(value)
+
+    def as_string_many(self, values, format=None, symbol=None,
+                       precision=None):
+        if symbol is None:
+            symbol = self.symbol
+
+        if precision is None:
+            precision = self.precision
+
+        formatter = get_currency_formatter(symbol, precision)
+        strings = []
+        errors = []
+        for index, value in enumerate(values):
+            if value == ValueUnset:
+                strings.append('')
+                continue
+            if not isinstance(value, decimal.Decimal):
+                # None and the values of other types are reported too
+                try:
+                    value = currency(value)
+                except (ValueError, TypeError, decimal.InvalidOperation):
+                    strings.append(None)
+                    errors.append((index, ValidationError(
+                        _("%s can not be converted to a currency") % value)))
+                    continue
+            strings.append(formatter.format(value))
+        return strings, errors
 
     def from_string(self, value):
         if value == '':
@@ -200,6 +280,11 @@ class _CurrencyConverter(_DecimalConverter):
             raise ValidationError(
                 _("%s can not be converted to a currency") % value)
 
+    def from_string_many(self, values):
+        # Not the one of the decimal converter, currencies can have
+        # the currency symbol
+        return BaseConverter.from_string_many(self, values)
+
 converter.add(_CurrencyConverter)
 
 
@@ -212,4 +297,4 @@ def format_price(value, symbol=True, precision=None):
     :param symbol: whether to include the currency symbol
     """
 
-    return currency(value).format(symbol, precision)
+    return get_currency_formatter(symbol, precision).format(currency(value))
@@ -77,7 +77,11 @@ class ValidationError(Exception):
 
 class ConverterRegistry:
     def __init__(self):
+        # type, str(type) and type.__name__ -> converter
         self._converters = {}
+        # What get_converter() returned for a type or name, including
+        # subclasses of the registered types. Cleared by add() and remove()
+        self._resolved = {}
 
     def add(self, converter_type):
         """
@@ -94,6 +98,7 @@ class ConverterRegistry:
         self._converters[c.type] = c
         self._converters[str(c.type)] = c
         self._converters[c.type.__name__] = c
+        self._resolved.clear()
         return c
 
     def remove(self, converter_type):
@@ -108,26 +113,49 @@ class ConverterRegistry:
         if not ctype in self._converters:
             raise KeyError(converter_type)
 
-        del self._converters[ctype]
+        c = self._converters.pop(ctype)
+        # The aliases, unless another type has the same name
+        for key in [str(ctype), ctype.__name__]:
+            if self._converters.get(key) is c:
+                del self._converters[key]
+        self._resolved.clear()
 
     def get_converter(self, converter_type):
+        try:
+            return self._resolved[converter_type]
+        except KeyError:
+            pass
+
+        converter = self._resolve(converter_type)
+        self._resolved[converter_type] = converter
+        return converter
+
+    def _resolve(self, converter_type):
         if converter_type == 'unicode':
             converter_type = six.text_type
 
-        try:
-            converter = self._converters[converter_type]
-        except KeyError:
-            # This is a hack:
-            # If we're a subclass of enum, create a dynamic subclass on the
-            # fly and register it, it's necessary for enum.from_string to work.
-            if (issubclass(converter_type, enum) and
-                    not converter_type in self._converters):
-                return self.add(
-                    type(enum.__class__.__name__ + 'EnumConverter',
-                         (_EnumConverter,), dict(type=converter_type)))
+        converter = self._converters.get(converter_type)
+        if converter is not None:
+            return converter
+
+        if not isinstance(converter_type, type):
             raise KeyError(converter_type)
 
-        return converter
+        # This is a hack:
+        # If we're a subclass of enum, create a dynamic subclass on the
+        # fly and register it, it's necessary for enum.from_string to work.
+        if issubclass(converter_type, enum):
+            return self.add(
+                type(enum.__class__.__name__ + 'EnumConverter',
+                     (_EnumConverter,), dict(type=converter_type)))
+
+        # The converter of the closest registered base class, object
+        # is only used for itself
+        for base in converter_type.__mro__[1:-1]:
+            converter = self._converters.get(base)
+            if converter is not None:
+                return converter
+        raise KeyError(converter_type)
 
     def get_converters(self, base_classes=None):
         if base_classes is None:
@@ -148,8 +176,9 @@ class ConverterRegistry:
         return converters
 
     def check_supported(self, data_type):
-        converter = self._converters.get(data_type)
-        if converter is None:
+        try:
+            converter = self.get_converter(data_type)
+        except KeyError:
             supported = ', '.join(map(str, self._converters.keys()))
             raise TypeError(
                 "%s is not supported. Supported types are: %s"
@@ -186,6 +215,59 @@ class ConverterRegistry:
 
         return c.from_string(value)
 
+    def as_string_many(self, converter_type, values, format=None):
+        """
+        Convert a sequence of values to strings, the values which can't
+        be converted are reported instead of raising an exception
+        :param converter_type:
+        :param values: an iterable of values
+        :param format:
+        :returns: (strings, errors), errors is a list of
+          (index, ValidationError) and the strings of those values are None
+        """
+        c = self.get_converter(converter_type)
+        values = list(values)
+        if c.as_string is None:
+            return values, []
+
+        # Values of the wrong type are errors too, the others are
+        # converted together
+        valid = []
+        positions = []
+        errors = []
+        for index, value in enumerate(values):
+            if isinstance(value, c.type):
+                valid.append(value)
+                positions.append(index)
+            else:
+                errors.append((index, _wrong_type_error(value, c.type)))
+        if not errors:
+            return c.as_string_many(values, format=format)
+
+        strings = [None] * len(values)
+        converted, convert_errors = c.as_string_many(valid, format=format)
+        for index, string in zip(positions, converted):
+            strings[index] = string
+        errors.extend((positions[index], error)
+                      for index, error in convert_errors)
+        errors.sort(key=lambda error: error[0])
+        return strings, errors
+
+    def from_string_many(self, converter_type, values):
+        """
+        Convert a sequence of strings, the strings which can't be
+        converted are reported instead of raising an exception
+        :param converter_type:
+        :param values: an iterable of strings
+        :returns: (values, errors), errors is a list of
+          (index, ValidationError) and the values of those strings are None
+        """
+        c = self.get_converter(converter_type)
+        if c.from_string is None:
+            return list(values), []
+
+        return c.from_string_many(values)
+
     def str_to_type(self, value):
         for c in self._converters.values():
             if c.type.__name__ == value:
@@ -195,6 +277,53 @@ class ConverterRegistry:
 converter = ConverterRegistry()
 
 
+def _wrong_type_error(value, value_type):
+    return ValidationError('data: %s must be of %r not %r' % (
+        value, value_type, type(value)))
+
+
+def _convert_many(values, convert, value_type=None):
+    # Converts each value, collecting the validation errors. When
+    # value_type is set the values of other types, None included, are
+    # errors too
+    results = []
+    errors = []
+    for index, value in enumerate(values):
+        if value_type is not None and not isinstance(value, value_type):
+            results.append(None)
+            errors.append((index, _wrong_type_error(value, value_type)))
+            continue
+        try:
+            results.append(convert(value))
+        except ValidationError as error:
+            results.append(None)
+            errors.append((index, error))
+    return results, errors
+
+
+def _numbers_from_strings(values, number_type, error_message):
+    # from_string_many() of the numeric converters, the locale is only
+    # looked up once
+    filter = get_locale_snapshot().filter
+    results = []
+    errors = []
+    for index, value in enumerate(values):
+        if value == '':
+            results.append(ValueUnset)
+            continue
+        try:
+            value = filter(value)
+            results.append(number_type(value))
+            continue
+        except ValidationError as exc:
+            error = exc
+        except (ValueError, decimal.InvalidOperation):
+            error = ValidationError(error_message % value)
+        results.append(None)
+        errors.append((index, error))
+    return results, errors
+
+
 class BaseConverter(object):
     """
     Abstract converter used by all datatypes
@@ -230,6 +359,32 @@ class BaseConverter(object):
         :returns:
         """
 
+    def as_string_many(self, values, format=None):
+        """
+        Convert a sequence of values to strings using the specified
+        format, the values which can't be converted are reported instead
+        of raising an exception, like the values which are not of the
+        type of the converter, None included. This can be overriden by a
+        subclass to convert the values faster than :meth:`as_string`.
+        :param values: an iterable of values
+        :param format:
+        :returns: (strings, errors), errors is a list of
+          (index, ValidationError) and the strings of those values are None
+        """
+        as_string = self.as_string
+        return _convert_many(values,
+                             lambda value: as_string(value, format=format),
+                             self.type)
+
+    def from_string_many(self, values):
+        """
+        Convert a sequence of strings, see :meth:`as_string_many`.
+        :param values: an iterable of strings
+        :returns: (values, errors), errors is a list of
+          (index, ValidationError) and the values of those strings are None
+        """
+        return _convert_many(values, self.from_string)
+
     def get_mask(self):
         """
         Returns the mask of the entry or None if not specified.
@@ -285,6 +440,11 @@ class _IntConverter(BaseConverter):
         # use case of a port number, "3128" is desired, and not "3,128"
         return format % value
 
+    def as_string_many(self, values, format=None):
+        if format is None:
+            format = '%d'
+        return _convert_many(values, lambda value: format % value, self.type)
+
     def from_string(self, value):
         "Convert a string to an integer"
         if value == '':
@@ -297,6 +457,10 @@ class _IntConverter(BaseConverter):
             raise ValidationError(
                 _("%s could not be converted to an integer") % value)
 
+    def from_string_many(self, values):
+        return _numbers_from_strings(
+            values, self.type, _("%s could not be converted to an integer"))
+
 converter.add(_IntConverter)
 
 
@@ -353,11 +517,24 @@ class _FloatConverter(BaseConverter):
             # When format is '%g', if value is an integer, the result
             # will also be formated as an integer, so we add a '.0'
 
-            conv = get_localeconv()
-            as_str += conv.get('decimal_point') + '0'
+            as_str += get_locale_snapshot().decimal_point + '0'
 
         return as_str
 
+    def as_string_many(self, values, format=None):
+        snapshot = get_locale_snapshot()
+        if format is not None or snapshot.decimal_point != '.' or (
+                snapshot.grouping and snapshot.thousands_sep):
+            return BaseConverter.as_string_many(self, values, format)
+
+        # lformat() would not change what % returns
+        def as_string(value):
+            as_str = '%.12g' % value
+            if not value % 1:
+                as_str += '.0'
+            return as_str
+        return _convert_many(values, as_string, self.type)
+
     def from_string(self, value):
         """Convert a string to a float"""
 
@@ -373,6 +550,10 @@ class _FloatConverter(BaseConverter):
 
         return retval
 
+    def from_string_many(self, values):
+        return _numbers_from_strings(
+            values, float, _("This field requires a number, not %r"))
+
 converter.add(_FloatConverter)
 
 
@@ -396,6 +577,11 @@ class _DecimalConverter(_FloatConverter):
 
         return retval
 
+    def from_string_many(self, values):
+        return _numbers_from_strings(
+            values, decimal.Decimal,
+            _("This field requires a number, not %r"))
+
 converter.add(_DecimalConverter)
 
 # Constants for use with win32
@@ -433,6 +619,118 @@ DATE_MASK_TABLE = {
 }
 
 
+# The patterns time.strptime() uses for the numeric directives, the
+# str.format() fields used to format them and their position in the
+# tuple returned by strptime(), the other directives are handled by
+# strptime()/strftime()
+_DATE_DIRECTIVES = {
+    'd': (r'(3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])', '{0.day:02d}', 2),
+    'm': (r'(1[0-2]|0[1-9]|[1-9])', '{0.month:02d}', 1),
+    'y': (r'(\d\d)', '{1:02d}', 0),
+    'Y': (r'(\d\d\d\d)', '{0.year:04d}', 0),
+    'H': (r'(2[0-3]|[0-1]\d|\d)', '{0.hour:02d}', 3),
+    'M': (r'([0-5]\d|\d)', '{0.minute:02d}', 4),
+    'S': (r'(6[0-1]|[0-5]\d|\d)', '{0.second:02d}', 5),
+}
+
+# format -> _DateFormat
+_date_formats = {}
+
+
+class _DateFormat(object):
+    """A strftime format compiled to a regular expression and to a
+    str.format() template, when it only has numeric directives
+    """
+
+    def __init__(self, format):
+        self.format = format
+        self._regex = None
+        self._template = None
+        self._short_year = False
+        # The positions of the groups of the regex in the parsed tuple
+        self._positions = []
+
+        patterns = []
+        fields = []
+        directives = set()
+        i = 0
+        while i < len(format):
+            char = format[i]
+            if char == '%':
+                directive = format[i + 1:i + 2]
+                i += 2
+                if directive == '%':
+                    patterns.append('%')
+                    fields.append('%')
+                    continue
+                if directive not in _DATE_DIRECTIVES or (
+                        directive in directives) or (
+                        directive in 'yY' and directives & set('yY')):
+                    # Leave it to strptime()/strftime()
+                    return
+                directives.add(directive)
+                pattern, field, position = _DATE_DIRECTIVES[directive]
+                self._positions.append(position)
+                patterns.append(pattern)
+                fields.append(field)
+            else:
+                i += 1
+                if char.isspace():
+                    # Like strptime(), any whitespace matches
+                    if patterns[-1:] != [r'\s+']:
+                        patterns.append(r'\s+')
+                else:
+                    patterns.append(re.escape(char))
+                fields.append(char.replace('{', '{{').replace('}', '}}'))
+
+        self._regex = re.compile(''.join(patterns), re.IGNORECASE)
+        self._template = ''.join(fields)
+        self._short_year = 'y' in directives
+
+    def as_string(self, value):
+        if self._template is not None:
+            try:
+                if self._short_year:
+                    return self._template.format(value, value.year % 100)
+                return self._template.format(value)
+            except AttributeError:
+                # Eg. a date formatted with hours
+                pass
+        return value.strftime(self.format)
+
+    def parse(self, value):
+        """Returns [year, month, day, hour, minute, second] like the
+        first items of the tuple returned by time.strptime()
+
+        :raises: ValueError if value does not match the format
+        """
+        if self._regex is None:
+            return time.strptime(value, self.format)
+
+        # match() and not fullmatch() to accept the same strings
+        # as strptime()
+        found = self._regex.match(value)
+        if found is None or found.end() != len(value):
+            raise ValueError(value)
+        dateinfo = [1900, 1, 1, 0, 0, 0]
+        for position, text in zip(self._positions, found.groups()):
+            dateinfo[position] = int(text)
+        if self._short_year:
+            if dateinfo[0] <= 68:
+                dateinfo[0] += 2000
+            else:
+                dateinfo[0] += 1900
+        # Invalid days like 30/02 are refused by from_dateinfo()
+        return dateinfo
+
+
+def _get_date_format(format):
+    date_format = _date_formats.get(format)
+    if date_format is None:
+        date_format = _date_formats[format] = _DateFormat(format)
+    return date_format
+
+
 class _BaseDateTimeConverter(BaseConverter):
     """
     Abstract class for converting datatime objects to and from strings
@@ -473,6 +771,14 @@ class _BaseDateTimeConverter(BaseConverter):
         return _datecmp
 
     def get_format(self):
+        formats = get_locale_snapshot().date_formats
+        key = (self.__class__, self._keep_am_pm, self._keep_seconds)
+        format = formats.get(key)
+        if format is None:
+            format = formats[key] = self._get_locale_format()
+        return format
+
+    def _get_locale_format(self):
         if sys.platform == 'win32':
             values = []
             for constant in self.get_lang_constant_win32():
@@ -510,9 +816,14 @@ class _BaseDateTimeConverter(BaseConverter):
                          format.split(' ') if f.strip('.: ')])
 
     def get_mask(self):
-        mask = self.get_format()
-        for format_char, mask_char in DATE_MASK_TABLE.items():
-            mask = mask.replace(format_char, mask_char[0])
+        format = self.get_format()
+        masks = get_locale_snapshot().date_formats
+        mask = masks.get(('mask', format))
+        if mask is None:
+            mask = format
+            for format_char, mask_char in DATE_MASK_TABLE.items():
+                mask = mask.replace(format_char, mask_char[0])
+            masks[('mask', format)] = mask
 
         return mask
 
@@ -530,7 +841,14 @@ class _BaseDateTimeConverter(BaseConverter):
                     _("You cannot enter a year before 1900"))
 
         # strftime is appending an empty space on some cases, so strip them
-        return value.strftime(format).strip()
+        return _get_date_format(format).as_string(value).strip()
+
+    def as_string_many(self, values, format=None):
+        if format is None:
+            format = self.get_format()
+        as_string = self.as_string
+        return _convert_many(values, lambda value: as_string(value, format),
+                             self.type)
 
     def _convert_format(self, format):
         "Convert the format string to a 'human-readable' format"
@@ -549,16 +867,19 @@ class _BaseDateTimeConverter(BaseConverter):
         # perhaps we should add macros, to be able to write
         # yyyy instead of %Y
 
-        format = self.get_format()
+        return self._from_string(value, _get_date_format(self.get_format()))
+
+    def _from_string(self, value, date_format):
         try:
             # time.strptime (python 2.4) does not support %r
             # pending SF bug #1396946
-            dateinfo = time.strptime(value, format)
+            dateinfo = date_format.parse(value)
             date = self.from_dateinfo(dateinfo)
         except ValueError:
             raise ValidationError(
                 _('This field requires a date of the format "%s" and '
-                  'not "%s"') % (self._convert_format(format), value))
+                  'not "%s"') % (self._convert_format(date_format.format),
+                                 value))
 
         if isinstance(date, (datetime.date, datetime.datetime)):
             if date.year < 1900:
@@ -566,6 +887,13 @@ class _BaseDateTimeConverter(BaseConverter):
                     _("You cannot enter a year before 1900"))
         return date
 
+    def from_string_many(self, values):
+        date_format = _get_date_format(self.get_format())
+        from_string = self._from_string
+        return _convert_many(
+            values, lambda value: (from_string(value, date_format)
+                                   if value != "" else None))
+
 
 class _TimeConverter(_BaseDateTimeConverter):
     type = datetime.time
@@ -657,30 +985,145 @@ def lformat(format, value):
     return locale.format(format, value, 1)
 
 
-def get_localeconv():
-    conv = locale.localeconv()
+class LocaleSnapshot(object):
+    """The numeric, monetary and time conventions of a locale, computed
+    once and shared until the locale changes, see
+    :func:`get_locale_snapshot`.
 
-    monetary_locale = locale.getlocale(locale.LC_MONETARY)
-    numeric_locale = locale.getlocale(locale.LC_NUMERIC)
-    # Patching glibc's output
-    # See http://sources.redhat.com/bugzilla/show_bug.cgi?id=1294
-    if monetary_locale[0] == 'pt_BR':
-        conv['p_cs_precedes'] = 1
-        conv['p_sep_by_space'] = 1
+    :attribute conv: the result of locale.localeconv(), patched for the
+      pt_BR and C locales. It must not be modified
+    :attribute date_formats: the formats of the date and time converters,
+      filled by them
+    """
+
+    def __init__(self):
+        conv = locale.localeconv()
+
+        monetary_locale = locale.getlocale(locale.LC_MONETARY)
+        numeric_locale = locale.getlocale(locale.LC_NUMERIC)
+        # Patching glibc's output
+        # See http://sources.redhat.com/bugzilla/show_bug.cgi?id=1294
+        if monetary_locale[0] == 'pt_BR':
+            conv['p_cs_precedes'] = 1
+            conv['p_sep_by_space'] = 1
+
+        # Since locale 'C' doesn't have any information on monetary and
+        # numeric locale, use default en_US, so we can have formated numbers
+        if not monetary_locale[0]:
+            conv["negative_sign"] = '-'
+            conv["currency_symbol"] = '$'
+            conv['mon_thousands_sep'] = ''
+            conv['mon_decimal_point'] = '.'
+            conv['p_sep_by_space'] = 0
+
+        if not numeric_locale[0]:
+            conv['decimal_point'] = '.'
+
+        self.conv = conv
+        self.decimal_point = conv['decimal_point']
+        self.thousands_sep = conv['thousands_sep']
+        self.grouping = conv['grouping']
+        self.mon_decimal_point = conv['mon_decimal_point']
+        self.mon_thousands_sep = conv['mon_thousands_sep']
+        self.mon_grouping = conv['mon_grouping']
+        self.currency_symbol = conv['currency_symbol']
+        self.date_formats = {}
+        # Validates the integer part of a number with thousand separators
+        self._grouped_re = {}
+        for sep in (self.thousands_sep, self.mon_thousands_sep):
+            if sep and sep not in self._grouped_re:
+                other = '(?:(?!%s).)' % (re.escape(sep), )
+                self._grouped_re[sep] = re.compile(
+                    '%s+(?:%s%s{3})*\\Z' % (other, re.escape(sep), other),
+                    re.DOTALL)
+
+    def filter(self, value, monetary=False):
+        """Removes the locale specific data from value, see
+        :func:`filter_locale`
+        """
+        if monetary:
+            decimal_point = self.mon_decimal_point
+            sep = self.mon_thousands_sep
+        else:
+            decimal_point = self.decimal_point
+            sep = self.thousands_sep
+
+        # Check so we only have one decimal point
+        decimal_points = 0
+        if decimal_point != '':
+            decimal_points = value.count(decimal_point)
+            if decimal_points > 1:
+                raise ValidationError(
+                    _('You have more than one decimal point ("%s") '
+                      ' in your number "%s"' % (decimal_point, value)))
+
+        if sep and sep in value:
+            # Check so we don't have any thousand separators to the right
+            # of the decimal point
+            if decimal_points:
+                decimal_point_pos = value.index(decimal_point)
+                if sep in value[decimal_point_pos + 1:]:
+                    raise ValidationError(_("You have a thousand separator "
+                                            "to the right of the decimal "
+                                            "point"))
+                check_value = value[:decimal_point_pos]
+            else:
+                check_value = value
+
+            # Verify so the thousand separators are placed properly
+            # TODO: Use the grouping for locales where it's not 3
+            if not self._grouped_re[sep].match(check_value):
+                parts = check_value.split(sep)
+                # First part is a special case, It can be 1, 2 or 3
+                if not parts[0]:
+                    raise ValidationError(
+                        _("Inproperly placed thousands separator"))
+                # Middle parts should have a length of 3
+                raise ValidationError(_("Inproperly placed thousand "
+                                        "separators: %r" % (parts,)))
 
-    # Since locale 'C' doesn't have any information on monetary and numeric
-    # locale, use default en_US, so we can have formated numbers
-    if not monetary_locale[0]:
-        conv["negative_sign"] = '-'
-        conv["currency_symbol"] = '$'
-        conv['mon_thousands_sep'] = ''
-        conv['mon_decimal_point'] = '.'
-        conv['p_sep_by_space'] = 0
+            # Remove all thousand separators
+            value = value.replace(sep, '')
 
-    if not numeric_locale[0]:
-        conv['decimal_point'] = '.'
+        # Replace all decimal points with .
+        if decimal_point != '.' and decimal_point != '':
+            value = value.replace(decimal_point, '.')
+        return value
 
-    return conv
+
+# (LC_NUMERIC, LC_MONETARY, LC_TIME) -> LocaleSnapshot
+_locale_snapshots = {}
+
+
+def get_locale_snapshot():
+    """Returns the :class:`LocaleSnapshot` of the current locale. It is
+    computed the first time a locale is used and reused while it is
+    current, so the conventions follow locale.setlocale().
+    """
+    # Querying the names of the locales is much cheaper than
+    # localeconv() and nl_langinfo()
+    setlocale = locale.setlocale
+    key = (setlocale(locale.LC_NUMERIC), setlocale(locale.LC_MONETARY),
+           setlocale(locale.LC_TIME))
+    snapshot = _locale_snapshots.get(key)
+    if snapshot is None:
+        snapshot = _locale_snapshots[key] = LocaleSnapshot()
+    return snapshot
+
+
+def locale_changed():
+    """Forgets the conventions of all the locales, so they are computed
+    again. This is only needed when the conventions of a locale change
+    without changing its name, like when C code modifies them.
+    """
+    _locale_snapshots.clear()
+
+
+def get_localeconv():
+    """Returns locale.localeconv() patched for the pt_BR and C locales,
+    a copy of the conv of :func:`get_locale_snapshot`
+    """
+    return dict(get_locale_snapshot().conv)
 
 
 def filter_locale(value, monetary=False):
@@ -694,64 +1137,4 @@ def filter_locale(value, monetary=False):
     :param monetary: if we should treat it as monetary data or not
     :returns: the value without locale specific data
     """
-
-    def _filter_thousands_sep(value, thousands_sep):
-        if not thousands_sep:
-            return value
-
-        # Check so we don't have any thousand separators to the right
-        # of the decimal point
-        th_sep_count = value.count(thousands_sep)
-        if th_sep_count and decimal_points:
-            decimal_point_pos = value.index(decimal_point)
-            if thousands_sep in value[decimal_point_pos + 1:]:
-                raise ValidationError(_("You have a thousand separator to the "
-                                        "right of the decimal point"))
-            check_value = value[:decimal_point_pos]
-        else:
-            check_value = value
-
-        # Verify so the thousand separators are placed properly
-        # TODO: Use conv['grouping'] for locales where it's not 3
-        parts = check_value.split(thousands_sep)
-
-        # First part is a special case, It can be 1, 2 or 3
-        if 3 > len(parts[0]) < 1:
-            raise ValidationError(_("Inproperly placed thousands separator"))
-
-        # Middle parts should have a length of 3
-        for part in parts[1:]:
-            if len(part) != 3:
-                raise ValidationError(_("Inproperly placed thousand "
-                                        "separators: %r" % (parts,)))
-
-        # Remove all thousand separators
-        return value.replace(thousands_sep, '')
-
-    conv = get_localeconv()
-
-    # Check so we only have one decimal point
-    if monetary:
-        decimal_point = conv["mon_decimal_point"]
-    else:
-        decimal_point = conv["decimal_point"]
-
-    if decimal_point != '':
-        decimal_points = value.count(decimal_point)
-        if decimal_points > 1:
-            raise ValidationError(
-                _('You have more than one decimal point ("%s") '
-                  ' in your number "%s"' % (decimal_point, value)))
-
-    if monetary:
-        sep = conv["mon_thousands_sep"]
-    else:
-        sep = conv["thousands_sep"]
-
-    if sep and sep in value:
-        value = _filter_thousands_sep(value, sep)
-
-    # Replace all decimal points with .
-    if decimal_point != '.' and decimal_point != '':
-        value = value.replace(decimal_point, '.')
-    return value
+    return get_locale_snapshot().filter(value, monetary)
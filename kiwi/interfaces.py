@@ -177,3 +177,23 @@ class AbstractGladeAdaptor(Interface):
         """Connect the signals in the keys of dict with the objects in the
         values of dic
         """
+
+
+class IRowProvider(Interface):
+    """A source of rows for an ObjectList in virtual mode, see
+    :meth:`kiwi.ui.objectlist.ObjectList.set_row_provider`.
+
+    Rows are requested in pages, only when the view needs them, so the
+    provider never has to materialize the whole result set.
+    """
+
+    def count():
+        """Returns the total number of rows"""
+
+    def fetch(offset, limit):
+        """Returns a sequence with at most limit rows, starting at offset"""
+
+    def index(instance):
+        """Optional. Returns the position of instance or raises ValueError
+        if it is not part of the rows. When this is not implemented only
+        rows which are already fetched can be looked up"""
@@ -27,23 +27,35 @@
 """High level wrapper for GtkTreeView"""
 
 
+import bisect
 import datetime
 import decimal
 import collections
+import contextlib
+import csv
+import functools
 import gettext
+import heapq
+import itertools
 import locale
 import logging
+import operator
 import pickle
+import threading
+import time
+
 import six
+from six.moves import queue
 
 from gi.repository import Gtk, GLib, GObject, Gdk, Pango, GdkPixbuf
 
 from kiwi import ValueUnset
-from kiwi.accessor import kgetattr
+from kiwi.accessor import kgetattr, kgetattr_many
 from kiwi.datatypes import converter, number, ValidationError
 from kiwi.currency import currency  # after datatypes
+from kiwi.currency import get_currency_formatter
 from kiwi.enums import Alignment
-from kiwi.python import cmp, enum, slicerange
+from kiwi.python import cmp, enum, slicerange, strip_accents
 from kiwi.utils import gsignal, type_register
 from kiwi.ui.widgets.contextmenu import ContextMenu
 from kiwi.ui.cellrenderer import EditableTextRenderer, EditableSpinRenderer
@@ -52,6 +64,63 @@ _ = lambda m: gettext.dgettext('kiwi', m)
 
 log = logging.getLogger('objectlist')
 
+# Data types which are always formatted by their converter
+_CONVERTED_TYPES = (float, decimal.Decimal, currency, datetime.date,
+                    datetime.datetime, datetime.time)
+
+# Currency values are stored in native columns as an integer number of
+# ten-thousandths, which keeps the exact order of prices
+_CURRENCY_SCALE = 10000
+_INT64_MIN = -2 ** 63
+
+# Data types which can be stored in a native column:
+# data type -> (GType, converter to the stored value, value stored for None)
+_NATIVE_COLUMN_TYPES = {
+    # The default data type of a Column, its values are not always strings
+    str: (GObject.TYPE_STRING, six.text_type, None),
+    int: (GObject.TYPE_INT64, int, _INT64_MIN),
+    float: (GObject.TYPE_DOUBLE, float, float('-inf')),
+    bool: (GObject.TYPE_BOOLEAN, bool, False),
+    datetime.date: (GObject.TYPE_INT64, datetime.date.toordinal, _INT64_MIN),
+    currency: (GObject.TYPE_INT64,
+               lambda value: int(value * _CURRENCY_SCALE), _INT64_MIN),
+}
+
+# Properties of a Column which change the text of its cells
+_TEXT_PROPERTIES = frozenset(['attribute', 'format', 'format-func',
+                              'format-func-data', 'use-markup'])
+
+# Progressive loading inserts rows for this many seconds in each
+# iteration of the main loop, checking the time every few rows
+_LOADING_CHUNK_TIME = 0.05
+_LOADING_CHECK_ROWS = 64
+
+# Exports snapshot this many rows at once, at most _EXPORT_QUEUE_CHUNKS
+# chunks wait to be written
+_EXPORT_CHUNK_ROWS = 500
+_EXPORT_QUEUE_CHUNKS = 4
+
+# The width of the text columns is estimated from this many rows and
+# this many of the longest cached texts, plus the padding of the cell
+# and of the header button
+_AUTOSIZE_SAMPLE_ROWS = 100
+_AUTOSIZE_CACHED_TEXTS = 10
+_AUTOSIZE_PADDING = 8
+_AUTOSIZE_HEADER_PADDING = 24
+
+# get_cell_contents() extracts the values of this many rows at once
+_CELL_CONTENTS_CHUNK_ROWS = 1000
+
+# Aggregates add and subtract without rounding
+_EXACT_CONTEXT = decimal.Context(prec=decimal.MAX_PREC)
+
+
+def _to_exact(value):
+    if isinstance(value, decimal.Decimal):
+        return value
+    # Decimal(float) is the exact value of the float
+    return decimal.Decimal(value)
+
 
 def str2enum(value_name, enum_class):
     "converts a string to a enum"
@@ -92,8 +161,9 @@ class Column(GObject.GObject):
           in the list.
       - B{width}: integer I{65535}
         - the width in pixels of the column, if not set, uses the default to
-          ObjectList. If no Column specifies a width, columns_autosize() will
-          be called on the ObjectList upon append() or the first add_list().
+          ObjectList. If no Column specifies a width, the width of the text
+          columns is estimated from the first rows upon append() or the
+          first add_list() and then fixed.
       - B{sorted}: bool I{False}
         - whether or not the ObjectList is to be sorted by this column.
           If no Columns are sorted, the ObjectList will be created unsorted.
@@ -227,6 +297,10 @@ class Column(GObject.GObject):
             raise AttributeError(msg)
 
         self._objectlist = None
+        self._formatter = None
+        self._renderer = None
+        self._renderer_prop = None
+        self.treeview_column = None
         self.compare = None
         self.from_string = None
 
@@ -281,6 +355,8 @@ class Column(GObject.GObject):
         if not 'ellipsize' in kwargs and self.expand:
             self.ellipsize = Pango.EllipsizeMode.END
 
+        self.connect('notify', self._on_notify)
+
     def __repr__(self):
         namespace = self.__dict__.copy()
         # Dont know why yet, but we have to remove the compare key, otherwise,
@@ -304,6 +380,7 @@ class Column(GObject.GObject):
             self.compare = self.compare or compare_func
             self.from_string = conv.from_string
         self._data_type = data
+        self._formatter = None
     data_type = GObject.Property(getter=_get_data_type,
                                  setter=_set_data_type,
                                  type=object)
@@ -344,17 +421,9 @@ class Column(GObject.GObject):
         if self.font_desc:
             renderer.set_property('font-desc',
                                   Pango.FontDescription(self.font_desc))
-        if self.use_stock:
-            cell_data_func = self._cell_data_pixbuf_func
-        elif issubclass(self.data_type, enum):
-            cell_data_func = self._cell_data_combo_func
-        elif issubclass(self.data_type, number) and self.spin_adjustment:
-            cell_data_func = self._cell_data_spin_func
-        else:
-            cell_data_func = self._cell_data_text_func
-
-        if self.cell_data_func:
-            cell_data_func = self.cell_data_func
+        self._renderer = renderer
+        self._renderer_prop = renderer_prop
+        cell_data_func = self._create_cell_data_func(renderer, renderer_prop)
 
         # This is a bit hackish, we should probably
         # add a proper api to determine the expanding of
@@ -482,6 +551,213 @@ class Column(GObject.GObject):
 
         return renderer, prop
 
+    def _get_cell_text(self, obj):
+        cache = self._objectlist._cell_text_cache
+        if cache is None:
+            data = self.get_attribute(obj, self.attribute, None)
+            return self.as_string(data, obj)
+
+        text = cache.get(obj, self)
+        if text is _marker:
+            data = self.get_attribute(obj, self.attribute, None)
+            text = self.as_string(data, obj)
+            cache.set(obj, self, text)
+        return text
+
+    def _on_notify(self, column, pspec):
+        # Changing a property might change the branches we need
+        self._formatter = None
+        if self.treeview_column is not None:
+            self.treeview_column.set_cell_data_func(
+                self._renderer,
+                self._create_cell_data_func(self._renderer,
+                                            self._renderer_prop),
+                (self, self._renderer_prop))
+
+    def _create_formatter(self):
+        """Creates a function which formats a value like :meth:`as_string`,
+        with the branch for the configuration of this column already chosen
+        and the converter already looked up.
+        """
+        data_type = self.data_type
+        format_func = self.format_func
+        format_func_data = self.format_func_data
+        # Pixbufs are not converted to strings
+        none_as_empty = data_type != GdkPixbuf.Pixbuf
+
+        if format_func and format_func_data is None:
+            def format_value(data, obj=None):
+                if data is None and none_as_empty:
+                    return ''
+                return format_func(data)
+            return format_value
+
+        if data_type is currency and not self.format:
+            # Like the as_string() of the converter, with the formatter
+            # of the locale and of the settings of the converter
+            conv = converter.get_converter(currency)
+
+            def format_value(data, obj=None):
+                if data is None or data == ValueUnset:
+                    return ''
+                if not isinstance(data, currency):
+                    try:
+                        data = currency(data)
+                    except ValueError:
+                        raise ValidationError(
+                            _("%s can not be converted to a currency") %
+                            data)
+                return get_currency_formatter(
+                    conv.symbol, conv.precision).format(data)
+        elif (self.format or data_type in _CONVERTED_TYPES or
+                issubclass(data_type, enum)):
+            conv_as_string = converter.get_converter(data_type).as_string
+            format = self.format or None
+
+            def format_value(data, obj=None):
+                if data is None and none_as_empty:
+                    return ''
+                return conv_as_string(data, format=format)
+        # Actually the expected data type depends on the renderer,
+        # but this is pragmatic workaround
+        elif data_type is bool:
+            def format_value(data, obj=None):
+                if data is None:
+                    return ''
+                return data
+        else:
+            def format_value(data, obj=None):
+                if data is None and none_as_empty:
+                    return ''
+                return str(data)
+
+        if format_func:
+            # format_func_data is set, format_func receives the object,
+            # if we have one
+            fallback = format_value
+
+            def format_value(data, obj=None):
+                if data is None and none_as_empty:
+                    return ''
+                if obj:
+                    return format_func(obj, format_func_data)
+                return fallback(data, obj)
+        return format_value
+
+    def _create_cell_data_func(self, renderer, renderer_prop):
+        """Chooses or creates the function used to render the cells of
+        this column. Text and combo columns get a function specialized
+        for the configuration of the column, which only does the checks
+        it needs.
+        """
+        if self.cell_data_func:
+            return self.cell_data_func
+        elif self.use_stock:
+            return self._cell_data_pixbuf_func
+        elif issubclass(self.data_type, enum):
+            if (type(self)._cell_data_combo_func is not
+                    Column._cell_data_combo_func):
+                # A subclass is customizing the rendering
+                return self._cell_data_combo_func
+            return self._create_cell_data_combo_func()
+        elif issubclass(self.data_type, number) and self.spin_adjustment:
+            return self._cell_data_spin_func
+        elif type(self)._cell_data_text_func is not Column._cell_data_text_func:
+            return self._cell_data_text_func
+        return self._create_cell_data_text_func(renderer, renderer_prop)
+
+    def _create_get_text(self):
+        column = self
+        objectlist = self._objectlist
+        attribute = self.attribute
+        get_attribute = self.get_attribute
+        if type(self).as_string is Column.as_string:
+            format_value = self._create_formatter()
+        else:
+            format_value = self.as_string
+
+        def get_text(obj):
+            cache = objectlist._cell_text_cache
+            if cache is None:
+                return format_value(get_attribute(obj, attribute, None), obj)
+
+            text = cache.get(obj, column)
+            if text is _marker:
+                text = format_value(get_attribute(obj, attribute, None), obj)
+                cache.set(obj, column, text)
+            return text
+        return get_text
+
+    def _create_cell_data_text_func(self, renderer, renderer_prop):
+        column = self
+        objectlist = self._objectlist
+        get_text = self._create_get_text()
+        get_attribute = self.get_attribute
+        renderer_func = self.renderer_func
+        editable_attribute = self.editable_attribute
+        clear_empty = isinstance(renderer, Gtk.CellRendererText)
+
+        if not editable_attribute and renderer_func is None:
+            # The common case, a read-only text column
+            def cell_data_func(tree_column, renderer, model, treeiter,
+                               col_data):
+                obj = model.get_value(treeiter, COL_MODEL)
+                if obj is empty_marker:
+                    if clear_empty:
+                        renderer.set_property(renderer_prop, '')
+                    return
+
+                text = get_text(obj)
+                if objectlist.cell_data_func:
+                    text = objectlist.cell_data_func(column, renderer, obj,
+                                                     text)
+                try:
+                    renderer.set_property(renderer_prop, text)
+                except TypeError:
+                    renderer.set_property(renderer_prop, str(text))
+            return cell_data_func
+
+        if not editable_attribute:
+            editable_prop = None
+        elif isinstance(renderer, Gtk.CellRendererToggle):
+            editable_prop = 'activatable'
+        elif isinstance(renderer, Gtk.CellRendererText):
+            editable_prop = 'editable'
+        else:
+            raise AssertionError
+
+        def cell_data_func(tree_column, renderer, model, treeiter, col_data):
+            obj = model.get_value(treeiter, COL_MODEL)
+            if obj is empty_marker:
+                if clear_empty:
+                    renderer.set_property(renderer_prop, '')
+            else:
+                if editable_prop is not None:
+                    renderer.set_property(
+                        editable_prop,
+                        get_attribute(obj, editable_attribute, None))
+
+                text = get_text(obj)
+                if objectlist.cell_data_func:
+                    text = objectlist.cell_data_func(column, renderer, obj,
+                                                     text)
+                try:
+                    renderer.set_property(renderer_prop, text)
+                except TypeError:
+                    renderer.set_property(renderer_prop, str(text))
+
+            if renderer_func is not None:
+                renderer_func(renderer, obj)
+        return cell_data_func
+
+    def _create_cell_data_combo_func(self):
+        get_text = self._create_get_text()
+
+        def cell_data_func(tree_column, renderer, model, treeiter, col_data):
+            text = get_text(model.get_value(treeiter, COL_MODEL))
+            renderer.set_property('text', text.lower().capitalize())
+        return cell_data_func
+
     # CellRenderers
     def _cell_data_text_func(self, tree_column, renderer, model, treeiter, col_data):
         "To render the data of a cell renderer text"
@@ -498,8 +774,7 @@ class Column(GObject.GObject):
             else:
                 raise AssertionError
 
-        data = column.get_attribute(obj, column.attribute, None)
-        text = column.as_string(data, obj)
+        text = column._get_cell_text(obj)
 
         if self._objectlist.cell_data_func and obj is not empty_marker:
             text = self._objectlist.cell_data_func(self, renderer, obj, text)
@@ -530,8 +805,7 @@ class Column(GObject.GObject):
         column, renderer_prop = col_data
         row = model[treeiter]
         obj = row[COL_MODEL]
-        data = column.get_attribute(obj, column.attribute, None)
-        text = column.as_string(data, obj)
+        text = column._get_cell_text(obj)
         renderer.set_property('text', text.lower().capitalize())
 
     def _cell_data_spin_func(self, tree_column, renderer, model, treeiter, col_data):
@@ -544,8 +818,7 @@ class Column(GObject.GObject):
             renderer.set_property('editable', data)
 
         obj = row[COL_MODEL]
-        data = column.get_attribute(obj, column.attribute, None)
-        text = column.as_string(data, obj)
+        text = column._get_cell_text(obj)
 
         if self._objectlist.cell_data_func and obj is not empty_marker:
             text = self._objectlist.cell_data_func(self, renderer, obj, text)
@@ -656,6 +929,16 @@ class Column(GObject.GObject):
     # a staticmethod as an optimization, so we can avoid a function call.
     get_attribute = staticmethod(kgetattr)
 
+    def _get_attribute_values(self, instances):
+        # The values of the attribute for a list of instances, extracted
+        # in bulk unless get_attribute() was overridden
+        if self.get_attribute is kgetattr:
+            return kgetattr_many(instances, self.attribute, None)
+        get_attribute = self.get_attribute
+        attribute = self.attribute
+        return [get_attribute(instance, attribute, None)
+                for instance in instances]
+
     def as_string(self, data, obj=None):
         """
         Formats the column as a string that should be renderd into the cell.
@@ -664,31 +947,10 @@ class Column(GObject.GObject):
         :param obj: Necessary only when format_func_data is set. This will make
                     format_func receive I{obj} instead of I{data}
         """
-        data_type = self.data_type
-        if data is None and data_type != GdkPixbuf.Pixbuf:
-            text = ''
-        elif self.format_func and self.format_func_data is not None and obj:
-            text = self.format_func(obj, self.format_func_data)
-        elif self.format_func and self.format_func_data is None:
-            text = self.format_func(data)
-        elif (self.format or
-              data_type == float or
-              data_type == decimal.Decimal or
-              data_type == currency or
-              data_type == datetime.date or
-              data_type == datetime.datetime or
-              data_type == datetime.time or
-              issubclass(data_type, enum)):
-            conv = converter.get_converter(data_type)
-            text = conv.as_string(data, format=self.format or None)
-        # Actually the expected data type depends on the renderer,
-        # but this is pragmatic workaround
-        elif data_type is bool:
-            text = data
-        else:
-            text = str(data)
-
-        return text
+        formatter = self._formatter
+        if formatter is None:
+            formatter = self._formatter = self._create_formatter()
+        return formatter(data, obj)
 
     def set_spinbutton_precision_digits(self, digits):
         """Set the number of precision digits to be shown in the
@@ -801,6 +1063,483 @@ class ColoredColumn(Column):
         renderer.set_property('foreground-gdk', color)
 
 
+class ColumnFilter(object):
+    """
+    A predicate on an attribute of the instances of an
+    :class:`ObjectList`, see :meth:`ObjectList.set_filter`.
+
+    Filters do not look at the instances one by one when the filter
+    is set, they use an index of the values of the attribute which is
+    shared by all the filters on that attribute.
+    """
+
+    def __init__(self, attribute):
+        self.attribute = attribute
+
+    def match(self, index, instance):
+        """
+        Returns True if instance matches the filter
+
+        :param index: the index of the attribute
+        :param instance: the instance
+        """
+        raise NotImplementedError
+
+    def select(self, index, candidates=None):
+        """
+        Returns a set with the matching instances
+
+        :param index: the index of the attribute
+        :param candidates: if not None, only these instances are checked
+        """
+        if candidates is None:
+            candidates = index.get_instances()
+        return set(instance for instance in candidates
+                   if self.match(index, instance))
+
+    def is_narrower(self, other):
+        """
+        Returns True if all the instances matching this filter also
+        match other, which allows refining the previous result
+        instead of checking all the rows again.
+
+        :param other: another filter
+        """
+        return False
+
+
+class _TextFilter(ColumnFilter):
+    def __init__(self, attribute, text, ignore_case=True,
+                 ignore_accents=True):
+        ColumnFilter.__init__(self, attribute)
+        self.ignore_case = ignore_case
+        self.ignore_accents = ignore_accents
+        self.text = text
+        self.key = _normalize_text(text, ignore_case, ignore_accents)
+
+    def _is_comparable(self, other):
+        return (type(other) is type(self) and
+                other.attribute == self.attribute and
+                other.ignore_case == self.ignore_case and
+                other.ignore_accents == self.ignore_accents)
+
+
+class PrefixFilter(_TextFilter):
+    """
+    Matches the rows where the text of the attribute starts with text
+
+    :param attribute: the attribute
+    :param text: the prefix
+    :param ignore_case: if the case should be ignored
+    :param ignore_accents: if the accents should be ignored
+    """
+
+    def match(self, index, instance):
+        return index.get_text(instance, self.ignore_case,
+                              self.ignore_accents).startswith(self.key)
+
+    def select(self, index, candidates=None):
+        if candidates is not None:
+            return ColumnFilter.select(self, index, candidates)
+        texts, instances = index.get_sorted_texts(self.ignore_case,
+                                                  self.ignore_accents)
+        start = bisect.bisect_left(texts, self.key)
+        end = bisect.bisect_left(texts, self.key + u'\U0010ffff', start)
+        return set(instances[start:end])
+
+    def is_narrower(self, other):
+        return (self._is_comparable(other) and
+                self.key.startswith(other.key))
+
+
+class SubstringFilter(_TextFilter):
+    """
+    Matches the rows where the text of the attribute contains text
+
+    :param attribute: the attribute
+    :param text: the text to search for
+    :param ignore_case: if the case should be ignored
+    :param ignore_accents: if the accents should be ignored
+    """
+
+    def match(self, index, instance):
+        return self.key in index.get_text(instance, self.ignore_case,
+                                          self.ignore_accents)
+
+    def select(self, index, candidates=None):
+        key = self.key
+        texts = index.get_texts(self.ignore_case, self.ignore_accents)
+        if candidates is None:
+            return set(instance for instance, text in texts.items()
+                       if key in text)
+        return ColumnFilter.select(self, index, candidates)
+
+    def is_narrower(self, other):
+        return self._is_comparable(other) and other.key in self.key
+
+
+class RangeFilter(ColumnFilter):
+    """
+    Matches the rows where the attribute is between start and end,
+    inclusive. None values never match.
+
+    :param attribute: the attribute
+    :param start: the lowest value or None for no lower limit
+    :param end: the highest value or None for no upper limit
+    """
+
+    def __init__(self, attribute, start=None, end=None):
+        ColumnFilter.__init__(self, attribute)
+        self.start = start
+        self.end = end
+
+    def match(self, index, instance):
+        value = index.get_value(instance)
+        if value is None:
+            return False
+        if self.start is not None and value < self.start:
+            return False
+        if self.end is not None and value > self.end:
+            return False
+        return True
+
+    def select(self, index, candidates=None):
+        if candidates is not None:
+            return ColumnFilter.select(self, index, candidates)
+        values, instances = index.get_sorted_values()
+        if self.start is None:
+            start = 0
+        else:
+            start = bisect.bisect_left(values, self.start)
+        if self.end is None:
+            end = len(values)
+        else:
+            end = bisect.bisect_right(values, self.end, start)
+        return set(instances[start:end])
+
+    def is_narrower(self, other):
+        if type(other) is not RangeFilter or other.attribute != self.attribute:
+            return False
+        if other.start is not None and (self.start is None or
+                                        self.start < other.start):
+            return False
+        if other.end is not None and (self.end is None or
+                                      self.end > other.end):
+            return False
+        return True
+
+
+class EqualsFilter(ColumnFilter):
+    """
+    Matches the rows where the attribute is equal to value
+
+    :param attribute: the attribute
+    :param value: the value
+    """
+
+    def __init__(self, attribute, value):
+        ColumnFilter.__init__(self, attribute)
+        self.value = value
+
+    def match(self, index, instance):
+        return index.get_value(instance) == self.value
+
+    def select(self, index, candidates=None):
+        if candidates is not None:
+            return ColumnFilter.select(self, index, candidates)
+        return set(index.get_by_value().get(self.value, ()))
+
+    def is_narrower(self, other):
+        return (type(other) is EqualsFilter and
+                other.attribute == self.attribute and
+                other.value == self.value)
+
+
+class ColumnAggregate(GObject.GObject):
+    """
+    The sum, count, minimum, maximum and average of the values of a
+    column in an :class:`ObjectList`, see :meth:`ObjectList.get_aggregate`.
+
+    The values are kept up to date as rows are added, removed, updated
+    and edited, so reading them does not scan the list. The sum is
+    calculated with exact decimal arithmetic. None values count as 0
+    in the sum and are ignored by the other aggregates.
+
+    Signals
+    =======
+      - B{changed} ():
+        - Emitted when the values changed
+    """
+
+    gsignal('changed')
+
+    def __init__(self, objectlist, column, data_func=None):
+        GObject.GObject.__init__(self)
+        self._objectlist = objectlist
+        self._column = column
+        self._data_func = data_func
+        self._frozen = 0
+        self._pending = False
+        self._reset(valid=False)
+
+    def _reset(self, valid):
+        # instance -> signed value of the row
+        self._values = {}
+        self._sum = decimal.Decimal(0)
+        self._count = 0
+        self._min = self._max = None
+        self._limits_valid = True
+        self._valid = valid
+
+    def _get_value(self, instance):
+        column = self._column
+        return self._get_signed_value(
+            instance, column.get_attribute(instance, column.attribute, None))
+
+    def _get_signed_value(self, instance, value):
+        if value is not None and self._data_func and not self._data_func(
+                instance):
+            value = -value
+        return value
+
+    def _add_value(self, value):
+        if value is None:
+            return
+        self._sum = _EXACT_CONTEXT.add(self._sum, _to_exact(value))
+        self._count += 1
+        if self._limits_valid:
+            if self._min is None or value < self._min:
+                self._min = value
+            if self._max is None or value > self._max:
+                self._max = value
+
+    def _remove_value(self, value):
+        if value is None:
+            return
+        self._sum = _EXACT_CONTEXT.subtract(self._sum, _to_exact(value))
+        self._count -= 1
+        if value == self._min or value == self._max:
+            self._limits_valid = False
+
+    def _recompute(self):
+        self._reset(valid=True)
+        values = self._values
+        # The sums of the groups of a tree would be counted twice
+        instances = [instance
+                     for instance in self._objectlist._iter_instances()
+                     if not isinstance(instance, GroupRow)]
+        for instance, value in zip(
+                instances, self._column._get_attribute_values(instances)):
+            value = values[instance] = self._get_signed_value(instance, value)
+            self._add_value(value)
+
+    def _ensure_valid(self):
+        if not self._valid:
+            self._recompute()
+
+    def _emit_changed(self):
+        if self._frozen:
+            self._pending = True
+        else:
+            self.emit('changed')
+
+    # Called by the ObjectList
+
+    def _add(self, instance):
+        if isinstance(instance, GroupRow):
+            return
+        if self._valid:
+            old = self._values.pop(instance, _marker)
+            if old is not _marker:
+                self._remove_value(old)
+            value = self._values[instance] = self._get_value(instance)
+            self._add_value(value)
+        self._emit_changed()
+
+    def _remove(self, instance):
+        if self._valid:
+            old = self._values.pop(instance, _marker)
+            if old is _marker:
+                return
+            self._remove_value(old)
+        self._emit_changed()
+
+    def _update(self, instance):
+        if isinstance(instance, GroupRow):
+            return
+        if self._valid:
+            old = self._values.get(instance, _marker)
+            value = self._get_value(instance)
+            if old == value:
+                return
+            if old is not _marker:
+                self._remove_value(old)
+            self._values[instance] = value
+            self._add_value(value)
+        self._emit_changed()
+
+    def _clear(self):
+        self._reset(valid=True)
+        self._emit_changed()
+
+    def _freeze(self):
+        self._frozen += 1
+
+    def _thaw(self):
+        self._frozen -= 1
+        if not self._frozen and self._pending:
+            self._pending = False
+            self.emit('changed')
+
+    # Public API
+
+    def invalidate(self):
+        """
+        Recalculates everything the next time a value is read. This is
+        only needed when the instances were modified without calling
+        :meth:`ObjectList.update`.
+        """
+        self._valid = False
+        self._emit_changed()
+
+    def get_column(self):
+        return self._column
+
+    def get_sum(self):
+        """
+        :returns: the sum of the values, converted to the data type of
+          the column
+        """
+        self._ensure_valid()
+        return self._column.data_type(self._sum)
+
+    def get_count(self):
+        """
+        :returns: the number of values which are not None
+        """
+        self._ensure_valid()
+        return self._count
+
+    def get_min(self):
+        """
+        :returns: the smallest value or None if there are no values
+        """
+        self._ensure_valid()
+        if not self._limits_valid:
+            self._update_limits()
+        return self._min
+
+    def get_max(self):
+        """
+        :returns: the biggest value or None if there are no values
+        """
+        self._ensure_valid()
+        if not self._limits_valid:
+            self._update_limits()
+        return self._max
+
+    def get_average(self):
+        """
+        :returns: the average of the values as a Decimal, or None
+          if there are no values
+        """
+        self._ensure_valid()
+        if not self._count:
+            return None
+        return self._sum / self._count
+
+    def _update_limits(self):
+        values = [value for value in self._values.values()
+                  if value is not None]
+        if values:
+            self._min = min(values)
+            self._max = max(values)
+        else:
+            self._min = self._max = None
+        self._limits_valid = True
+
+
+type_register(ColumnAggregate)
+
+
+class RowSelection(object):
+    """
+    The selected instances of an :class:`ObjectList` in
+    Gtk.SelectionMode.MULTIPLE mode, which is what selection-changed
+    emits in that mode and :meth:`ObjectList.get_row_selection` returns.
+
+    It behaves like a read-only list, but the instances are only
+    fetched from the treeview when they are iterated or indexed. The
+    number of selected rows and membership tests are answered by the
+    treeview selection, without building the list. Until the instances
+    are fetched it reflects the current selection, so it should not be
+    kept around to remember an old selection.
+    """
+
+    def __init__(self, objectlist):
+        self._objectlist = objectlist
+        self._instances = None
+
+    def _get_instances(self):
+        if self._instances is None:
+            selection = self._objectlist.get_treeview().get_selection()
+            model, paths = selection.get_selected_rows()
+            get_iter = model.get_iter
+            get_value = model.get_value
+            self._instances = [get_value(get_iter(path), COL_MODEL)
+                               for path in paths]
+        return self._instances
+
+    def __len__(self):
+        if self._instances is not None:
+            return len(self._instances)
+        selection = self._objectlist.get_treeview().get_selection()
+        return selection.count_selected_rows()
+
+    def __bool__(self):
+        return len(self) > 0
+    __nonzero__ = __bool__
+
+    def __contains__(self, instance):
+        if self._instances is not None:
+            return instance in self._instances
+        objectlist = self._objectlist
+        treeiter = objectlist._iters.get(instance)
+        if treeiter is None:
+            # The placeholder rows of a tree are not in the list
+            return (instance is empty_marker and
+                    instance in self._get_instances())
+        path = objectlist._get_view_path(treeiter)
+        if path is None:
+            return False
+        return objectlist.get_treeview().get_selection().path_is_selected(
+            path)
+
+    def __iter__(self):
+        return iter(self._get_instances())
+
+    def __getitem__(self, index):
+        return self._get_instances()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, RowSelection):
+            other = other._get_instances()
+        elif not isinstance(other, (list, tuple)):
+            return NotImplemented
+        return self._get_instances() == list(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<RowSelection %r>' % (self._get_instances(),)
+
+
 class _ContextMenu(Gtk.Menu):
 
     """
@@ -893,6 +1632,714 @@ _marker = object()
 empty_marker = object()
 
 
+def _get_sort_key_func(key_func=None):
+    """Creates a function which returns the sort key of a value,
+    None values are sorted last like in ObjectList._model_sort_func.
+
+    :param key_func: callable converting a value to a key or None to
+      use the value itself, strings are always collated with
+      locale.strxfrm()
+    """
+    strxfrm = locale.strxfrm
+
+    def sort_key(value):
+        if value is None:
+            return (True, 0)
+        if key_func is not None:
+            return (False, key_func(value))
+        if isinstance(value, str):
+            return (False, strxfrm(value))
+        return (False, value)
+    return sort_key
+
+
+def _normalize_text(value, ignore_case, ignore_accents):
+    if value is None:
+        return u''
+    if not isinstance(value, six.string_types):
+        value = six.text_type(value)
+    # strip_accents() is done before lower(), like in KiwiEntry
+    if ignore_accents:
+        value = strip_accents(value)
+    if ignore_case:
+        value = value.lower()
+    return value
+
+
+class _FilterIndex(object):
+    """The values of an attribute for all the rows of a list. The
+    structures used by the filters are built when they are needed and
+    are updated in place when rows are added or removed.
+    """
+
+    def __init__(self, attribute, instances):
+        self.attribute = attribute
+        instances = list(instances)
+        self._values = dict(zip(instances,
+                                kgetattr_many(instances, attribute, None)))
+        # (ignore_case, ignore_accents) -> {instance: text}
+        self._texts = {}
+        # (ignore_case, ignore_accents) -> ([text], [instance]), sorted
+        self._sorted_texts = {}
+        # ([value], [instance]), sorted, without the None values
+        self._sorted_values = None
+        # value -> {instance: None}
+        self._by_value = None
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, instance):
+        if instance in self._values:
+            self.remove(instance)
+        value = self._values[instance] = kgetattr(instance, self.attribute,
+                                                  None)
+        for (ignore_case, ignore_accents), texts in self._texts.items():
+            text = texts[instance] = _normalize_text(value, ignore_case,
+                                                     ignore_accents)
+            sorted_texts = self._sorted_texts.get((ignore_case,
+                                                   ignore_accents))
+            if sorted_texts is not None:
+                _sorted_insert(sorted_texts, text, instance)
+        if self._sorted_values is not None and value is not None:
+            _sorted_insert(self._sorted_values, value, instance)
+        if self._by_value is not None:
+            self._by_value.setdefault(value, {})[instance] = None
+
+    def remove(self, instance):
+        value = self._values.pop(instance, _marker)
+        if value is _marker:
+            return
+        for key, texts in self._texts.items():
+            text = texts.pop(instance)
+            sorted_texts = self._sorted_texts.get(key)
+            if sorted_texts is not None:
+                _sorted_remove(sorted_texts, text, instance)
+        if self._sorted_values is not None and value is not None:
+            _sorted_remove(self._sorted_values, value, instance)
+        if self._by_value is not None:
+            instances = self._by_value[value]
+            del instances[instance]
+            if not instances:
+                del self._by_value[value]
+
+    def get_instances(self):
+        return self._values.keys()
+
+    def get_value(self, instance):
+        value = self._values.get(instance, _marker)
+        if value is _marker:
+            value = kgetattr(instance, self.attribute, None)
+        return value
+
+    def get_texts(self, ignore_case, ignore_accents):
+        key = (ignore_case, ignore_accents)
+        texts = self._texts.get(key)
+        if texts is None:
+            texts = self._texts[key] = dict(
+                (instance, _normalize_text(value, ignore_case,
+                                           ignore_accents))
+                for instance, value in self._values.items())
+        return texts
+
+    def get_text(self, instance, ignore_case, ignore_accents):
+        text = self.get_texts(ignore_case, ignore_accents).get(instance)
+        if text is None:
+            text = _normalize_text(self.get_value(instance), ignore_case,
+                                   ignore_accents)
+        return text
+
+    def get_sorted_texts(self, ignore_case, ignore_accents):
+        key = (ignore_case, ignore_accents)
+        sorted_texts = self._sorted_texts.get(key)
+        if sorted_texts is None:
+            items = sorted(self.get_texts(ignore_case,
+                                          ignore_accents).items(),
+                           key=operator.itemgetter(1))
+            sorted_texts = self._sorted_texts[key] = (
+                [text for instance, text in items],
+                [instance for instance, text in items])
+        return sorted_texts
+
+    def get_sorted_values(self):
+        if self._sorted_values is None:
+            items = sorted(((value, instance)
+                            for instance, value in self._values.items()
+                            if value is not None),
+                           key=operator.itemgetter(0))
+            self._sorted_values = ([value for value, instance in items],
+                                   [instance for value, instance in items])
+        return self._sorted_values
+
+    def get_by_value(self):
+        if self._by_value is None:
+            by_value = self._by_value = {}
+            for instance, value in self._values.items():
+                by_value.setdefault(value, {})[instance] = None
+        return self._by_value
+
+
+def _sorted_insert(sorted_items, key, instance):
+    # Inserts instance in the ([key], [instance]) lists of _FilterIndex
+    keys, instances = sorted_items
+    position = bisect.bisect_right(keys, key)
+    keys.insert(position, key)
+    instances.insert(position, instance)
+
+
+def _sorted_remove(sorted_items, key, instance):
+    keys, instances = sorted_items
+    position = bisect.bisect_left(keys, key)
+    while instances[position] is not instance:
+        position += 1
+    del keys[position]
+    del instances[position]
+
+
+class _AttributeIndex(object):
+    """The rows of a list by the value of an attribute, see
+    ObjectList.add_index(). Unlike _FilterIndex it is updated row by
+    row, so lookups stay cheap while the list changes.
+    """
+
+    def __init__(self, attribute, instances):
+        self.attribute = attribute
+        self._values = {}
+        # value -> dict with the instances as keys, in the order they
+        # were added, so removing one does not search the others
+        self._by_value = {}
+        for instance in instances:
+            self.add(instance)
+
+    def add(self, instance):
+        value = kgetattr(instance, self.attribute, None)
+        self._values[instance] = value
+        self._by_value.setdefault(value, {})[instance] = None
+
+    def remove(self, instance):
+        value = self._values.pop(instance, _marker)
+        if value is _marker:
+            return
+        instances = self._by_value[value]
+        del instances[instance]
+        if not instances:
+            del self._by_value[value]
+
+    def find(self, value):
+        return self._by_value.get(value, {})
+
+
+class _RowFilter(object):
+    """Decides which rows of an ObjectList are visible for a list of
+    ColumnFilters. All the rows are checked when the filters are set,
+    using the indexes; rows added or changed afterwards are checked
+    one by one when the filter model asks for them.
+    """
+
+    def __init__(self):
+        self.filters = []
+        # attribute -> _FilterIndex
+        self._indexes = {}
+        self._visible = set()
+        # The rows which visibility is known, the others were added
+        # or changed after the filters were set
+        self._known = set()
+
+    def _get_index(self, attribute, instances):
+        index = self._indexes.get(attribute)
+        if index is None:
+            index = self._indexes[attribute] = _FilterIndex(attribute,
+                                                            instances)
+        return index
+
+    def _is_narrower(self, filters):
+        # Each old filter must be refined by one of the new filters
+        if not self.filters:
+            return False
+        for old in self.filters:
+            for new in filters:
+                if new.is_narrower(old):
+                    break
+            else:
+                return False
+        return True
+
+    def set_filters(self, filters, instances):
+        """Set the filters and check the rows
+
+        :param filters: a list of ColumnFilter
+        :param instances: all the instances of the list
+        """
+        known = set(instances)
+        # The rows added or changed since the last check
+        unchecked = known - self._known
+        if self._is_narrower(filters):
+            candidates = (self._visible & known) | unchecked
+        else:
+            candidates = None
+
+        # The indexes hold the checked rows, the others are only added
+        # to them by is_visible()
+        if unchecked or len(known) != len(self._known):
+            self._indexes = {}
+
+        indexes = [self._get_index(column_filter.attribute, instances)
+                   for column_filter in filters]
+        for column_filter, index in zip(filters, indexes):
+            candidates = column_filter.select(index, candidates)
+            if not candidates:
+                break
+
+        self.filters = filters
+        self._visible = candidates or set()
+        self._known = known
+
+    def is_visible(self, instance):
+        if instance in self._visible:
+            return True
+        if instance in self._known:
+            return False
+
+        self._known.add(instance)
+        for index in self._indexes.values():
+            index.add(instance)
+        for column_filter in self.filters:
+            index = self._indexes[column_filter.attribute]
+            if not column_filter.match(index, instance):
+                return False
+        self._visible.add(instance)
+        return True
+
+    def invalidate(self, instance):
+        self._visible.discard(instance)
+        self._known.discard(instance)
+        for index in self._indexes.values():
+            index.remove(instance)
+
+    def reset(self):
+        """Forget the indexes and the visible rows, the next call to
+        set_filters() checks all the rows again
+        """
+        self.filters = []
+        self._indexes = {}
+        self._visible = set()
+        self._known = set()
+
+
+class _ProgressiveLoad(object):
+    """The state of a progressive add_list()"""
+
+    __slots__ = ('instances', 'selected', 'clear', 'count', 'source_id')
+
+    def __init__(self, instances, selected, clear):
+        self.instances = iter(instances)
+        self.selected = selected
+        # Only a load which cleared the list skips the duplicates, like
+        # the merge of add_list() does
+        self.clear = clear
+        self.count = 0
+        self.source_id = None
+
+
+class _Export(object):
+    """An export started by ObjectList.export(). The rows are read from
+    the treeview model in chunks, from the main loop, and formatted and
+    written by a thread.
+    """
+
+    def __init__(self, objectlist, fileobj, dialect, header):
+        self.objectlist = objectlist
+        self.fileobj = fileobj
+        self.dialect = dialect
+        self.header = header
+        self.columns = objectlist.get_visible_columns()
+        self.view_model = objectlist.get_treeview().get_model()
+        self.treeiter = self.view_model.get_iter_first()
+        # The chunk which did not fit in the queue yet
+        self.pending = None
+        self.count = 0
+        self.written = 0
+        self.changed = False
+        self.error = None
+        self.cancelled = False
+        self.queue = None
+        self.thread = None
+        self.source_id = None
+        self.handler_ids = [
+            self.view_model.connect('row-deleted', self._on_model_changed),
+            self.view_model.connect('rows-reordered', self._on_model_changed)]
+
+    def _on_model_changed(self, *args):
+        # The iter we were walking is not valid anymore
+        self.changed = True
+
+    def disconnect(self):
+        for handler_id in self.handler_ids:
+            self.view_model.disconnect(handler_id)
+        self.handler_ids = []
+
+    def get_header(self):
+        return [column.title or column.attribute for column in self.columns]
+
+    def read_chunk(self):
+        # Returns the next rows in the order they are displayed, with
+        # the values which can be formatted without the instance, or None
+        # when all the rows were read
+        model = self.view_model
+        treeiter = self.treeiter
+        if treeiter is None:
+            return None
+
+        columns = [(column.get_attribute, column.attribute,
+                    column.format_func and column.format_func_data is not None,
+                    column.as_string)
+                   for column in self.columns]
+        rows = []
+        while treeiter is not None and len(rows) < _EXPORT_CHUNK_ROWS:
+            instance = model.get_value(treeiter, COL_MODEL)
+            if instance is not empty_marker:
+                row = []
+                for get_attribute, attribute, needs_instance, as_string in (
+                        columns):
+                    value = get_attribute(instance, attribute, None)
+                    if needs_instance:
+                        # format_func receives the instance, it is only
+                        # safe to use it in the main thread
+                        value = as_string(value, instance)
+                    row.append(value)
+                rows.append(row)
+
+            # Depth first, so the rows of an ObjectTree are exported too
+            child = model.iter_children(treeiter)
+            if child is not None:
+                treeiter = child
+                continue
+            next_iter = model.iter_next(treeiter)
+            while next_iter is None:
+                treeiter = model.iter_parent(treeiter)
+                if treeiter is None:
+                    break
+                next_iter = model.iter_next(treeiter)
+            treeiter = next_iter
+        self.treeiter = treeiter
+        self.count += len(rows)
+        return rows
+
+    def write_rows(self, writer, rows):
+        formatters = [column.as_string for column in self.columns]
+        needs_instance = [bool(column.format_func and
+                               column.format_func_data is not None)
+                          for column in self.columns]
+        writer.writerows(
+            [value if formatted else format_value(value)
+             for value, format_value, formatted in zip(row, formatters,
+                                                       needs_instance)]
+            for row in rows)
+        self.written += len(rows)
+
+    def create_writer(self):
+        writer = csv.writer(self.fileobj, dialect=self.dialect)
+        if self.header:
+            writer.writerow(self.get_header())
+        return writer
+
+
+# The pending mutations of a batch, per instance
+_BATCH_APPEND = 0
+_BATCH_UPDATE = 1
+_BATCH_REMOVE = 2
+# Removed and then appended again, which moves the row to the end
+_BATCH_MOVE = 3
+
+
+class _Batch(object):
+    """The mutations recorded by ObjectList.batch()"""
+
+    __slots__ = ('depth', 'changes', 'select')
+
+    def __init__(self):
+        self.depth = 0
+        # instance -> _BATCH_*, in the order they were first changed
+        self.changes = collections.OrderedDict()
+        self.select = None
+
+    def contains(self, instance, iters):
+        change = self.changes.get(instance)
+        if change is None:
+            return instance in iters
+        return change != _BATCH_REMOVE
+
+    def append(self, instance):
+        change = self.changes.pop(instance, None)
+        if change == _BATCH_REMOVE:
+            change = _BATCH_MOVE
+        elif change is None:
+            change = _BATCH_APPEND
+        # Appended rows go to the end, in the order of the append calls
+        self.changes[instance] = change
+
+    def update(self, instance):
+        if instance not in self.changes:
+            self.changes[instance] = _BATCH_UPDATE
+
+    def remove(self, instance):
+        if self.changes.get(instance) == _BATCH_APPEND:
+            # Never reached the model
+            del self.changes[instance]
+        else:
+            self.changes[instance] = _BATCH_REMOVE
+        if self.select is instance:
+            self.select = None
+
+
+class _NativeColumn(object):
+    """The model columns holding the values of a :class:`Column` when
+    native columns are enabled. The value column has the typed value,
+    which GTK+ sorts by itself, and the text column has the value
+    formatted by :meth:`Column.as_string`, which the renderer displays.
+    Boolean columns render their value column directly.
+    """
+
+    __slots__ = ('column', 'value_index', 'text_index', 'convert', 'missing')
+
+    def __init__(self, column, value_index, text_index, convert, missing):
+        self.column = column
+        self.value_index = value_index
+        self.text_index = text_index
+        self.convert = convert
+        self.missing = missing
+
+    def get_values(self, instance):
+        if instance is empty_marker:
+            # A placeholder row
+            if self.text_index is None:
+                return (self.missing,)
+            return (self.missing, None)
+        column = self.column
+        data = column.get_attribute(instance, column.attribute, None)
+        if data is None:
+            value = self.missing
+        elif self.convert is not None:
+            value = self.convert(data)
+        else:
+            value = data
+        if self.text_index is None:
+            return (value,)
+        return (value, column.as_string(data, instance))
+
+
+class _CellTextCache(object):
+    """Caches the formatted text of cells by row instance and column.
+    When more than max_cells cells are cached, the least recently used
+    rows are evicted.
+    """
+
+    def __init__(self, max_cells):
+        self.max_cells = max_cells
+        # instance -> column -> text, in least recently used order
+        self._rows = collections.OrderedDict()
+        self._cells = 0
+
+    def __len__(self):
+        return self._cells
+
+    def get(self, instance, column):
+        row = self._rows.get(instance)
+        if row is None:
+            return _marker
+        self._rows.move_to_end(instance)
+        return row.get(column, _marker)
+
+    def set(self, instance, column, text):
+        rows = self._rows
+        row = rows.get(instance)
+        if row is None:
+            row = rows[instance] = {}
+        else:
+            rows.move_to_end(instance)
+        if not column in row:
+            self._cells += 1
+        row[column] = text
+
+        # Evict, but never the row we are rendering
+        while self._cells > self.max_cells and len(rows) > 1:
+            evicted = rows.popitem(last=False)[1]
+            self._cells -= len(evicted)
+
+    def get_longest_texts(self, column, count):
+        return heapq.nlargest(count, (row[column]
+                                      for row in self._rows.values()
+                                      if column in row), key=len)
+
+    def invalidate_row(self, instance):
+        row = self._rows.pop(instance, None)
+        if row is not None:
+            self._cells -= len(row)
+
+    def invalidate_column(self, column):
+        for row in self._rows.values():
+            if row.pop(column, _marker) is not _marker:
+                self._cells -= 1
+
+    def clear(self):
+        self._rows.clear()
+        self._cells = 0
+
+
+class _VirtualListModel(GObject.Object, Gtk.TreeModel):
+    """A read-only list model which fetches its rows from a
+    :class:`kiwi.interfaces.IRowProvider` in pages, only when the view
+    asks for them. At most max_pages pages are kept, the least recently
+    used ones are evicted when they scroll out of view.
+    """
+
+    def __init__(self, provider, page_size, max_pages):
+        GObject.Object.__init__(self)
+        self._provider = provider
+        self._count = provider.count()
+        self._page_size = page_size
+        self._max_pages = max_pages
+        # page number -> list of instances, in least recently used order
+        self._pages = collections.OrderedDict()
+
+    # Public API
+
+    def get_provider(self):
+        return self._provider
+
+    def get_row(self, index):
+        """Returns the instance at index, fetching its page if needed"""
+        page_no, offset = divmod(index, self._page_size)
+        pages = self._pages
+        page = pages.get(page_no)
+        if page is None:
+            page = list(self._provider.fetch(page_no * self._page_size,
+                                             self._page_size))
+            pages[page_no] = page
+            while len(pages) > self._max_pages:
+                pages.popitem(last=False)
+        else:
+            pages.move_to_end(page_no)
+
+        try:
+            return page[offset]
+        except IndexError:
+            # The provider returned less rows than it said it had
+            return empty_marker
+
+    def index_of(self, instance):
+        """Returns the position of instance or None if it cannot be found"""
+        index = getattr(self._provider, 'index', None)
+        if index is not None:
+            try:
+                return index(instance)
+            except ValueError:
+                return None
+
+        page_size = self._page_size
+        for page_no, page in self._pages.items():
+            for offset, row in enumerate(page):
+                if row is instance:
+                    return page_no * page_size + offset
+        return None
+
+    def invalidate(self):
+        """Drops all the fetched pages and reads the row count again"""
+        self._pages.clear()
+        self._count = self._provider.count()
+
+    # Gtk.TreeModel
+
+    def _create_iter(self, index):
+        treeiter = Gtk.TreeIter()
+        # user_data is a pointer, 0 would be read back as None
+        treeiter.user_data = index + 1
+        return treeiter
+
+    def do_get_flags(self):
+        return Gtk.TreeModelFlags.LIST_ONLY | Gtk.TreeModelFlags.ITERS_PERSIST
+
+    def do_get_n_columns(self):
+        return 1
+
+    def do_get_column_type(self, column):
+        return GObject.TYPE_PYOBJECT
+
+    def do_get_iter(self, path):
+        index = path.get_indices()[0]
+        if 0 <= index < self._count:
+            return True, self._create_iter(index)
+        return False, None
+
+    def do_get_path(self, treeiter):
+        return Gtk.TreePath((treeiter.user_data - 1,))
+
+    def do_get_value(self, treeiter, column):
+        return self.get_row(treeiter.user_data - 1)
+
+    def do_iter_next(self, treeiter):
+        index = treeiter.user_data
+        if index < self._count:
+            treeiter.user_data = index + 1
+            return True, treeiter
+        return False, None
+
+    def do_iter_previous(self, treeiter):
+        index = treeiter.user_data - 1
+        if index > 0:
+            treeiter.user_data = index
+            return True, treeiter
+        return False, None
+
+    def do_iter_children(self, parent):
+        if parent is None and self._count:
+            return True, self._create_iter(0)
+        return False, None
+
+    def do_iter_has_child(self, treeiter):
+        return False
+
+    def do_iter_n_children(self, treeiter):
+        if treeiter is None:
+            return self._count
+        return 0
+
+    def do_iter_nth_child(self, parent, n):
+        if parent is None and 0 <= n < self._count:
+            return True, self._create_iter(n)
+        return False, None
+
+    def do_iter_parent(self, child):
+        return False, None
+
+
+class _VirtualIters(object):
+    """Replaces the instance -> treeiter mapping of an ObjectList
+    when it is in virtual mode, resolving instances through the model
+    """
+
+    def __init__(self, model):
+        self._model = model
+
+    def __contains__(self, instance):
+        return self._model.index_of(instance) is not None
+
+    def __getitem__(self, instance):
+        treeiter = self.get(instance, _marker)
+        if treeiter is _marker:
+            raise KeyError(instance)
+        return treeiter
+
+    def __len__(self):
+        return len(self._model)
+
+    def get(self, instance, default=None):
+        index = self._model.index_of(instance)
+        if index is None:
+            return default
+        return self._model.get_iter((index,))
+
+
 # FIXME: This could be a Gtk.Bin
 class ObjectList(Gtk.Box):
     """
@@ -929,7 +2376,8 @@ class ObjectList(Gtk.Box):
       - B{selection-changed} (list, object):
         - Emitted when the selection changes for the ObjectList
           enter. See the documentation on GtkTreeSelection::changed
-          for more information
+          for more information. In Gtk.SelectionMode.MULTIPLE mode the
+          object is a :class:`RowSelection`
       - B{double-click} (list, object):
         - Emitted when a row is double-clicked, mostly you want to use
           the row-activated signal instead to be able catch keyboard events.
@@ -944,6 +2392,14 @@ class ObjectList(Gtk.Box):
           state or vice verse.
       - B{activate-link} (str):
         - Emitted when the a link in a message is clicked on
+      - B{loading-progress} (list, int, bool):
+        - Emitted while loading progressively with the number of
+          rows loaded so far and if the loading finished
+      - B{export-progress} (list, int, bool):
+        - Emitted while exporting with the number of rows written so far
+          and if the export finished
+      - B{export-error} (list, object):
+        - Emitted with the exception when an export failed
 
     Properties
     ==========
@@ -983,6 +2439,15 @@ class ObjectList(Gtk.Box):
     # emitted when the user clicks on a message link
     gsignal('activate-link', str)
 
+    # rows loaded, finished
+    gsignal('loading-progress', int, bool)
+
+    # rows written, finished
+    gsignal('export-progress', int, bool)
+
+    # exception
+    gsignal('export-error', object)
+
     def __init__(self, columns=None,
                  objects=None,
                  mode=Gtk.SelectionMode.BROWSE,
@@ -1021,6 +2486,36 @@ class ObjectList(Gtk.Box):
         self._autosize = True
         self._vscrollbar = None
         self._message_label = None
+        # The real model, while a row provider is being used
+        self._store = None
+        # Key sorting, see set_key_sorting()
+        self._key_sorting = False
+        self._sort_column = None
+        self._sort_order = Gtk.SortType.ASCENDING
+        # sort column -> instance -> sort key
+        self._sort_keys = {}
+        self._cell_text_cache = None
+        # column -> _NativeColumn, None when native columns are disabled
+        self._native_columns = None
+        # Sort functions are registered after the native model columns
+        self._sort_id_offset = 0
+        # The treeview shows _filter_model instead of _model while
+        # there is a filter
+        self._row_filter = None
+        self._filter_model = None
+        self._refiltering = False
+        # (column, data_func) -> ColumnAggregate
+        self._aggregates = {}
+        self._loading = None
+        self._batch = None
+        # The rows which changed but were not redrawn yet because they
+        # are out of view, see refresh()
+        self._dirty_rows = None
+        # (object, handler id) of the signals which flush them
+        self._dirty_handlers = []
+        # attribute -> _AttributeIndex
+        self._indexes = {}
+        self._export = None
         self.cell_data_func = None
 
         Gtk.Box.__init__(self, orientation=Gtk.Orientation.VERTICAL)
@@ -1067,6 +2562,7 @@ class ObjectList(Gtk.Box):
         # Set selection mode last to avoid spurious events
         selection = self._treeview.get_selection()
         selection.connect("changed", self._on_selection__changed)
+        self.connect('cell-edited', self._on_cell_edited)
 
         # Select the first item if no items are selected
         if mode != Gtk.SelectionMode.NONE and objects:
@@ -1099,25 +2595,18 @@ class ObjectList(Gtk.Box):
 
     def __contains__(self, instance):
         "item in list"
-        return bool(self._iters.get(instance, False))
+        return instance in self._iters
 
     def __iter__(self):
         "for item in list"
-        class ModelIterator:
-            def __init__(self):
-                self._index = -1
-
-            def __iter__(self):
-                return self
-
-            def __next__(self, model=self._model):
-                try:
-                    self._index += 1
-                    return model[self._index][COL_MODEL]
-                except IndexError:
-                    raise StopIteration
-
-        return ModelIterator()
+        # Walking the iters avoids creating a TreeModelRow for each row
+        model = self._model
+        get_value = model.get_value
+        iter_next = model.iter_next
+        treeiter = model.get_iter_first()
+        while treeiter is not None:
+            yield get_value(treeiter, COL_MODEL)
+            treeiter = iter_next(treeiter)
 
     def __getitem__(self, arg):
         "list[n]"
@@ -1134,15 +2623,18 @@ class ObjectList(Gtk.Box):
 
     def __setitem__(self, arg, item):
         "list[n] = m"
+        self._check_not_virtual()
         if isinstance(arg, (int, Gtk.TreeIter, str)):
             model = self._model
             olditem = model[arg][COL_MODEL]
-            model[arg] = (item,)
+            model[arg] = self._create_row(item)
 
             # Update iterator cache
             iters = self._iters
             iters[item] = model[arg].iter
             del iters[olditem]
+            self._invalidate_row(olditem)
+            self._row_added(item)
 
         elif isinstance(arg, slice):
             raise NotImplementedError("slices for list are not implemented")
@@ -1170,37 +2662,131 @@ class ObjectList(Gtk.Box):
         :param stop
         """
 
-        if start is not None or stop is not None:
-            raise NotImplementedError("start and stop")
-
         treeiter = self._iters.get(item, _marker)
         if treeiter is _marker:
             raise ValueError("item %r is not in the list" % item)
 
-        return self._model[treeiter].path[0]
+        index = self._model.get_path(treeiter)[0]
+        if start is not None or stop is not None:
+            start, stop, unused = slice(start, stop).indices(len(self))
+            if not start <= index < stop:
+                raise ValueError("item %r is not in the list" % item)
+        return index
 
     def count(self, item):
         "L.count(item) -> integer -- return number of occurrences of value"
 
+        try:
+            identical = item in self._iters
+        except TypeError:
+            # Unhashable, only found by comparing
+            identical = False
+        if identical and type(item).__eq__ is object.__eq__:
+            # Compared by identity, each instance is only once in the list
+            return 1
         count = 0
-        for row in self._model:
-            if row[COL_MODEL] == item:
+        for instance in self:
+            if instance == item:
                 count += 1
         return count
 
+    def add_index(self, attribute):
+        """
+        Keeps an index of the rows by the value of attribute, which is
+        used by :meth:`find_by` and :meth:`select_by` instead of checking
+        all the rows. The index is updated when rows are added, removed
+        or updated; if the attribute of an instance is changed without
+        calling :meth:`update` or :meth:`refresh` the index is not
+        aware of it. The values must be hashable.
+
+        :param attribute: the attribute, it can contain dots
+        """
+        self._check_not_virtual()
+        if attribute not in self._indexes:
+            self._indexes[attribute] = _AttributeIndex(attribute,
+                                                       self._iters)
+
+    def remove_index(self, attribute):
+        """
+        Removes an index added by :meth:`add_index`
+
+        :param attribute: the attribute
+        """
+        if self._indexes.pop(attribute, None) is None:
+            raise ValueError("there is no index for %r" % (attribute,))
+
+    def find_by(self, **attributes):
+        """
+        Returns the instances which attributes are equal to the keyword
+        arguments, for instance::
+
+          sale = objectlist.find_by(id=sale_id)[0]
+
+        Indexed attributes are looked up in their index and only the
+        instances found there are checked for the other attributes, so
+        at least one attribute should be indexed with :meth:`add_index`.
+        The instances are returned in the order they were added.
+
+        :param attributes: the values of the attributes
+        :returns: a list of instances
+        """
+        self._check_not_virtual()
+        if not attributes:
+            raise TypeError("find_by() needs at least one attribute")
+
+        candidates = None
+        others = []
+        for attribute, value in attributes.items():
+            index = self._indexes.get(attribute)
+            if index is None:
+                others.append((attribute, value))
+                continue
+            found = index.find(value)
+            if candidates is None:
+                candidates = found
+            else:
+                candidates = [instance for instance in candidates
+                              if instance in found]
+            if not candidates:
+                return []
+        if candidates is None:
+            candidates = self._iters
+
+        return [instance for instance in candidates
+                if all(kgetattr(instance, attribute, None) == value
+                       for attribute, value in others)]
+
+    def select_by(self, **attributes):
+        """
+        Selects the instances returned by :meth:`find_by`
+
+        :param attributes: the values of the attributes
+        :returns: the selected instances
+        """
+        instances = self.find_by(**attributes)
+        self.unselect_all()
+        if instances:
+            self.select(instances)
+        return instances
+
     def insert(self, index, instance, select=False):
         """Inserts an instance to the list
         :param index: position to insert the instance at
         :param instance: the instance to be added (according to the columns spec)
         :param select: whether or not the new item should appear selected.
         """
+        self._check_not_virtual()
         self._treeview.freeze_notify()
 
-        row_iter = self._model.insert(index, (instance,))
+        position = self._get_key_sort_position(instance)
+        if position is not None:
+            index = position
+        row_iter = self._model.insert(index, self._create_row(instance))
         self._iters[instance] = row_iter
+        self._row_added(instance)
 
         if self._autosize:
-            self._treeview.columns_autosize()
+            self._autosize_columns()
 
         if select:
             self._select_and_focus_row(row_iter)
@@ -1231,14 +2817,266 @@ class ObjectList(Gtk.Box):
         :param order: one of Gtk.SortType.ASCENDING, Gtk.SortType.DESCENDING
         :type order: Gtk.SortType
         """
+        if self._key_sorting:
+            self._set_key_sort_column(attribute, order)
+            return
+
         def _sort_func(model, iter1, iter2, data):
             return cmp(
                 getattr(model[iter1][0], attribute, None),
                 getattr(model[iter2][0], attribute, None))
-        unused_sort_col_id = len(self._columns)
+        unused_sort_col_id = len(self._columns) + self._sort_id_offset
         self._model.set_sort_func(unused_sort_col_id, _sort_func)
         self._model.set_sort_column_id(unused_sort_col_id, order)
 
+    def set_key_sorting(self, key_sorting):
+        """
+        Enables or disables key sorting. Instead of letting the model call
+        a comparison function for each pair of rows, the value of each row
+        is extracted once and converted to a sort key (locale.strxfrm()
+        for strings, the value itself for numbers and dates and
+        Column.sort_func when it is set). The rows are then sorted in
+        Python and the result is applied to the model with a single
+        reorder(). The keys are cached until the row is updated.
+
+        :param key_sorting: True to enable key sorting
+        """
+        if self._key_sorting == key_sorting:
+            return
+        self._sort_keys = {}
+        model = self._model
+        if key_sorting:
+            # Take over the sorting from the model
+            sort_column_id, order = model.get_sort_column_id()
+            column = self._get_column_by_sort_id(sort_column_id)
+            if column is not None:
+                self._sort_column = column
+                self._sort_order = order
+            model.set_sort_column_id(
+                Gtk.TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID,
+                Gtk.SortType.ASCENDING)
+        self._key_sorting = key_sorting
+
+        for column in self._columns:
+            if column.column:
+                continue
+            treeview_column = column.treeview_column
+            if key_sorting:
+                treeview_column.set_sort_column_id(-1)
+                # Unsetting the sort column id makes the header unclickable
+                treeview_column.set_clickable(True)
+            elif self._sortable:
+                treeview_column.set_sort_column_id(
+                    self._get_sort_column_id(column))
+
+        if key_sorting:
+            if self._sort_column is not None:
+                self._key_sort()
+        elif self._sort_column in self._columns:
+            model.set_sort_column_id(
+                self._get_sort_column_id(self._sort_column),
+                self._sort_order)
+        elif self._sort_column is not None:
+            self.sort_by_attribute(self._sort_column, self._sort_order)
+
+    def get_key_sorting(self):
+        """
+        Returns if key sorting is enabled, see :meth:`set_key_sorting`
+        """
+        return self._key_sorting
+
+    def set_cell_text_cache(self, max_cells):
+        """
+        Caches the text of the cells after they are formatted by
+        :meth:`Column.as_string`, so that rows which were already rendered
+        are not formatted again while scrolling. The cache is invalidated
+        by :meth:`update`, :meth:`refresh`, cell edits and changes to the
+        properties of a column; if you modify an instance without calling
+        :meth:`update` the old text will still be displayed.
+
+        :param max_cells: maximum number of cells to cache, the least
+          recently used rows are evicted first. 0 disables the cache.
+        """
+        if not max_cells:
+            self._cell_text_cache = None
+        elif self._cell_text_cache is None:
+            self._cell_text_cache = _CellTextCache(max_cells)
+        else:
+            self._cell_text_cache.max_cells = max_cells
+
+    def set_native_columns(self, native_columns):
+        """
+        Enables or disables native columns. The values of the columns
+        with a simple data type (str, int, float, bool, datetime.date and
+        currency) are then also stored in typed columns of the model,
+        which are filled when the instances are added and when
+        :meth:`update` is called. GTK+ sorts these columns and renders
+        their cells by itself, without calling Python code for each
+        comparison or cell.
+
+        Native sorting does not use Column.sort_func and None values
+        are sorted before the other values. Columns using
+        editable_attribute, renderer_func, cell_data_func or a list
+        cell_data_func are rendered by Python as usual. Modifying an
+        instance without calling :meth:`update` will not change the
+        displayed values. A row provider cannot be used with native
+        columns.
+
+        :param native_columns: True to enable native columns
+        """
+        if bool(native_columns) == (self._native_columns is not None):
+            return
+        self._check_not_virtual()
+        if native_columns:
+            self._native_columns = collections.OrderedDict()
+        else:
+            self._native_columns = None
+        self._create_native_store()
+
+    def get_native_columns(self):
+        """
+        Returns if native columns are enabled, see :meth:`set_native_columns`
+        """
+        return self._native_columns is not None
+
+    def set_filter(self, filters):
+        """
+        Filters the rows displayed by the list. Only the rows matching all
+        the filters are displayed, the other instances are still in the
+        list, so len(), iterating and :meth:`get_model` include them.
+
+        The rows are matched using indexes of the values of the filtered
+        attributes, which are built the first time an attribute is
+        filtered and kept up to date when the list changes. When the new
+        filters are narrower than the current ones, for instance when
+        the user types one more letter, only the rows which are displayed
+        are checked again. has-rows and selection-changed are emitted at
+        most once.
+
+        :param filters: a list of :class:`ColumnFilter`, None or an empty
+          list to display all the rows
+        """
+        self._check_not_virtual()
+        filters = list(filters or [])
+        if not filters and self._row_filter is None:
+            return
+
+        selection = self._treeview.get_selection()
+        old_selection = self._get_selection_or_selected_rows()
+        view_model = self._treeview.get_model()
+        had_rows = bool(len(view_model))
+        selection.handler_block_by_func(self._on_selection__changed)
+        self._refiltering = True
+        try:
+            if not filters:
+                selected = [view_model[path][COL_MODEL]
+                            for path in selection.get_selected_rows()[1]]
+                self._row_filter = None
+                self._filter_model = None
+                self._treeview.set_model(self._model)
+                for instance in selected:
+                    self._select_iter(selection, self._iters[instance])
+            elif self._row_filter is None:
+                selected = [view_model[path][COL_MODEL]
+                            for path in selection.get_selected_rows()[1]]
+                self._row_filter = _RowFilter()
+                self._row_filter.set_filters(filters, self._iters)
+                self._treeview.set_model(
+                    self._create_filter_model(self._model))
+                for instance in selected:
+                    self._select_iter(selection, self._iters[instance])
+            else:
+                self._row_filter.set_filters(filters, self._iters)
+                self._filter_model.refilter()
+        finally:
+            self._refiltering = False
+            selection.handler_unblock_by_func(self._on_selection__changed)
+
+        has_rows = bool(len(self._treeview.get_model()))
+        if has_rows != had_rows:
+            self.emit('has-rows', has_rows)
+        if self._get_selection_or_selected_rows() != old_selection:
+            self.update_selection()
+
+    def get_filter(self):
+        """
+        Returns the filters set by :meth:`set_filter`
+        """
+        if self._row_filter is None:
+            return []
+        return list(self._row_filter.filters)
+
+    def cancel_loading(self):
+        """
+        Stops a progressive loading started by :meth:`add_list`, the rows
+        which were already loaded are kept.
+        """
+        if self._loading is not None:
+            self._stop_loading()
+
+    def is_loading(self):
+        """
+        Returns True while a progressive loading is adding rows
+        """
+        return self._loading is not None
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        A context manager which records the :meth:`append`, :meth:`remove`
+        and :meth:`update` calls made inside the with block and applies
+        them to the model when it exits, for instance::
+
+          with objectlist.batch():
+              for instance in changed:
+                  objectlist.update(instance)
+
+        Redundant changes are collapsed, an instance which is updated
+        many times is only redrawn once and an instance which is
+        appended and removed never reaches the model. The columns are
+        autosized once and has-rows and selection-changed are emitted at
+        most once. Until the block exits the model, len() and iterating
+        the list still return the old rows. Batches can be nested, the
+        changes are applied when the outermost one exits. Other changes,
+        like :meth:`clear` or appending to a parent in an
+        :class:`ObjectTree`, are applied right away.
+        """
+        self._check_not_virtual()
+        if self._batch is None:
+            self._batch = _Batch()
+        batch = self._batch
+        batch.depth += 1
+        try:
+            yield
+        finally:
+            batch.depth -= 1
+            if not batch.depth:
+                self._batch = None
+                self._apply_batch(batch)
+
+    def get_aggregate(self, column, data_func=None):
+        """
+        Returns the aggregates of the values of a column, which are
+        kept up to date when the list changes. Calling this again with
+        the same arguments returns the same object.
+
+        :param column: a :class:`Column` or the name of a column
+        :param data_func: an optional callable receiving an instance and
+          returning False if its value should be negated
+        :returns: a :class:`ColumnAggregate`
+        """
+        if isinstance(column, str):
+            column = self.get_column_by_name(column)
+        if data_func is not None and not callable(data_func):
+            raise TypeError("data_func must be callable, not %r"
+                            % (data_func,))
+        key = (column, data_func)
+        aggregate = self._aggregates.get(key)
+        if aggregate is None:
+            aggregate = self._aggregates[key] = ColumnAggregate(
+                self, column, data_func)
+        return aggregate
+
     def set_context_menu(self, menu):
         """Sets a context-menu (eg, when you right click) for the list.
         :param menu: context menu
@@ -1265,6 +3103,11 @@ class ObjectList(Gtk.Box):
     # Columns handling
 
     def _load(self, instances, clear):
+        if clear:
+            self._leave_virtual_mode()
+        else:
+            self._check_not_virtual()
+
         # do nothing if empty list or None provided
         model = self._model
         if clear:
@@ -1278,75 +3121,390 @@ class ObjectList(Gtk.Box):
                 return
 
         iters = self._iters
-        old_instances = [row[COL_MODEL] for row in model]
+        had_rows = bool(len(model))
+        # The aggregates are notified once, after all the rows are added
+        self._freeze_aggregates()
 
         # Save selection
         selected_instances = []
-        if old_instances:
+        if had_rows:
             selection = self._treeview.get_selection()
-            _, paths = selection.get_selected_rows()
+            view_model, paths = selection.get_selected_rows()
             if paths:
-                selected_instances = [model[path][COL_MODEL]
+                selected_instances = [view_model[path][COL_MODEL]
                                       for (path,) in paths]
 
-        # Remove sorting from the model to improve (significantly) performance
-        # http://www.pyGtk.org/pygtk2tutorial/sec-TreeModelInterface.html#sec-LargeDataStores
-        if self._sortable:
-            for index, column in enumerate(self._columns):
-                model.set_sort_func(index, lambda *args: -1,
-                                    (column, column.attribute))
+        self._disable_sort_funcs()
 
-        iters = self._iters
-        prev = None
         # Do not always just clear the list, check if we have the same
         # instances in the list we want to insert and merge in the new
         # items
         if clear:
+            # Keeps the order and removes duplicates, while giving us
+            # hashed membership tests for the merge
+            wanted = dict.fromkeys(instances)
+            # Optimization when we were empty, we wont need to remove anything
+            # nor reorder the rows
+            if had_rows:
+                self._merge(wanted)
+            else:
+                for instance in wanted:
+                    iters[instance] = self._model_append(instance)
+        else:
             for instance in iter(instances):
-                objid = instance
-                # If the instance is not in the list insert it after
-                # the previous inserted object
-                if not objid in iters:
-                    if prev is None:
-                        prev = self._model_append(instance)
+                iters[instance] = self._model_append(instance)
+
+        self._enable_sort_funcs()
+
+        # Restore selection
+        for instance in selected_instances:
+            objid = instance
+            if objid in iters:
+                self._select_iter(selection, iters[objid])
+
+        # As soon as we have data for that list, we can autosize it, and
+        # we don't want to autosize again, or we may cancel user
+        # modifications.
+        if self._autosize:
+            self._autosize_columns()
+            self._autosize = False
+        self._thaw_aggregates()
+
+    def _disable_sort_funcs(self):
+        # Remove sorting from the model to improve (significantly) performance
+        # http://www.pyGtk.org/pygtk2tutorial/sec-TreeModelInterface.html#sec-LargeDataStores
+        offset = self._sort_id_offset
+        if self._sortable:
+            for index, column in enumerate(self._columns):
+                self._model.set_sort_func(index + offset, lambda *args: -1,
+                                          (column, column.attribute))
+
+    def _enable_sort_funcs(self):
+        # Re-set the model for the treeview and the ordering
+        offset = self._sort_id_offset
+        if self._sortable:
+            for index, column in enumerate(self._columns):
+                self._model.set_sort_func(index + offset,
+                                          self._model_sort_func,
+                                          (column, column.attribute))
+        if self._key_sorting and self._sort_column is not None:
+            self._key_sort()
+
+    def _start_loading(self, instances, clear):
+        selected = []
+        if clear:
+            selection = self._treeview.get_selection()
+            view_model, paths = selection.get_selected_rows()
+            selected = [view_model[path][COL_MODEL] for path in paths]
+            self.unselect_all()
+            self.clear()
+        else:
+            self._check_not_virtual()
+
+        self._loading = _ProgressiveLoad(instances, selected, clear)
+        self._disable_sort_funcs()
+        # The first rows are added right away, so they are displayed
+        # with the next redraw
+        if self._load_chunk():
+            self._loading.source_id = GLib.idle_add(self._load_chunk)
+
+    def _load_chunk(self):
+        loading = self._loading
+        iters = self._iters
+        deadline = time.time() + _LOADING_CHUNK_TIME
+        finished = True
+        self._treeview.freeze_notify()
+        self._freeze_aggregates()
+        try:
+            for instance in loading.instances:
+                if loading.clear and instance in iters:
+                    continue
+                iters[instance] = self._model_append(instance)
+                loading.count += 1
+                if (not loading.count % _LOADING_CHECK_ROWS and
+                        time.time() >= deadline):
+                    finished = False
+                    break
+        finally:
+            self._thaw_aggregates()
+            self._treeview.thaw_notify()
+
+        if finished:
+            # Returning False removes the idle source
+            loading.source_id = None
+            self._stop_loading()
+            selection = self._treeview.get_selection()
+            for instance in loading.selected:
+                if instance in iters:
+                    self._select_iter(selection, iters[instance])
+            if self._autosize:
+                self._autosize_columns()
+                self._autosize = False
+        elif self._autosize:
+            # The first rows are enough to estimate the widths
+            self._autosize_columns()
+        self.emit('loading-progress', loading.count, finished)
+        return not finished
+
+    def _apply_batch(self, batch):
+        changes = batch.changes
+        if not changes and batch.select is None:
+            return
+
+        selection = self._treeview.get_selection()
+        old_selection = self._get_selection_or_selected_rows()
+        had_rows = bool(len(self._treeview.get_model()))
+
+        # has-rows and selection-changed are emitted once, after all the
+        # changes were applied
+        models = [self._model]
+        if self._filter_model is not None:
+            models.append(self._filter_model)
+        handlers = [self._on_model__row_inserted,
+                    self._on_model__row_deleted,
+                    self._on_filter_model__row_inserted,
+                    self._on_filter_model__row_deleted]
+        blocked = []
+        for model in models:
+            for handler in handlers:
+                if model.handler_block_by_func(handler):
+                    blocked.append((model, handler))
+        selection.handler_block_by_func(self._on_selection__changed)
+        self._treeview.freeze_notify()
+        self._freeze_aggregates()
+        try:
+            removed = [instance for instance, change in changes.items()
+                       if change in (_BATCH_REMOVE, _BATCH_MOVE)]
+            for instance in removed:
+                self._remove(instance)
+
+            native = self._native_columns is not None
+            model = self._model
+            iters = self._iters
+            for instance, change in changes.items():
+                if change == _BATCH_UPDATE:
+                    if instance not in iters:
+                        # Removed together with its parent in a tree
+                        continue
+                    self._invalidate_row(instance)
+                    if native:
+                        self._update_native_row(instance)
                     else:
-                        prev = self._model_insert_after(prev, instance)
-                    iters[objid] = prev
-                else:
-                    prev = iters[objid]
+                        treeiter = iters[instance]
+                        model.row_changed(model.get_path(treeiter), treeiter)
+                elif change != _BATCH_REMOVE:
+                    position = self._get_key_sort_position(instance)
+                    if position is None:
+                        iters[instance] = self._model_append(instance)
+                    else:
+                        iters[instance] = model.insert(
+                            position, self._create_row(instance))
+                        self._row_added(instance)
+
+            if self._autosize:
+                self._autosize_columns()
+            if batch.select is not None:
+                self._select_and_focus_row(iters[batch.select])
+        finally:
+            self._thaw_aggregates()
+            self._treeview.thaw_notify()
+            selection.handler_unblock_by_func(self._on_selection__changed)
+            for model, handler in blocked:
+                model.handler_unblock_by_func(handler)
+
+        has_rows = bool(len(self._treeview.get_model()))
+        if has_rows != had_rows:
+            self.emit('has-rows', has_rows)
+        if self._get_selection_or_selected_rows() != old_selection:
+            self.update_selection()
+
+    def _refresh_rows(self, instances, check_filter=True):
+        model = self._model
+        iters = self._iters
+        if self._native_columns is not None:
+            # The values are stored in the model, they are needed to sort
+            # and render all the rows, but only the ones which changed are
+            # set, which is what emits row-changed
+            for instance in instances:
+                treeiter = iters[instance]
+                row = self._create_row(instance)
+                columns = list(range(1, len(row)))
+                if list(model.get(treeiter, *columns)) != row[1:]:
+                    model.set(treeiter, columns, row[1:])
+        elif check_filter and self._filter_model is not None:
+            # The filter model checks the rows again on row-changed
+            for instance in instances:
+                treeiter = iters[instance]
+                model.row_changed(model.get_path(treeiter), treeiter)
+        else:
+            self._mark_dirty(instances)
+
+    def _mark_dirty(self, instances):
+        if self._dirty_rows is None:
+            self._dirty_rows = set(instances)
+            # Rows come into view when scrolling, but also when the list
+            # is resized, a row is expanded or the rows above are removed
+            treeview = self._treeview
+            handlers = self._dirty_handlers
+            adjustment = treeview.get_vadjustment()
+            if adjustment is not None:
+                for signal in ['value-changed', 'changed']:
+                    handlers.append((adjustment, adjustment.connect(
+                        signal, self._on_vadjustment__changed)))
+            handlers.append((treeview, treeview.connect_after(
+                'size-allocate', self._after_treeview__size_allocate)))
+            handlers.append((treeview, treeview.connect_after(
+                'row-expanded', self._after_treeview__row_expanded)))
+        else:
+            self._dirty_rows.update(instances)
+        self._flush_dirty_rows()
+
+    def _flush_dirty_rows(self):
+        dirty = self._dirty_rows
+        visible_range = self._treeview.get_visible_range()
+        if visible_range is not None:
+            model = self._model
+            for treeiter in self._iter_view_range(*visible_range):
+                instance = model.get_value(treeiter, COL_MODEL)
+                if instance in dirty:
+                    dirty.remove(instance)
+                    model.row_changed(model.get_path(treeiter), treeiter)
+        if not dirty:
+            self._clear_dirty_rows()
+
+    def _clear_dirty_rows(self):
+        for obj, handler_id in self._dirty_handlers:
+            obj.disconnect(handler_id)
+        self._dirty_rows = None
+        self._dirty_handlers = []
+
+    def _iter_view_range(self, start, end):
+        # The rows of the model between two paths of the treeview, in the
+        # order they are displayed
+        treeview = self._treeview
+        view_model = treeview.get_model()
+        filter_model = self._filter_model
+        treeiter = view_model.get_iter(start)
+        while treeiter is not None:
+            path = view_model.get_path(treeiter)
+            if filter_model is None:
+                yield treeiter
+            else:
+                yield filter_model.convert_iter_to_child_iter(treeiter)
+            if path.compare(end) >= 0:
+                return
+
+            if treeview.row_expanded(path):
+                next_iter = view_model.iter_children(treeiter)
+            else:
+                next_iter = view_model.iter_next(treeiter)
+            while next_iter is None:
+                treeiter = view_model.iter_parent(treeiter)
+                if treeiter is None:
+                    return
+                next_iter = view_model.iter_next(treeiter)
+            treeiter = next_iter
+
+    def _export_chunk(self, export):
+        # Reads rows for the thread in the main loop, until the queue is
+        # full or the time of this iteration is over
+        deadline = time.time() + _LOADING_CHUNK_TIME
+        while time.time() < deadline:
+            if export.changed:
+                export.source_id = None
+                self.cancel_export()
+                self.emit('export-error', ValueError(
+                    "the list changed while it was being exported"))
+                return False
+            if export.pending is None:
+                export.pending = export.read_chunk()
+            try:
+                export.queue.put_nowait(export.pending)
+            except queue.Full:
+                break
+            if export.pending is None:
+                # The thread was told all the rows were read
+                export.source_id = None
+                export.disconnect()
+                return False
+            export.pending = None
+        return True
+
+    def _export_thread(self, export):
+        try:
+            writer = export.create_writer()
+            while not export.cancelled:
+                rows = export.queue.get()
+                if rows is None or export.cancelled:
+                    break
+                export.write_rows(writer, rows)
+                GLib.idle_add(self._export_progress, export, False)
+        except Exception as e:
+            export.error = e
+        if not export.cancelled:
+            GLib.idle_add(self._export_progress, export, True)
+
+    def _export_progress(self, export, finished):
+        if export is not self._export:
+            return False
+        if finished:
+            self._stop_export(export)
+            if export.error is not None:
+                self.emit('export-error', export.error)
+                return False
+        self.emit('export-progress', export.written, finished)
+        return False
 
-            # Optimization when we were empty, we wont need to remove anything
-            # nor restore selection
-            if old_instances:
-                # Remove
-                objids = [instance for instance in instances]
-                for instance in old_instances:
-                    objid = instance
-                    if objid in objids:
-                        continue
-                    self._remove(objid)
-        else:
-            for instance in iter(instances):
-                self._iters[instance] = self._model_append(instance)
+    def _stop_export(self, export):
+        self._export = None
+        if export.source_id is not None:
+            GLib.source_remove(export.source_id)
+            export.source_id = None
+        export.disconnect()
+
+    def _stop_loading(self):
+        loading = self._loading
+        self._loading = None
+        if loading.source_id is not None:
+            GLib.source_remove(loading.source_id)
+        self._enable_sort_funcs()
+
+    def _merge(self, wanted):
+        # wanted is a dict with the instances we want to have in the list,
+        # in order. The ones that are already there keep their rows.
+        iters = self._iters
+        removed = [instance for instance in iters if not instance in wanted]
 
-        # Re-set the model for the treeview and the ordering
-        if self._sortable:
-            for index, column in enumerate(self._columns):
-                model.set_sort_func(index, self._model_sort_func,
-                                    (column, column.attribute))
+        # Add the new rows before removing the old ones, that way the list
+        # is never empty in between and has-rows is not emitted twice.
+        for instance in wanted:
+            if not instance in iters:
+                iters[instance] = self._model_append(instance)
 
-        # Restore selection
-        for instance in selected_instances:
-            objid = instance
-            if objid in iters:
-                selection.select_iter(iters[objid])
+        for instance in removed:
+            self._remove(instance)
 
-        # As soon as we have data for that list, we can autosize it, and
-        # we don't want to autosize again, or we may cancel user
-        # modifications.
-        if self._autosize:
-            self._treeview.columns_autosize()
-            self._autosize = False
+        self._model_reorder(list(wanted))
+
+    def _model_reorder(self, instances):
+        model = self._model
+        # If the model is sorted, it already takes care of the order
+        if model.get_sort_column_id()[0] is not None:
+            return
+
+        positions = {}
+        position = 0
+        treeiter = model.get_iter_first()
+        get_value = model.get_value
+        iter_next = model.iter_next
+        while treeiter is not None:
+            positions[get_value(treeiter, COL_MODEL)] = position
+            position += 1
+            treeiter = iter_next(treeiter)
+
+        new_order = [positions[instance] for instance in instances]
+        if new_order != list(range(len(new_order))):
+            model.reorder(new_order)
 
     def _setup_columns(self, columns):
         sorted = None
@@ -1372,6 +3530,7 @@ class ObjectList(Gtk.Box):
 
     def _attach_column(self, column):
         treeview_column = column.attach(self)
+        column.connect('notify', self._on_column__notify)
         if column.column:
             return
 
@@ -1394,14 +3553,16 @@ class ObjectList(Gtk.Box):
                        self._on_treeview_header__button_release_event)
 
         index = self._columns.index(column)
-        if self._sortable:
-            self._model.set_sort_func(index,
-                                      self._model_sort_func,
-                                      (column, column.attribute))
-            treeview_column.set_sort_column_id(index)
+        self._setup_column_sorting(column)
 
         if column.sorted:
-            self._model.set_sort_column_id(index, column.order)
+            if self._key_sorting:
+                self._sort_column = column
+                self._sort_order = column.order
+                treeview_column.set_sort_order(column.order)
+            else:
+                self._model.set_sort_column_id(
+                    self._get_sort_column_id(column), column.order)
 
         if column.searchable:
             if not issubclass(column.data_type, six.string_types):
@@ -1420,25 +3581,296 @@ class ObjectList(Gtk.Box):
             self._treeview.set_expander_column(treeview_column)
 
     # selection methods
+    def _autosize_columns(self):
+        # Instead of letting the treeview measure all the rows, the width
+        # of the text columns is estimated from the first rows and the
+        # longest cached texts and then fixed, so rows added later are
+        # not measured either. Until there are enough rows for a good
+        # estimate it is done again as rows are added.
+        model = self._model
+        sample = []
+        treeiter = model.get_iter_first()
+        while treeiter is not None and len(sample) < _AUTOSIZE_SAMPLE_ROWS:
+            instance = model.get_value(treeiter, COL_MODEL)
+            if instance is not empty_marker:
+                sample.append(instance)
+            treeiter = model.iter_next(treeiter)
+        if len(sample) >= _AUTOSIZE_SAMPLE_ROWS:
+            self._autosize = False
+
+        expander_column = None
+        if isinstance(model, Gtk.TreeStore):
+            # Its width depends on the depth of the rows
+            expander_column = self._treeview.get_expander_column()
+            if expander_column is None:
+                for column in self._columns:
+                    if column.visible:
+                        expander_column = column.treeview_column
+                        break
+
+        cache = self._cell_text_cache
+        for column in self._columns:
+            treeview_column = column.treeview_column
+            if (column.width or column.expand or
+                    treeview_column is None or
+                    treeview_column is expander_column or
+                    column._renderer_prop not in ('text', 'markup')):
+                continue
+            texts = set(column._get_cell_text(instance)
+                        for instance in sample)
+            if cache is not None:
+                texts.update(cache.get_longest_texts(column,
+                                                     _AUTOSIZE_CACHED_TEXTS))
+            treeview_column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+            treeview_column.set_fixed_width(
+                self._get_column_width(column, texts))
+
+    def _get_column_width(self, column, texts):
+        layout = self._treeview.create_pango_layout('')
+        layout.set_text(column.treeview_column.get_title() or '', -1)
+        header_width = (layout.get_pixel_size()[0] +
+                        _AUTOSIZE_HEADER_PADDING)
+
+        if column.font_desc:
+            layout.set_font_description(
+                Pango.FontDescription(column.font_desc))
+        width = 0
+        for text in texts:
+            if column.use_markup:
+                layout.set_markup(text or '', -1)
+            else:
+                layout.set_text(text or '', -1)
+            width = max(width, layout.get_pixel_size()[0])
+        xpad = column._renderer.get_padding()[0]
+        return max(width + 2 * xpad + _AUTOSIZE_PADDING, header_width)
+
     def _select_and_focus_row(self, row_iter):
-        self._treeview.set_cursor(self._model[row_iter].path)
+        path = self._get_view_path(row_iter)
+        if path is not None:
+            self._treeview.set_cursor(path)
 
     # handlers & callbacks
 
     # Model
     def _on_model__row_inserted(self, model, path, iter):
+        if self._filter_model is not None:
+            return
         if len(model) == 1:
             self.emit('has-rows', True)
 
     def _on_model__row_deleted(self, model, path):
+        if self._filter_model is not None:
+            return
         if not len(model):
             self.emit('has-rows', False)
 
+    # While filtering has-rows is about the rows which are displayed
+    def _on_filter_model__row_inserted(self, model, path, iter):
+        if not self._refiltering and len(model) == 1:
+            self.emit('has-rows', True)
+
+    def _on_filter_model__row_deleted(self, model, path):
+        if not self._refiltering and not len(model):
+            self.emit('has-rows', False)
+
+    def _filter_visible_func(self, model, treeiter, data):
+        instance = model.get_value(treeiter, COL_MODEL)
+        if instance is empty_marker:
+            # Keep the expander of unloaded rows in ObjectTree
+            return True
+        return self._row_filter.is_visible(instance)
+
+    def _create_filter_model(self, model):
+        filter_model = model.filter_new()
+        filter_model.set_visible_func(self._filter_visible_func)
+        filter_model.connect('row-inserted',
+                             self._on_filter_model__row_inserted)
+        filter_model.connect('row-deleted',
+                             self._on_filter_model__row_deleted)
+        self._filter_model = filter_model
+        return filter_model
+
+    def _get_view_path(self, treeiter):
+        # The path of a row in the treeview, None when it is filtered out
+        if self._filter_model is None:
+            return self._model.get_path(treeiter)
+        found, view_iter = self._filter_model.convert_child_iter_to_iter(
+            treeiter)
+        if not found:
+            return None
+        return self._filter_model.get_path(view_iter)
+
+    def _get_model_iter(self, path):
+        # The row of the model for a path in the treeview
+        if self._filter_model is None:
+            return self._model.get_iter(path)
+        return self._filter_model.convert_iter_to_child_iter(
+            self._filter_model.get_iter(path))
+
+    def _select_iter(self, selection, treeiter):
+        path = self._get_view_path(treeiter)
+        if path is not None:
+            selection.select_path(path)
+
+    def _create_row(self, instance):
+        if self._native_columns is None:
+            return (instance,)
+        row = [instance]
+        for native_column in self._native_columns.values():
+            row.extend(native_column.get_values(instance))
+        return row
+
+    def _update_native_row(self, instance):
+        # Setting all the columns at once emits row-changed only once
+        row = self._create_row(instance)
+        self._model.set(self._iters[instance], list(range(1, len(row))),
+                        row[1:])
+
+    def _create_native_store(self):
+        old_model = self._model
+        sort_column_id, order = old_model.get_sort_column_id()
+        sort_column = self._get_column_by_sort_id(sort_column_id)
+
+        types = [object]
+        if self._native_columns is not None:
+            native_columns = collections.OrderedDict()
+            for column in self._columns:
+                native_type = _NATIVE_COLUMN_TYPES.get(column.data_type)
+                if native_type is None:
+                    continue
+                gtype, convert, missing = native_type
+                value_index = len(types)
+                types.append(gtype)
+                if column.data_type is bool:
+                    text_index = None
+                else:
+                    text_index = len(types)
+                    types.append(GObject.TYPE_STRING)
+                native_columns[column] = _NativeColumn(
+                    column, value_index, text_index, convert, missing)
+            self._native_columns = native_columns
+            self._sort_id_offset = len(types)
+        else:
+            self._sort_id_offset = 0
+
+        # The rows are copied before connecting to the new store,
+        # has-rows should not be emitted again.
+        store = type(old_model)(*types)
+        self._iters.clear()
+        self._copy_rows(old_model, store)
+        store.connect('row-inserted', self._on_model__row_inserted)
+        store.connect('row-deleted', self._on_model__row_deleted)
+        self.set_model(store)
+
+        for column in self._columns:
+            self._bind_native_column(column)
+            self._setup_column_sorting(column)
+        if sort_column is not None and not self._key_sorting:
+            store.set_sort_column_id(self._get_sort_column_id(sort_column),
+                                     order)
+
+    def _copy_rows(self, model, store, parent=None, store_parent=None):
+        is_tree = isinstance(store, Gtk.TreeStore)
+        treeiter = model.iter_children(parent)
+        while treeiter is not None:
+            instance = model.get_value(treeiter, COL_MODEL)
+            row = self._create_row(instance)
+            if is_tree:
+                store_iter = store.append(store_parent, row)
+                self._copy_rows(model, store, treeiter, store_iter)
+            else:
+                store_iter = store.append(row)
+            if instance is not empty_marker:
+                self._iters[instance] = store_iter
+            treeiter = model.iter_next(treeiter)
+
+    def _can_render_natively(self, column):
+        return (not self.cell_data_func and
+                not column.cell_data_func and
+                not column.editable_attribute and
+                column.renderer_func is None and
+                not column.use_stock and
+                not column.spin_adjustment and
+                type(column)._cell_data_text_func is
+                Column._cell_data_text_func)
+
+    def _bind_native_column(self, column):
+        treeview_column = column.treeview_column
+        renderer = column._renderer
+        if treeview_column is None or renderer is None:
+            return
+
+        native_column = None
+        if self._native_columns is not None:
+            native_column = self._native_columns.get(column)
+        treeview_column.clear_attributes(renderer)
+        if native_column is not None and self._can_render_natively(column):
+            # GTK+ copies the value from the model to the renderer,
+            # no Python code runs for the cell
+            if native_column.text_index is None:
+                index = native_column.value_index
+            else:
+                index = native_column.text_index
+            treeview_column.set_cell_data_func(renderer, None)
+            treeview_column.add_attribute(renderer, column._renderer_prop,
+                                          index)
+        else:
+            treeview_column.set_cell_data_func(
+                renderer,
+                column._create_cell_data_func(renderer,
+                                              column._renderer_prop),
+                (column, column._renderer_prop))
+
+    def _get_sort_column_id(self, column):
+        if self._native_columns is not None and column.sort_func is None:
+            native_column = self._native_columns.get(column)
+            if native_column is not None:
+                # Sort by the typed model column, using the builtin
+                # comparison of GTK+
+                return native_column.value_index
+        return self._columns.index(column) + self._sort_id_offset
+
+    def _get_column_by_sort_id(self, sort_column_id):
+        if sort_column_id is None or sort_column_id < 0:
+            return None
+        for column in self._columns:
+            if (not column.column and
+                    self._get_sort_column_id(column) == sort_column_id):
+                return column
+        return None
+
+    def _setup_column_sorting(self, column):
+        if not self._sortable or column.column:
+            return
+        index = self._columns.index(column) + self._sort_id_offset
+        self._model.set_sort_func(index, self._model_sort_func,
+                                  (column, column.attribute))
+        if not self._key_sorting:
+            column.treeview_column.set_sort_column_id(
+                self._get_sort_column_id(column))
+
     def _model_append(self, instance):
-        return self._model.append((instance,))
+        self._row_added(instance)
+        return self._model.append(self._create_row(instance))
+
+    def _check_not_virtual(self):
+        if self._store is not None:
+            raise TypeError("%s is using a row provider and cannot be "
+                            "modified directly" % (self.get_name(),))
 
-    def _model_insert_after(self, prev, instance):
-        return self._model.insert_after(prev, (instance,))
+    def _leave_virtual_mode(self):
+        if self._store is None:
+            return
+        had_rows = bool(len(self._model))
+        store = self._store
+        self._store = None
+        self._iters = collections.OrderedDict()
+        self._reset_indexes()
+        self.set_model(store)
+        for column in self._columns:
+            self._setup_column_sorting(column)
+        if had_rows:
+            self.emit('has-rows', False)
 
     def _model_sort_func(self, model, iter1, iter2, col_data):
         "This method is used to sort the GtkTreeModel"
@@ -1457,11 +3889,194 @@ class ObjectList(Gtk.Box):
 
         return column.compare(a, b)
 
+    # Key sorting
+
+    def _get_sort_key(self, instance):
+        column = self._sort_column
+        keys = self._sort_keys.setdefault(column, {})
+        key = keys.get(instance, _marker)
+        if key is _marker:
+            key = keys[instance] = self._get_sort_keys(column, [instance])[0]
+        return key
+
+    def _get_sort_keys(self, column, instances):
+        # The sort keys of a list of instances, the values are extracted
+        # in bulk
+        if isinstance(column, Column):
+            values = column._get_attribute_values(instances)
+            if column.sort_func:
+                key_func = functools.cmp_to_key(column.sort_func)
+            else:
+                key_func = None
+        else:
+            # An attribute name, from sort_by_attribute()
+            values = [getattr(instance, column, None)
+                      for instance in instances]
+            key_func = None
+        return list(map(_get_sort_key_func(key_func), values))
+
+    def _invalidate_row(self, instance):
+        # Forget everything that was computed from the values of instance
+        for keys in self._sort_keys.values():
+            keys.pop(instance, None)
+        if self._cell_text_cache is not None:
+            self._cell_text_cache.invalidate_row(instance)
+        if self._row_filter is not None:
+            self._row_filter.invalidate(instance)
+        if self._dirty_rows is not None and instance not in self._iters:
+            self._dirty_rows.discard(instance)
+        for index in self._indexes.values():
+            index.remove(instance)
+            if instance in self._iters:
+                index.add(instance)
+        if self._aggregates:
+            if instance in self._iters:
+                for aggregate in self._aggregates.values():
+                    aggregate._update(instance)
+            else:
+                for aggregate in self._aggregates.values():
+                    aggregate._remove(instance)
+
+    def _row_added(self, instance):
+        for index in self._indexes.values():
+            index.add(instance)
+        for aggregate in self._aggregates.values():
+            aggregate._add(instance)
+
+    def _reset_indexes(self, instances=()):
+        for attribute in self._indexes:
+            self._indexes[attribute] = _AttributeIndex(attribute, instances)
+
+    def _freeze_aggregates(self):
+        for aggregate in self._aggregates.values():
+            aggregate._freeze()
+
+    def _thaw_aggregates(self):
+        for aggregate in self._aggregates.values():
+            aggregate._thaw()
+
+    def _invalidate_aggregates(self):
+        for aggregate in self._aggregates.values():
+            aggregate.invalidate()
+
+    def _has_placeholder_rows(self):
+        return False
+
+    def _iter_instances(self):
+        if self._store is not None:
+            return iter(self)
+        return iter(self._iters)
+
+    def _set_key_sort_column(self, column, order):
+        self._sort_column = column
+        self._sort_order = order
+        for other in self._columns:
+            if other.column:
+                continue
+            treeview_column = other.treeview_column
+            treeview_column.set_sort_indicator(other is column)
+            if other is column:
+                treeview_column.set_sort_order(order)
+        self._key_sort()
+
+    def _key_sort(self):
+        column = self._sort_column
+        keys = self._sort_keys.setdefault(column, {})
+        self._key_sort_rows(keys, column,
+                            self._sort_order == Gtk.SortType.DESCENDING)
+
+    def _key_sort_rows(self, keys, column, reverse, parent=None):
+        model = self._model
+        get_value = model.get_value
+        iter_next = model.iter_next
+
+        instances = []
+        iters = []
+        treeiter = model.iter_children(parent)
+        while treeiter is not None:
+            instances.append(get_value(treeiter, COL_MODEL))
+            iters.append(treeiter)
+            treeiter = iter_next(treeiter)
+
+        missing = [instance for instance in instances if instance not in keys]
+        if missing:
+            keys.update(zip(missing, self._get_sort_keys(column, missing)))
+        sort_keys = [keys[instance] for instance in instances]
+
+        new_order = sorted(range(len(instances)),
+                           key=sort_keys.__getitem__, reverse=reverse)
+        if new_order != list(range(len(new_order))):
+            if parent is None:
+                model.reorder(new_order)
+            else:
+                model.reorder(parent, new_order)
+
+        if model.get_flags() & Gtk.TreeModelFlags.LIST_ONLY:
+            return
+        # The children of a tree are sorted under their parents, the
+        # iters of a tree store are still valid after the reorder
+        for treeiter in iters:
+            if model.iter_n_children(treeiter) > 1:
+                self._key_sort_rows(keys, column, reverse, treeiter)
+
+    def _get_key_sort_position(self, instance):
+        # Returns the position where instance should be inserted to keep
+        # a key sorted list sorted, or None if the list is not key sorted.
+        if not self._key_sorting or self._sort_column is None:
+            return None
+
+        key = self._get_sort_key(instance)
+        model = self._model
+        descending = self._sort_order == Gtk.SortType.DESCENDING
+        # Binary search, only extracting the keys of the rows we compare to
+        low, high = 0, len(model)
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = self._get_sort_key(model[middle][COL_MODEL])
+            if descending:
+                before = key > middle_key
+            else:
+                before = key < middle_key
+            if before:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _on_column__notify(self, column, pspec):
+        # The format or the data type might have changed
+        if self._cell_text_cache is not None:
+            self._cell_text_cache.invalidate_column(column)
+        if self._native_columns is None:
+            return
+        if pspec.name in ['data-type', 'sort-func']:
+            self._create_native_store()
+            return
+        if column in self._native_columns and pspec.name in _TEXT_PROPERTIES:
+            for instance in self._iters:
+                self._update_native_row(instance)
+        # Column reinstalled its cell data function
+        self._bind_native_column(column)
+
+    def _on_cell_edited(self, objectlist, obj, column):
+        self._invalidate_row(obj)
+        if self._native_columns is not None:
+            self._update_native_row(obj)
+
     # Selection
     def _on_selection__changed(self, selection):
         "This method is used to proxy selection::changed to selection-changed"
         self.update_selection()
 
+    def _on_vadjustment__changed(self, adjustment):
+        self._flush_dirty_rows()
+
+    def _after_treeview__size_allocate(self, treeview, allocation):
+        self._flush_dirty_rows()
+
+    def _after_treeview__row_expanded(self, treeview, treeiter, path):
+        self._flush_dirty_rows()
+
     # ScrolledWindow
     def _on_scrolled_window__realize(self, widget):
         toplevel = widget.get_toplevel()
@@ -1503,7 +4118,7 @@ class ObjectList(Gtk.Box):
     def _after_treeview__row_activated(self, treeview, path, view_column):
         "After activated (double clicked or pressed enter) on a row"
         try:
-            row = self._model[path]
+            row = treeview.get_model()[path]
         except IndexError:
             print('path %s was not found in model: %s' % (
                 path, list(map(list, self._model))))
@@ -1557,6 +4172,27 @@ class ObjectList(Gtk.Box):
         selection.set('OBJECTLIST_ROW', 8, pickle.dumps(item))
 
     def _after_treeview_column__clicked(self, treeview_column, column):
+        if self._key_sorting and self._sortable:
+            if (self._sort_column is column and
+                    self._sort_order == Gtk.SortType.ASCENDING):
+                order = Gtk.SortType.DESCENDING
+            else:
+                order = Gtk.SortType.ASCENDING
+            self._set_key_sort_column(column, order)
+        elif self._filter_model is not None and self._sortable:
+            # The treeview cannot sort through the filter model,
+            # sort the model below it
+            sort_column_id = self._get_sort_column_id(column)
+            if (self._model.get_sort_column_id() ==
+                    (sort_column_id, Gtk.SortType.ASCENDING)):
+                order = Gtk.SortType.DESCENDING
+            else:
+                order = Gtk.SortType.ASCENDING
+            self._model.set_sort_column_id(sort_column_id, order)
+            for other in self._columns:
+                if not other.column:
+                    other.treeview_column.set_sort_indicator(other is column)
+            treeview_column.set_sort_order(order)
         self.emit('sorting-changed', column.attribute,
                   treeview_column.get_sort_order())
 
@@ -1620,7 +4256,9 @@ class ObjectList(Gtk.Box):
         # We need to expand all parent rows before selecting
         row = self._model[treeiter]
         while row.parent:
-            self._treeview.expand_row(row.parent.path, True)
+            path = self._get_view_path(row.parent.iter)
+            if path is not None:
+                self._treeview.expand_row(path, True)
             row = row.parent
 
     #
@@ -1633,6 +4271,8 @@ class ObjectList(Gtk.Box):
     def set_model(self, model):
         "Updates the model of the list and the treeview"
         self._model = model
+        if self._row_filter is not None:
+            model = self._create_filter_model(model)
         self._treeview.set_model(model)
 
     def get_treeview(self):
@@ -1699,7 +4339,8 @@ class ObjectList(Gtk.Box):
         model = self._model
         for i, column in enumerate(self._columns):
             # Bug in PyGTK, it should be possible to remove a sort func.
-            model.set_sort_func(i, lambda m, i1, i2, *args: -1)
+            model.set_sort_func(i + self._sort_id_offset,
+                                lambda m, i1, i2, *args: -1)
 
         # Remove all columns
         treeview = self._treeview
@@ -1720,22 +4361,45 @@ class ObjectList(Gtk.Box):
 
         self._clear_columns()
         self._columns = columns
+        self._sort_keys = {}
+        # The aggregates of the old columns would still be updated
+        for key in list(self._aggregates):
+            if key[0] not in columns:
+                del self._aggregates[key]
+        if (isinstance(self._sort_column, Column) and
+                self._sort_column not in columns):
+            self._sort_column = None
         self._setup_columns(columns)
+        if self._native_columns is not None:
+            # The model needs a typed column for the new columns
+            self._create_native_store()
 
     def append(self, instance, select=False):
         """Adds an instance to the list.
         :param instance: the instance to be added (according to the columns spec)
         :param select: whether or not the new item should appear selected.
         """
+        self._check_not_virtual()
+        if self._batch is not None:
+            self._batch.append(instance)
+            if select:
+                self._batch.select = instance
+            return
 
         # Freeze and save original selection mode to avoid blinking
         self._treeview.freeze_notify()
 
-        row_iter = self._model.append((instance,))
+        position = self._get_key_sort_position(instance)
+        if position is None:
+            row_iter = self._model.append(self._create_row(instance))
+        else:
+            row_iter = self._model.insert(position,
+                                          self._create_row(instance))
         self._iters[instance] = row_iter
+        self._row_added(instance)
 
         if self._autosize:
-            self._treeview.columns_autosize()
+            self._autosize_columns()
 
         if select:
             self._select_and_focus_row(row_iter)
@@ -1749,6 +4413,7 @@ class ObjectList(Gtk.Box):
 
         # All references to the iter gone, now it can be removed
         self._model.remove(treeiter)
+        self._invalidate_row(objid)
 
         return True
 
@@ -1762,7 +4427,19 @@ class ObjectList(Gtk.Box):
           if there is one.
         """
 
+        self._check_not_virtual()
         objid = instance
+        if self._batch is not None:
+            if not self._batch.contains(objid, self._iters):
+                raise ValueError("instance %r is not in the list" % instance)
+            if select and objid in self._iters:
+                prev = self.get_previous(instance)
+                if (prev != instance and
+                        self._batch.contains(prev, self._iters)):
+                    self._batch.select = prev
+            self._batch.remove(objid)
+            return True
+
         if not objid in self._iters:
             raise ValueError("instance %r is not in the list" % instance)
 
@@ -1777,23 +4454,76 @@ class ObjectList(Gtk.Box):
 
     def update(self, instance):
         objid = instance
+        if self._batch is not None:
+            if not self._batch.contains(objid, self._iters):
+                raise ValueError("instance %r is not in the list" % instance)
+            self._batch.update(objid)
+            return
+
         if not objid in self._iters:
             raise ValueError("instance %r is not in the list" % instance)
         treeiter = self._iters[objid]
-        self._model.row_changed(self._model[treeiter].path, treeiter)
+        self._invalidate_row(instance)
+        if self._native_columns is not None:
+            self._update_native_row(instance)
+        else:
+            self._model.row_changed(self._model[treeiter].path, treeiter)
 
-    def refresh(self, view_only=False):
+    def refresh(self, view_only=False, instances=None):
         """
         Reloads the values from all objects.
 
+        Only the rows which are displayed are redrawn right away, the
+        other ones are marked as changed and redrawn when they are
+        scrolled into view.
+
         :param view_only: if True, only force a refresh of the
             visible part of this objectlist's Treeview.
+        :param instances: if not None, only these instances are reloaded
         """
+        if instances is not None:
+            self._check_not_virtual()
+            instances = list(instances)
+            for instance in instances:
+                if not instance in self._iters:
+                    raise ValueError("instance %r is not in the list" %
+                                     (instance,))
+            for instance in instances:
+                self._invalidate_row(instance)
+            self._refresh_rows(instances)
+            return
+
         self.clear_message()
-        if view_only:
+        if self._cell_text_cache is not None:
+            self._cell_text_cache.clear()
+        if not view_only:
+            self._invalidate_aggregates()
+        if self._store is not None:
+            # Fetch the pages again when they are needed, instead of
+            # loading all the rows to emit row-changed for them
+            model = self._model
+            old_count = len(model)
+            model.invalidate()
+            if len(model) != old_count:
+                # Rows were added or removed, let the treeview rebuild itself
+                self._treeview.set_model(None)
+                self._treeview.set_model(model)
+                if bool(old_count) != bool(len(model)):
+                    self.emit('has-rows', bool(len(model)))
+            self._treeview.queue_draw()
+        elif view_only:
             self._treeview.queue_draw()
         else:
-            self._model.foreach(Gtk.TreeModel.row_changed)
+            for keys in self._sort_keys.values():
+                keys.clear()
+            self._reset_indexes(self._iters)
+            if self._row_filter is not None:
+                # Check all the rows again, emitting has-rows and
+                # selection-changed if needed
+                filters = self._row_filter.filters
+                self._row_filter.reset()
+                self.set_filter(filters)
+            self._refresh_rows(list(self._iters), check_filter=False)
 
     def set_column_visibility(self, column_index, visibility):
         treeview_column = self._treeview.get_column(column_index)
@@ -1815,6 +4545,130 @@ class ObjectList(Gtk.Box):
         if selection:
             selection.unselect_all()
 
+    @contextlib.contextmanager
+    def _selection_changes(self):
+        # selection-changed is emitted once, after all the changes, and
+        # only if the treeview selection says they changed something
+        selection = self._treeview.get_selection()
+        changed = []
+        selection.handler_block_by_func(self._on_selection__changed)
+        handler_id = selection.connect(
+            'changed', lambda selection: changed.append(True))
+        try:
+            yield selection
+        finally:
+            selection.disconnect(handler_id)
+            selection.handler_unblock_by_func(self._on_selection__changed)
+            if changed:
+                self.update_selection()
+
+    def _check_multiple_selection(self):
+        mode = self._treeview.get_selection().get_mode()
+        if mode != Gtk.SelectionMode.MULTIPLE:
+            raise TypeError("Selection mode must be "
+                            "Gtk.SelectionMode.MULTIPLE, not %r" % (mode,))
+
+    def _get_range_paths(self, start, stop):
+        # Converts a range of rows of the treeview to the paths of its
+        # first and last rows, None when it is empty
+        start, stop, step = slice(start, stop).indices(
+            len(self._treeview.get_model()))
+        if start >= stop:
+            return None
+        return Gtk.TreePath(start), Gtk.TreePath(stop - 1)
+
+    def select_range(self, start, stop):
+        """
+        Selects the displayed rows from start up to, but not including,
+        stop, keeping the rows which were already selected. The indexes
+        work like the ones of a slice and selection-changed is only
+        emitted once.
+
+        :param start: index of the first row
+        :param stop: index after the last row
+        """
+        self._check_multiple_selection()
+        paths = self._get_range_paths(start, stop)
+        if paths is None:
+            return
+        with self._selection_changes() as selection:
+            selection.select_range(*paths)
+
+    def unselect_range(self, start, stop):
+        """
+        Unselects the displayed rows from start up to, but not including,
+        stop, see :meth:`select_range`.
+
+        :param start: index of the first row
+        :param stop: index after the last row
+        """
+        self._check_multiple_selection()
+        paths = self._get_range_paths(start, stop)
+        if paths is None:
+            return
+        with self._selection_changes() as selection:
+            selection.unselect_range(*paths)
+
+    def select_all(self):
+        """
+        Selects all the displayed rows
+        """
+        self._check_multiple_selection()
+        with self._selection_changes() as selection:
+            selection.select_all()
+
+    def invert_selection(self):
+        """
+        Selects the displayed rows which are not selected and unselects
+        the ones which are. Only the top level rows of an
+        :class:`ObjectTree` are inverted.
+        """
+        self._check_multiple_selection()
+        view_model = self._treeview.get_model()
+        with self._selection_changes() as selection:
+            unselected = []
+            first = 0
+            for path in selection.get_selected_rows()[1]:
+                if path.get_depth() != 1:
+                    continue
+                index = path[0]
+                if index > first:
+                    unselected.append((first, index))
+                first = index + 1
+            if first < len(view_model):
+                unselected.append((first, len(view_model)))
+
+            selection.unselect_all()
+            for start, stop in unselected:
+                selection.select_range(Gtk.TreePath(start),
+                                       Gtk.TreePath(stop - 1))
+
+    def unselect(self, instances):
+        """
+        Unselects instances, selection-changed is only emitted once.
+
+        :param instances: an instance or a list or set of instances
+        """
+        if type(instances) not in [list, tuple, set, frozenset]:
+            instances = [instances]
+
+        with self._selection_changes() as selection:
+            for instance in instances:
+                if not instance in self._iters:
+                    raise ValueError("instance %r is not in the list" %
+                                     (instance,))
+                path = self._get_view_path(self._iters[instance])
+                if path is not None:
+                    selection.unselect_path(path)
+
+    def get_row_selection(self):
+        """
+        Returns the selected instances as a :class:`RowSelection`, which
+        only fetches them from the treeview when they are used
+        """
+        self._check_multiple_selection()
+        return RowSelection(self)
+
     def select_paths(self, paths):
         """
         Selects a number of rows corresponding to paths
@@ -1828,11 +4682,20 @@ class ObjectList(Gtk.Box):
 
         selection.unselect_all()
         for path in paths:
-            self._expand_parents(self._model[path].iter)
+            self._expand_parents(self._get_model_iter(path))
             selection.select_path(path)
 
     def select(self, instances, scroll=True):
-        if type(instances) not in [list, tuple]:
+        """
+        Selects instances. In Gtk.SelectionMode.MULTIPLE mode several
+        instances are selected in addition to the rows which are already
+        selected, while a single instance also gets the cursor, which
+        unselects the other rows. selection-changed is only emitted once.
+
+        :param instances: an instance or a list or set of instances
+        :param scroll: if the treeview should scroll to the last instance
+        """
+        if type(instances) not in [list, tuple, set, frozenset]:
             instances = [instances]
 
         if not instances:
@@ -1847,21 +4710,23 @@ class ObjectList(Gtk.Box):
             raise TypeError("You can only select multiple items with"
                             "selection mode set to Gtk.SelectionMode.MULTIPLE")
 
-        # FIXME: This is not working for multiple selections. Only the last item
-        # in the list remains selected
-        for instance in instances:
-            if not instance in self._iters:
-                raise ValueError("instance %s is not in the list" % repr(instance))
+        with self._selection_changes():
+            for instance in instances:
+                if not instance in self._iters:
+                    raise ValueError("instance %s is not in the list" %
+                                     repr(instance))
 
-            treeiter = self._iters[instance]
-            self._expand_parents(treeiter)
-            selection.select_iter(treeiter)
+                treeiter = self._iters[instance]
+                self._expand_parents(treeiter)
+                self._select_iter(selection, treeiter)
 
-        self._select_and_focus_row(treeiter)
+            if len(instances) == 1:
+                # Moving the cursor unselects the other rows
+                self._select_and_focus_row(treeiter)
 
-        if scroll:
-            self._treeview.scroll_to_cell(self._model[treeiter].path,
-                                          None, True, 0.5, 0)
+        path = self._get_view_path(treeiter)
+        if scroll and path is not None:
+            self._treeview.scroll_to_cell(path, None, True, 0.5, 0)
 
     def get_selected(self):
         """Returns the currently selected object
@@ -1907,27 +4772,52 @@ class ObjectList(Gtk.Box):
     def update_selection(self):
         mode = self._treeview.get_selection().get_mode()
         if mode == Gtk.SelectionMode.MULTIPLE:
-            item = self.get_selected_rows()
+            # The selected instances are only fetched if they are used
+            item = RowSelection(self)
         elif mode in (Gtk.SelectionMode.SINGLE, Gtk.SelectionMode.BROWSE):
             item = self.get_selected()
         else:
             raise AssertionError
 
-        # Skip emitting this
+        # Skip emitting this, only the rows of a tree which were not
+        # loaded yet can select a placeholder
         if (item is empty_marker or
-                isinstance(item, list) and empty_marker in item):
+                isinstance(item, RowSelection) and
+                self._has_placeholder_rows() and empty_marker in item):
             return
         self.emit('selection-changed', item)
 
-    def add_list(self, instances, clear=True):
+    def add_list(self, instances, clear=True, progressive=False):
         """
         Allows a list to be loaded, by default clearing it first.
         freeze() and thaw() are called internally to avoid flashing.
 
+        When clearing a list which already has rows, the instances which
+        are in both keep their rows and the selection, the others are
+        added or removed and, unless the list is sorted, the rows end up
+        in the order of instances.
+
+        When progressive is True the rows are added in small chunks
+        from the main loop, so the window stays responsive while a big
+        result set is loaded; loading-progress is emitted after each
+        chunk. The instances are only iterated once, so generators and
+        database cursors can be used directly. Instead of being merged,
+        the list is cleared first and the selection is restored when the
+        loading finishes.
+
+        A progressive loading is cancelled by :meth:`clear` or by a new
+        call to add_list(), unless it only appends rows.
+
         :param instances: a list to be added
         :param clear: a boolean that specifies whether or not to
           clear the list
+        :param progressive: if the rows should be added progressively
         """
+        if clear or progressive:
+            self.cancel_loading()
+        if progressive:
+            self._start_loading(instances, clear)
+            return
 
         self._treeview.freeze_notify()
 
@@ -1939,10 +4829,78 @@ class ObjectList(Gtk.Box):
 
     def clear(self):
         """Removes all the instances of the list"""
+        self.cancel_loading()
+        if self._batch is not None:
+            # The pending changes are about rows which are gone now
+            self._batch.changes.clear()
+            self._batch.select = None
+        if self._dirty_rows is not None:
+            self._clear_dirty_rows()
+        self._leave_virtual_mode()
         self._model.clear()
         self._iters = collections.OrderedDict()
+        self._reset_indexes()
+        self._sort_keys = {}
+        if self._cell_text_cache is not None:
+            self._cell_text_cache.clear()
+        for aggregate in self._aggregates.values():
+            aggregate._clear()
+        self.clear_message()
+
+    def set_row_provider(self, provider, page_size=100, max_pages=20):
+        """
+        Uses a row provider instead of loading all the instances in the list.
+        The rows are fetched in pages of page_size rows when the treeview
+        needs to display them and at most max_pages pages are kept in memory,
+        so the cost of showing a huge result set is about the same as
+        showing one screen of data.
+
+        While a row provider is set the list is read-only and cannot be
+        sorted by the user. Calling add_list() or clear() goes back to a
+        normal list, :meth:`refresh` fetches the rows again.
+
+        :param provider: a :class:`kiwi.interfaces.IRowProvider`
+        :param page_size: number of rows fetched at once
+        :param max_pages: maximum number of pages kept in memory
+        """
+        if page_size < 1 or max_pages < 1:
+            raise ValueError("page_size and max_pages must be positive")
+        self.cancel_loading()
+
+        if self._native_columns is not None:
+            raise TypeError("a row provider cannot be used with "
+                            "native columns")
+        if self._row_filter is not None:
+            raise TypeError("a row provider cannot be used with a filter")
+
+        self.unselect_all()
+        if self._store is None:
+            self._store = self._model
+            self._store.clear()
+            for column in self._columns:
+                column.treeview_column.set_sort_column_id(-1)
+        had_rows = bool(len(self._model))
+
+        model = _VirtualListModel(provider, page_size, max_pages)
+        self.set_model(model)
+        self._iters = _VirtualIters(model)
+        self._reset_indexes()
+        self._invalidate_aggregates()
         self.clear_message()
 
+        has_rows = bool(len(model))
+        if had_rows != has_rows:
+            self.emit('has-rows', has_rows)
+
+    def get_row_provider(self):
+        """
+        Returns the row provider set by :meth:`set_row_provider` or None
+        if the instances were added to the list.
+        """
+        if self._store is None:
+            return None
+        return self._model.get_provider()
+
     def get_next(self, instance, is_circular=True):
         """
         Returns the item after instance in the list.
@@ -2110,6 +5068,10 @@ class ObjectList(Gtk.Box):
 
     def set_cell_data_func(self, cell_data_func):
         self.cell_data_func = cell_data_func
+        if self._native_columns is not None:
+            # Native columns cannot call cell_data_func
+            for column in self._columns:
+                self._bind_native_column(column)
 
     def get_visible_columns(self):
         """Returns a list of visibile columns"""
@@ -2144,16 +5106,117 @@ class ObjectList(Gtk.Box):
         for column in self.get_visible_columns():
             attributes.append(column.attribute)
 
-        for item in (data or self):
-            row = []
-            for attribute in attributes:
-                row.append(getattr(item, attribute, None))
-            yield row
+        # The values are extracted in bulk, a chunk of rows at a time
+        items = iter(data or self)
+        while True:
+            chunk = list(itertools.islice(items, _CELL_CONTENTS_CHUNK_ROWS))
+            if not chunk:
+                break
+            values = kgetattr_many(chunk, attributes, None, flat=True)
+            for row in zip(*values):
+                yield list(row)
+
+    def export(self, fileobj, dialect='excel', header=True, threaded=True):
+        """
+        Writes the visible columns of the rows to fileobj as CSV, using
+        the text of the cells, see :meth:`Column.as_string`. The rows
+        are written in the order they are displayed and the rows hidden
+        by :meth:`set_filter` are skipped.
+
+        By default the export happens in the background: the values are
+        read in chunks from the main loop and formatted and written by a
+        thread, which only keeps a few chunks in memory. export-progress
+        is emitted as rows are written and export-error if writing
+        failed or the rows were removed or reordered meanwhile.
+
+        :param fileobj: a file-like object opened in text mode, for files
+          use newline=''
+        :param dialect: a :mod:`csv` dialect, 'excel-tab' writes TSV
+        :param header: if the column titles are written first
+        :param threaded: if False the rows are written right away and
+          exceptions are raised
+        """
+        self._check_not_virtual()
+        if self._export is not None:
+            raise TypeError("%s is already exporting" % (self.get_name(),))
+
+        export = _Export(self, fileobj, dialect, header)
+        if not threaded:
+            try:
+                writer = export.create_writer()
+                while True:
+                    rows = export.read_chunk()
+                    if rows is None:
+                        break
+                    export.write_rows(writer, rows)
+                    self.emit('export-progress', export.written, False)
+            finally:
+                export.disconnect()
+            self.emit('export-progress', export.written, True)
+            return
+
+        self._export = export
+        export.queue = queue.Queue(_EXPORT_QUEUE_CHUNKS)
+        export.thread = threading.Thread(target=self._export_thread,
+                                         args=(export,))
+        export.thread.daemon = True
+        export.thread.start()
+        export.source_id = GLib.idle_add(self._export_chunk, export)
+
+    def cancel_export(self):
+        """
+        Stops an export started by :meth:`export`, the rows already
+        written are kept
+        """
+        export = self._export
+        if export is None:
+            return
+        export.cancelled = True
+        self._stop_export(export)
+        try:
+            export.queue.put_nowait(None)
+        except queue.Full:
+            # The thread checks cancelled after each chunk
+            pass
+
+    def is_exporting(self):
+        """
+        Returns True while an export started by :meth:`export` is running
+        """
+        return self._export is not None
 
 
 type_register(ObjectList)
 
 
+class GroupRow(object):
+    """
+    A row of an :class:`ObjectTree` which groups the rows with the same
+    value of an attribute, see :meth:`ObjectTree.add_grouped`.
+
+    The grouped attributes of the group and of its parent groups are set
+    on it, so a column displaying one of them also displays the key in
+    the group rows. The aggregated attributes which are not one of these
+    keys are set to the sum of the values of the grouped instances, None
+    values are ignored. Group rows are not counted by the
+    :class:`ColumnAggregate` of the tree.
+
+    :ivar group_attribute: the grouped attribute
+    :ivar group_key: the value of the attribute for this group
+    :ivar group_parent: the parent GroupRow, or None
+    :ivar group_count: the number of instances in the group
+    """
+
+    def __init__(self, group_attribute, group_key, group_parent=None):
+        self.group_attribute = group_attribute
+        self.group_key = group_key
+        self.group_parent = group_parent
+        self.group_count = 0
+
+    def __repr__(self):
+        return '<GroupRow %s=%r>' % (self.group_attribute, self.group_key)
+
+
 class ObjectTree(ObjectList):
     """
     Signals
@@ -2170,8 +5233,27 @@ class ObjectTree(ObjectList):
                  sortable=False, model=None):
         if not model:
             model = Gtk.TreeStore(object)
+        # instance -> parent instance, None for the roots
+        self._parents = {}
+        # parent instance, None for the roots -> OrderedDict of children
+        self._children = {}
+        self._children_provider = None
+        self._has_children = None
+        self._unload_timeout = 0
+        # instance -> iter of the placeholder row of its unloaded children
+        self._placeholders = {}
+        # instance -> source id of the timeout unloading its children
+        self._unload_sources = {}
+        # The instances grouped by add_grouped(), the aggregated
+        # attributes and instance -> attribute -> value, which is what
+        # regroup() uses
+        self._grouped = None
+        self._aggregated = None
+        self._group_values = None
         ObjectList.__init__(self, columns, objects, mode, sortable, model)
         self.get_treeview().connect('row-expanded', self._on_treeview__row_expanded)
+        self.get_treeview().connect('row-collapsed',
+                                    self._on_treeview__row_collapsed)
 
     def __iter__(self):
         def _iter_children(obj):
@@ -2183,7 +5265,150 @@ class ObjectTree(ObjectList):
         for obj in self._model:
             yield obj[COL_MODEL]
             for child in _iter_children(obj):
+                if child is not empty_marker:
+                    yield child
+
+    def __setitem__(self, arg, item):
+        olditem = self[arg]
+        ObjectList.__setitem__(self, arg, item)
+        self._replace_node(olditem, item)
+
+    def _add_node(self, parent, instance, prepend=False):
+        if instance in self._parents:
+            # Added twice, it is only kept under its last parent
+            self._children[self._parents[instance]].pop(instance, None)
+        self._parents[instance] = parent
+        siblings = self._children.get(parent)
+        if siblings is None:
+            siblings = self._children[parent] = collections.OrderedDict()
+        siblings[instance] = None
+        if prepend:
+            siblings.move_to_end(instance, last=False)
+
+    def _remove_node(self, instance, descendants):
+        parent = self._parents.pop(instance, None)
+        siblings = self._children.get(parent)
+        if siblings is not None:
+            siblings.pop(instance, None)
+            if not siblings:
+                del self._children[parent]
+        self._children.pop(instance, None)
+        for descendant in descendants:
+            del self._parents[descendant]
+            self._children.pop(descendant, None)
+
+    def _replace_node(self, old, new):
+        # new takes the place of old, keeping its parent and children
+        parent = self._parents.pop(old)
+        self._parents[new] = parent
+        self._children[parent] = collections.OrderedDict(
+            (new if sibling is old else sibling, None)
+            for sibling in self._children[parent])
+        children = self._children.pop(old, None)
+        if children is not None:
+            self._children[new] = children
+            for child in children:
+                self._parents[child] = new
+
+    def _iter_descendants(self, instance, force_load=False):
+        # Depth first, without recursion so deep trees are fine
+        children = self._children
+        if force_load and instance in self._placeholders:
+            self._load_children(instance)
+        stack = [iter(children.get(instance, ()))]
+        while stack:
+            for child in stack[-1]:
                 yield child
+                if force_load and child in self._placeholders:
+                    self._load_children(child)
+                if child in children:
+                    stack.append(iter(children[child]))
+                    break
+            else:
+                stack.pop()
+
+    def _remove(self, objid):
+        if not objid in self._iters:
+            # Already removed with its parent
+            return False
+        # The model removes the rows of the descendants too
+        descendants = list(self._iter_descendants(objid))
+        retval = ObjectList._remove(self, objid)
+        for descendant in descendants:
+            self._iters.pop(descendant, None)
+            self._invalidate_row(descendant)
+        for instance in [objid] + descendants:
+            self._placeholders.pop(instance, None)
+            self._cancel_unload(instance)
+        self._remove_node(objid, descendants)
+        return retval
+
+    def _create_native_store(self):
+        ObjectList._create_native_store(self)
+        # The placeholders were copied to the new model
+        self.flush()
+
+    def _node_added(self, parent, instance, treeiter):
+        # Called after the row of instance was added below parent
+        if self._children_provider is None:
+            return
+        if parent is not None:
+            # Children were added explicitly, the parent is loaded
+            self._remove_placeholder(parent)
+        if self._has_children is None or self._has_children(instance):
+            self._placeholders[instance] = self._model.append(
+                treeiter, self._create_row(empty_marker))
+
+    def _remove_placeholder(self, instance):
+        placeholder = self._placeholders.pop(instance, None)
+        if placeholder is not None:
+            self._model.remove(placeholder)
+
+    def _load_children(self, instance):
+        if not instance in self._placeholders:
+            return
+        # If the provider fails the placeholder stays, so the children
+        # can be loaded on the next expand
+        children = list(self._children_provider(instance))
+        model = self._model
+        iters = self._iters
+        parent_iter = iters[instance]
+        self._treeview.freeze_notify()
+        self._freeze_aggregates()
+        try:
+            # The children are added before removing the placeholder,
+            # so an expanded row stays expanded
+            placeholder = self._placeholders.pop(instance)
+            for child in children:
+                treeiter = model.append(parent_iter, self._create_row(child))
+                iters[child] = treeiter
+                self._add_node(instance, child)
+                self._node_added(None, child, treeiter)
+                self._row_added(child)
+            model.remove(placeholder)
+        finally:
+            self._thaw_aggregates()
+            self._treeview.thaw_notify()
+
+    def _unload_children(self, instance):
+        self._unload_sources.pop(instance, None)
+        treeiter = self._iters.get(instance)
+        if treeiter is None or instance in self._placeholders:
+            return False
+        path = self._get_view_path(treeiter)
+        if path is not None and self._treeview.row_expanded(path):
+            return False
+
+        for child in list(self._children.get(instance, ())):
+            self._remove(child)
+        self._placeholders[instance] = self._model.append(
+            treeiter, self._create_row(empty_marker))
+        return False
+
+    def _cancel_unload(self, instance):
+        source_id = self._unload_sources.pop(instance, None)
+        if source_id is not None:
+            GLib.source_remove(source_id)
 
     def _append_internal(self, parent, instance, select, prepend):
         iters = self._iters
@@ -2200,14 +5425,19 @@ class ObjectTree(ObjectList):
         self._treeview.freeze_notify()
 
         if prepend:
-            row_iter = self._model.prepend(parent_iter, (instance,))
+            row_iter = self._model.prepend(parent_iter,
+                                           self._create_row(instance))
         else:
-            row_iter = self._model.append(parent_iter, (instance,))
+            row_iter = self._model.append(parent_iter,
+                                          self._create_row(instance))
 
         self._iters[instance] = row_iter
+        self._add_node(parent, instance, prepend)
+        self._node_added(parent, instance, row_iter)
+        self._row_added(instance)
 
         if self._autosize:
-            self._treeview.columns_autosize()
+            self._autosize_columns()
 
         if select:
             self._select_and_focus_row(row_iter)
@@ -2216,14 +5446,21 @@ class ObjectTree(ObjectList):
 
     def _model_append(self, instance):
         # Overriding ObjectList._model_append as appending on a tree model
-        # takes the parent too as the first arg.
-        return self._model.append(self.get_parent(instance), (instance,))
-
-    def _model_insert_after(self, prev, instance):
-        # Overriding ObjectList._model_insert_after as inserting before on
-        # a tree model takes the parent too as the first arg.
-        return self._model.insert_after(self.get_parent(instance), prev,
-                                        (instance,))
+        # takes the parent too as the first arg. Instances loaded with
+        # add_list() are roots.
+        self._add_node(None, instance)
+        self._row_added(instance)
+        treeiter = self._model.append(None, self._create_row(instance))
+        self._node_added(None, instance, treeiter)
+        return treeiter
+
+    def _model_reorder(self, instances):
+        # Overriding ObjectList._model_reorder, tree rows keep their
+        # position under their parents.
+        pass
+
+    def _has_placeholder_rows(self):
+        return bool(self._placeholders)
 
     def append(self, parent, instance, select=False):
         """
@@ -2245,6 +5482,215 @@ class ObjectTree(ObjectList):
         """
         return self._append_internal(parent, instance, select, prepend=True)
 
+    def add_tree(self, pairs, clear=False):
+        """
+        Adds many instances to the tree in one pass.
+
+        :param pairs: a sequence of (parent, instance) tuples, parent is
+          None for the roots. A parent must be in the tree or come
+          before its children in pairs.
+        :param clear: if the tree should be cleared first
+        """
+        self._check_not_virtual()
+        if clear:
+            self.clear()
+
+        model = self._model
+        iters = self._iters
+        self._treeview.freeze_notify()
+        self._freeze_aggregates()
+        try:
+            for parent, instance in pairs:
+                if parent is None:
+                    parent_iter = None
+                else:
+                    parent_iter = iters.get(parent)
+                    if parent_iter is None:
+                        raise ValueError("parent %r of %r is not in the tree"
+                                         % (parent, instance))
+                treeiter = model.append(parent_iter,
+                                        self._create_row(instance))
+                iters[instance] = treeiter
+                self._add_node(parent, instance)
+                self._node_added(parent, instance, treeiter)
+                self._row_added(instance)
+        finally:
+            self._thaw_aggregates()
+            self._treeview.thaw_notify()
+
+        if self._autosize:
+            self._autosize_columns()
+
+    def clear(self):
+        for source_id in self._unload_sources.values():
+            GLib.source_remove(source_id)
+        self._unload_sources = {}
+        self._placeholders = {}
+        ObjectList.clear(self)
+        self._parents = {}
+        self._children = {}
+        self._grouped = None
+        self._aggregated = None
+        self._group_values = None
+
+    def _get_group_value(self, instance, attribute):
+        values = self._group_values[instance]
+        value = values.get(attribute, _marker)
+        if value is _marker:
+            value = values[attribute] = kgetattr(instance, attribute, None)
+        return value
+
+    def _add_groups(self, group_by):
+        groups = {}
+        pairs = []
+        sums = {}
+        get_value = self._get_group_value
+        # The attributes summed by the groups of each level, the keys of
+        # a group are not replaced by a sum
+        aggregated = [[name for name in self._aggregated
+                       if name not in group_by[:level + 1]]
+                      for level in range(len(group_by))]
+        for instance in self._grouped:
+            parent = None
+            key = ()
+            for level, attribute in enumerate(group_by):
+                value = get_value(instance, attribute)
+                key += (value,)
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = GroupRow(attribute, value, parent)
+                    # The keys of the parent groups too
+                    for group_attribute, group_key in zip(group_by, key):
+                        setattr(group, group_attribute, group_key)
+                    pairs.append((parent, group))
+                group.group_count += 1
+                for name in aggregated[level]:
+                    value = get_value(instance, name)
+                    if value is None:
+                        continue
+                    total = sums.get((group, name))
+                    sums[group, name] = (value if total is None
+                                         else total + value)
+                parent = group
+            pairs.append((parent, instance))
+
+        for key, group in groups.items():
+            for name in aggregated[len(key) - 1]:
+                setattr(group, name, sums.get((group, name)))
+        self.add_tree(pairs)
+
+    def add_grouped(self, instances, group_by, aggregates=None):
+        """
+        Replaces the content of the tree by instances grouped by the
+        values of the attributes in group_by, for instance::
+
+          tree.add_grouped(sales, ['branch', 'category'], ['total'])
+
+        A :class:`GroupRow` is added for each branch, with a GroupRow
+        for each category of that branch as children, which have the
+        sales as children. The instances are grouped in a single pass
+        and the tree is loaded with :meth:`add_tree`. The groups are in
+        the order their first instance appears in instances.
+
+        The values of the attributes are read once and kept, so
+        :meth:`regroup` can group the same instances again.
+
+        :param instances: the instances to group
+        :param group_by: a list of attributes, the first one is the
+          top level
+        :param aggregates: a list of attributes which are summed for each
+          group, see :class:`GroupRow`
+        """
+        self._check_not_virtual()
+        if not group_by:
+            raise ValueError("group_by must have at least one attribute")
+        self.clear()
+        self._grouped = list(instances)
+        self._aggregated = list(aggregates or [])
+        self._group_values = dict((instance, {})
+                                  for instance in self._grouped)
+        self._add_groups(group_by)
+
+    def regroup(self, group_by):
+        """
+        Groups the instances of the last :meth:`add_grouped` call again,
+        by different attributes. Only the values of attributes which were
+        not used before are read from the instances.
+
+        :param group_by: a list of attributes
+        """
+        if self._grouped is None:
+            raise TypeError("%s was not loaded with add_grouped()" %
+                            (self.get_name(),))
+        if not group_by:
+            raise ValueError("group_by must have at least one attribute")
+        grouped = (self._grouped, self._aggregated, self._group_values)
+        self.clear()
+        self._grouped, self._aggregated, self._group_values = grouped
+        self._add_groups(group_by)
+
+    def get_groups(self, instance):
+        """
+        Returns the :class:`GroupRow` instances containing an instance,
+        from the top level down to its parent.
+
+        :param instance: an instance added by :meth:`add_grouped`
+        """
+        groups = []
+        parent = self._parents.get(instance)
+        while isinstance(parent, GroupRow):
+            groups.insert(0, parent)
+            parent = parent.group_parent
+        return groups
+
+    def set_children_provider(self, provider, has_children=None,
+                              unload_timeout=0):
+        """
+        Loads the children of the rows when they are expanded for the
+        first time, instead of adding the whole tree up front. Until
+        then the rows have a placeholder child, so they can be expanded.
+        Adding a child explicitly with :meth:`append`, :meth:`prepend`
+        or :meth:`add_tree` marks the children of the parent as loaded.
+
+        :param provider: a callable receiving an instance and returning
+          its children, or None to disable loading on expand
+        :param has_children: an optional callable receiving an instance
+          and returning False if it has no children, which avoids
+          showing an expander for the leaves
+        :param unload_timeout: if not 0, the children of a row which
+          stays collapsed for this number of seconds are removed and
+          loaded again the next time it is expanded
+        """
+        if provider is not None and not callable(provider):
+            raise TypeError("provider must be callable, not %r" % (provider,))
+        self._children_provider = provider
+        self._has_children = has_children
+        self._unload_timeout = unload_timeout
+        if provider is None:
+            for instance in list(self._placeholders):
+                self._remove_placeholder(instance)
+            for instance in list(self._unload_sources):
+                self._cancel_unload(instance)
+
+    def get_children_provider(self):
+        """
+        Returns the children provider, see :meth:`set_children_provider`
+        """
+        return self._children_provider
+
+    def walk(self, instance=None, force_load=False):
+        """
+        Iterates over the descendants of an instance, depth first.
+
+        :param instance: the instance, None for the whole tree
+        :param force_load: if True the children which were not loaded
+          yet are loaded from the children provider, otherwise only
+          the loaded rows are visited
+        """
+        if instance is not None and not instance in self._parents:
+            raise ValueError("instance %r is not in the list" % instance)
+        return self._iter_descendants(instance, force_load)
+
     def expand(self, instance, open_all=True):
         """
         This method opens the row specified by path so its children
@@ -2258,8 +5704,9 @@ class ObjectTree(ObjectList):
             raise ValueError("instance %r is not in the list" % instance)
         treeiter = self._iters[objid]
 
-        self.get_treeview().expand_row(
-            self._model[treeiter].path, open_all)
+        path = self._get_view_path(treeiter)
+        if path is not None:
+            self.get_treeview().expand_row(path, open_all)
 
     def collapse(self, instance):
         """
@@ -2272,8 +5719,9 @@ class ObjectTree(ObjectList):
             raise ValueError("instance %r is not in the list" % instance)
         treeiter = self._iters[objid]
 
-        self.get_treeview().collapse_row(
-            self._model[treeiter].path)
+        path = self._get_view_path(treeiter)
+        if path is not None:
+            self.get_treeview().collapse_row(path)
 
     def get_parent(self, instance):
         """
@@ -2284,14 +5732,9 @@ class ObjectTree(ObjectList):
         if instance is None:
             return None
         objid = instance
-        if not objid in self._iters:
+        if not objid in self._parents:
             raise ValueError("instance %r is not in the list" % instance)
-        treeiter = self._iters[objid]
-        parentiter = self._model.iter_parent(treeiter)
-        if not parentiter:
-            return None
-
-        return self._model[parentiter][COL_MODEL]
+        return self._parents[objid]
 
     def get_root(self, instance):
         """
@@ -2303,47 +5746,64 @@ class ObjectTree(ObjectList):
         if instance is None:
             return None
         objid = instance
-        if not objid in self._iters:
+        if not objid in self._parents:
             raise ValueError("instance %r is not in the list" % instance)
 
-        instance_iter = self._iters[objid]
-        if self._model.iter_depth(instance_iter) == 0:
-            return self._model[instance_iter][COL_MODEL]
-
-        for iter in self._iters.values():
-            if self._model.is_ancestor(iter, instance_iter):
-                return self.get_root(self._model[iter][COL_MODEL])
+        parents = self._parents
+        parent = parents[objid]
+        while parent is not None:
+            objid = parent
+            parent = parents[objid]
+        return objid
 
-    def get_descendants(self, root_instance):
+    def get_descendants(self, root_instance, force_load=False):
         """
         This method returns the descendants objects of a certain instance.
         If the given instance is a leaf, then return an empty sequence.
         :param root_instance: an instance which we want the descendants
+        :param force_load: if True the children which were not loaded yet
+          are loaded from the children provider
         :returns: a sequence of descendants objects
         """
         objid = root_instance
-        if not objid in self._iters:
+        if not objid in self._parents:
             raise ValueError("instance %r is not in the list" % root_instance)
 
-        root_instance_iter = self._iters[objid]
-        children = []
-        for iter in self._iters.values():
-            if self._model.is_ancestor(root_instance_iter, iter):
-                children.append(self._model[iter][COL_MODEL])
-        return children
+        return list(self._iter_descendants(objid, force_load))
 
     def _on_treeview__row_expanded(self, treeview, treeiter, treepath):
-        self.emit('row-expanded', self.get_model()[treeiter][COL_MODEL])
+        instance = treeview.get_model()[treeiter][COL_MODEL]
+        self._cancel_unload(instance)
+        self._load_children(instance)
+        self.emit('row-expanded', instance)
+
+    def _on_treeview__row_collapsed(self, treeview, treeiter, treepath):
+        if not self._unload_timeout:
+            return
+        instance = treeview.get_model()[treeiter][COL_MODEL]
+        if instance in self._placeholders or not instance in self._children:
+            return
+        self._cancel_unload(instance)
+        self._unload_sources[instance] = GLib.timeout_add_seconds(
+            self._unload_timeout, self._unload_children, instance)
 
     def flush(self):
         """Update all iterators"""
-        def flattern(row):
-            self._iters[row[COL_MODEL]] = row.iter
+        def flattern(row, parent):
+            instance = row[COL_MODEL]
+            if instance is empty_marker:
+                self._placeholders[parent] = row.iter
+                return
+            self._iters[instance] = row.iter
+            self._add_node(parent, instance)
             for child_row in row.iterchildren():
-                flattern(child_row)
+                flattern(child_row, instance)
 
+        self._parents = {}
+        self._children = {}
+        self._placeholders = {}
         for row in self._model:
-            flattern(row)
+            flattern(row, None)
 
 
 type_register(ObjectTree)
@@ -2476,7 +5936,7 @@ class SummaryLabel(ListLabel):
         the signedness of the object being summed. Returns a bool, ``True``
         means positive, ``False`` means negative.
         """
-        if data_func and not isinstance(data_func, collections.Callable):
+        if data_func and not callable(data_func):
             raise ValueError("data_func must be callable, not %r"
                              % (data_func,))
 
@@ -2484,34 +5944,34 @@ class SummaryLabel(ListLabel):
         if not issubclass(self._column.data_type, number):
             raise TypeError("data_type of column must be a number, not %r",
                             self._column.data_type)
-        klist.connect('cell-edited', self._on_klist__cell_edited)
 
         self._data_func = data_func
+        # Labels on the same column share the aggregate
+        self._aggregate = klist.get_aggregate(self._column, data_func)
+        self._aggregate.connect('changed', self._on_aggregate__changed)
 
-        self.update_total()
+        self._update_total()
 
     # Public API
 
+    def get_aggregate(self):
+        """Returns the :class:`ColumnAggregate` used by the label"""
+        return self._aggregate
+
     def update_total(self):
-        """Recalculate the total value of all columns"""
-        column = self._column
-        attr = column.attribute
-        get_attribute = column.get_attribute
-
-        value = column.data_type('0')
-        for obj in self._klist:
-            attr_value = get_attribute(obj, attr, 0) or 0
-            if self._data_func and not self._data_func(obj):
-                value -= attr_value
-            else:
-                value += attr_value
+        """Recalculate the total value of all columns. The total is kept
+        up to date when the list changes, this is only needed when the
+        instances were modified without calling :meth:`ObjectList.update`"""
+        self._aggregate.invalidate()
+        self._update_total()
 
-        self.set_value(column.as_string(value))
+    def _update_total(self):
+        self.set_value(self._column.as_string(self._aggregate.get_sum()))
 
     # Callbacks
 
-    def _on_klist__cell_edited(self, klist, obj, column):
-        self.update_total()
+    def _on_aggregate__changed(self, aggregate):
+        self._update_total()
 
 
 type_register(SummaryLabel)
@@ -33,7 +33,7 @@ import logging
 from gi.repository import Gtk
 
 from kiwi import ValueUnset
-from kiwi.accessor import kgetattr, ksetattr, clear_attr_cache
+from kiwi.accessor import kgetattr, ksetattr
 from kiwi.datatypes import converter
 from kiwi.interfaces import IProxyWidget, IValidatableProxyWidget
 
@@ -388,12 +388,6 @@ class Proxy:
                 raise TypeError("model has wrong type %s, expected %s"
                                 % (type(model), type(self._model)))
 
-        # the following isn't strictly necessary, but it currently works
-        # around a bug with reused ids in the attribute cache and also
-        # makes a lot of sense for most applications (don't want a huge
-        # eternal cache pointing to models that you're not using anyway)
-        clear_attr_cache()
-
         # unregister previous proxy
         self._unregister_proxy_in_model()
 
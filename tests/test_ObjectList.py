@@ -1,11 +1,17 @@
 #!/usr/bin/env python
+import decimal
+import io
 import unittest
 
 from gi.repository import GObject, Gtk
 
+from kiwi import ValueUnset
+from kiwi.currency import currency
 from kiwi.datatypes import converter
-from kiwi.ui.objectlist import ObjectList, ObjectTree, Column
-from kiwi.python import Settable
+from kiwi.ui.objectlist import (ObjectList, ObjectTree, Column,
+                                PrefixFilter, SubstringFilter, RangeFilter,
+                                EqualsFilter, SummaryLabel, _RowFilter)
+from kiwi.python import Settable, enum
 
 from .utils import refresh_gui
 
@@ -53,6 +59,17 @@ class ColumnTests(unittest.TestCase):
         column = GObject.new(Column, attribute='foo')
         self.assertEqual(column.attribute, "foo")
 
+    def testCurrencyAsString(self):
+        column = Column('price', data_type=currency)
+        conv = converter.get_converter(currency)
+        self.assertEqual(column.as_string(None), '')
+        self.assertEqual(column.as_string(ValueUnset), '')
+        for value in [currency('1234.5'), decimal.Decimal('-2'), 3, '4.5']:
+            self.assertEqual(column.as_string(value), conv.as_string(value))
+        # Rejected like the converter does
+        self.assertRaises(decimal.InvalidOperation, column.as_string, 'abc')
+        self.assertRaises(TypeError, column.as_string, object())
+
     def testCompareFunc(self):
         def sort_func():
             return True
@@ -236,6 +253,120 @@ class TreeDataTests(unittest.TestCase):
         test_descendants = self.tree.get_descendants(child2)
         self.assertEqual(test_descendants, [])
 
+    def testAddTree(self):
+        root = Person('Big Kahuna', 7000)
+        child1 = Person('Craf Kahuna', 200)
+        child2 = Person('Sorcerer Kahuna', 150)
+
+        self.tree.add_tree([(None, root), (root, child1), (child1, child2)])
+        self.assertEqual(list(self.tree), [root, child1, child2])
+        self.assertEqual(self.tree.get_parent(child2), child1)
+        self.assertEqual(self.tree.get_root(child2), root)
+        self.assertRaises(ValueError, self.tree.add_tree,
+                          [(Person('Unknown', 1), Person('Orphan', 1))])
+
+    def testRemoveSubtree(self):
+        root = Person('Big Kahuna', 7000)
+        child1 = Person('Craf Kahuna', 200)
+        child2 = Person('Sorcerer Kahuna', 150)
+
+        self.tree.add_tree([(None, root), (root, child1), (child1, child2)])
+        self.tree.remove(child1)
+        self.assertEqual(list(self.tree), [root])
+        self.assertFalse(child2 in self.tree)
+        self.assertEqual(self.tree.get_descendants(root), [])
+        self.assertRaises(ValueError, self.tree.get_parent, child2)
+
+    def testChildrenProvider(self):
+        root = Person('Big Kahuna', 7000)
+        children = {root: [Person('Craf Kahuna', 200)]}
+        loaded = []
+
+        def provider(instance):
+            loaded.append(instance)
+            return children.get(instance, [])
+
+        self.tree.set_children_provider(
+            provider, has_children=lambda instance: instance in children)
+        self.tree.append(None, root)
+        model = self.tree.get_model()
+        treeiter = model.get_iter_first()
+        # The placeholder row
+        self.assertEqual(model.iter_n_children(treeiter), 1)
+        self.assertEqual(list(self.tree), [root])
+        self.assertEqual(self.tree.get_descendants(root), [])
+
+        self.assertEqual(self.tree.get_descendants(root, force_load=True),
+                         children[root])
+        self.assertEqual(loaded, [root])
+        self.assertEqual(model.iter_n_children(treeiter), 1)
+        self.assertEqual(list(self.tree.walk()), [root] + children[root])
+
+    def testChildrenProviderError(self):
+        root = Person('Big Kahuna', 7000)
+        child = Person('Craf Kahuna', 200)
+
+        def provider(instance):
+            yield child
+            if not self.loaded:
+                raise IOError
+
+        self.loaded = False
+        self.tree.set_children_provider(provider,
+                                        has_children=lambda instance: True)
+        self.tree.append(None, root)
+        self.assertRaises(IOError, self.tree.get_descendants, root,
+                          force_load=True)
+        # Still a placeholder, the children are loaded on the next try
+        self.assertEqual(self.tree.get_descendants(root), [])
+        self.loaded = True
+        self.assertEqual(self.tree.get_descendants(root, force_load=True),
+                         [child])
+
+    def testGrouped(self):
+        people = [Settable(name='Johan', city='Recife', age=24),
+                  Settable(name='Kiko', city='Campinas', age=28),
+                  Settable(name='Lorenzo', city='Recife', age=26),
+                  Settable(name='Gustavo', city='Campinas', age=None)]
+        self.tree.add_grouped(people, ['city'], ['age'])
+        recife, campinas = self.tree.get_model()
+        recife = recife[0]
+        self.assertEqual((recife.group_key, recife.city, recife.group_count,
+                          recife.age), ('Recife', 'Recife', 2, 50))
+        self.assertEqual(campinas[0].age, 28)
+        self.assertEqual(self.tree.get_descendants(recife),
+                         [people[0], people[2]])
+        self.assertEqual(self.tree.get_groups(people[0]), [recife])
+
+        # Regrouping uses the values read before
+        people[0].city = 'Olinda'
+        self.tree.regroup(['age', 'city'])
+        self.assertEqual(len(self.tree.get_model()), 4)
+        group = self.tree.get_groups(people[0])[1]
+        self.assertEqual((group.age, group.city), (24, 'Recife'))
+
+    def testGroupedAggregates(self):
+        tree = ObjectTree([Column('name'), Column('age', data_type=int)])
+        people = [Settable(name='Johan', city='Recife', age=24),
+                  Settable(name='Kiko', city='Campinas', age=28),
+                  Settable(name='Lorenzo', city='Recife', age=24)]
+        tree.add_grouped(people, ['city'], ['age'])
+        label = SummaryLabel(tree, 'age')
+        self.assertEqual(tree.get_aggregate('age').get_sum(), 76)
+        self.assertEqual(label.get_value_widget().get_text(), '76')
+
+        # The age groups keep their key instead of the sum
+        tree.regroup(['age', 'city'])
+        young = tree.get_groups(people[0])[0]
+        self.assertEqual((young.age, young.group_count), (24, 2))
+        recife = tree.get_groups(people[0])[1]
+        self.assertEqual((recife.age, recife.group_count), (24, 2))
+        tree.regroup(['city', 'age'])
+        recife = tree.get_groups(people[0])[0]
+        self.assertEqual((recife.city, recife.age), ('Recife', 48))
+        self.assertEqual(tree.get_aggregate('age').get_sum(), 76)
+        self.assertEqual(label.get_value_widget().get_text(), '76')
+
 
 class TestSignals(unittest.TestCase):
     def setUp(self):
@@ -465,5 +596,869 @@ class RadioColumnTests(unittest.TestCase):
         self.assertEqual(items[0].foo, True)
 
 
+class _RowProvider:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetched = []
+
+    def count(self):
+        return len(self.rows)
+
+    def fetch(self, offset, limit):
+        self.fetched.append((offset, limit))
+        return self.rows[offset:offset + limit]
+
+
+class VirtualModelTest(unittest.TestCase):
+    def setUp(self):
+        self.rows = [Settable(name='row %d' % i) for i in range(1000)]
+        self.provider = _RowProvider(self.rows)
+        self.klist = ObjectList([Column('name')])
+        self.klist.set_row_provider(self.provider, page_size=10, max_pages=2)
+
+    def testLen(self):
+        self.assertEqual(len(self.klist), 1000)
+        self.assertEqual(self.klist.get_row_provider(), self.provider)
+
+    def testGetItem(self):
+        self.assertEqual(self.klist[0], self.rows[0])
+        self.assertEqual(self.klist[555], self.rows[555])
+        self.assertEqual(self.klist[-1], self.rows[-1])
+        self.assertEqual(self.provider.fetched,
+                         [(0, 10), (550, 10), (990, 10)])
+
+    def testPagesAreEvicted(self):
+        for i in (0, 100, 200):
+            self.klist[i]
+        self.klist[0]
+        self.assertEqual(self.provider.fetched,
+                         [(0, 10), (100, 10), (200, 10), (0, 10)])
+
+    def testSelect(self):
+        item = self.klist[42]
+        self.assertTrue(item in self.klist)
+        self.klist.select(item)
+        self.assertEqual(self.klist.get_selected(), item)
+        self.assertEqual(self.klist.index(item), 42)
+
+    def testReadOnly(self):
+        self.assertRaises(TypeError, self.klist.append, Settable(name='x'))
+        self.assertRaises(TypeError, self.klist.remove, self.klist[0])
+        self.assertRaises(TypeError, self.klist.extend, [Settable(name='x')])
+
+    def testAddList(self):
+        self.klist.add_list([Settable(name='x')])
+        self.assertEqual(len(self.klist), 1)
+        self.assertEqual(self.klist.get_row_provider(), None)
+
+
+class ReloadTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name'), Column('age')])
+        self.klist.add_list(persons)
+
+    def testRemovals(self):
+        self.klist.add_list(persons[1:4])
+        self.assertEqual(list(self.klist), list(persons[1:4]))
+        self.assertFalse(persons[0] in self.klist)
+        self.assertFalse(persons[5] in self.klist)
+
+    def testReorder(self):
+        new_person = Person('Nando', 32)
+        instances = [persons[3], new_person, persons[0], persons[5]]
+        self.klist.add_list(instances)
+        self.assertEqual(list(self.klist), instances)
+
+    def testDuplicates(self):
+        self.klist.add_list([persons[2], persons[1], persons[2], persons[1]])
+        self.assertEqual(list(self.klist), [persons[2], persons[1]])
+
+    def testGenerator(self):
+        self.klist.add_list(person for person in reversed(persons))
+        self.assertEqual(list(self.klist), list(reversed(persons)))
+
+    def testSelectionPreserved(self):
+        self.klist.set_selection_mode(Gtk.SelectionMode.MULTIPLE)
+        self.klist.select_paths([1, 3])
+        self.klist.add_list([persons[3], persons[0], persons[2]])
+        self.assertEqual(self.klist.get_selected_rows(), [persons[3]])
+
+
+class KeySortingTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name', sorted=True),
+                                 Column('age', data_type=int)],
+                                sortable=True)
+        self.klist.set_key_sorting(True)
+        self.klist.add_list(persons)
+
+    def _names(self):
+        return [person.name for person in self.klist]
+
+    def testSorted(self):
+        self.assertTrue(self.klist.get_key_sorting())
+        self.assertEqual(self._names(), sorted(p.name for p in persons))
+
+    def testClicked(self):
+        column = self.klist.get_column_by_name('name')
+        column.treeview_column.clicked()
+        self.assertEqual(self._names(),
+                         sorted((p.name for p in persons), reverse=True))
+
+        column = self.klist.get_column_by_name('age')
+        column.treeview_column.clicked()
+        self.assertEqual([person.age for person in self.klist],
+                         sorted(p.age for p in persons))
+
+    def testAppend(self):
+        person = Person('Ivan', 30)
+        self.klist.append(person)
+        self.assertEqual(self._names().index('Ivan'), 2)
+
+    def testNoneLast(self):
+        person = Person(None, 30)
+        self.klist.append(person)
+        self.assertEqual(self.klist[-1], person)
+
+    def testUpdate(self):
+        person = persons[0]
+        old_name = person.name
+        try:
+            person.name = 'Aaron'
+            self.klist.update(person)
+            self.klist.sort_by_attribute('name')
+            self.assertEqual(self.klist[0], person)
+        finally:
+            person.name = old_name
+
+    def testSortFunc(self):
+        klist = ObjectList([Column('age', data_type=int, sorted=True,
+                                   sort_func=lambda a, b: b - a)],
+                           sortable=True)
+        klist.set_key_sorting(True)
+        klist.add_list(persons)
+        self.assertEqual([person.age for person in klist],
+                         sorted((p.age for p in persons), reverse=True))
+
+    def testTree(self):
+        tree = ObjectTree([Column('name', sorted=True)], sortable=True)
+        tree.set_key_sorting(True)
+        root = Person('Root', 0)
+        tree.add_tree([(None, persons[0]), (None, root)] +
+                      [(root, person) for person in persons[1:]])
+        # Descending after the click, the children are sorted too
+        tree.get_column_by_name('name').treeview_column.clicked()
+        model = tree.get_model()
+        self.assertEqual([row[0] for row in model], [root, persons[0]])
+        children = model[0].iterchildren()
+        self.assertEqual([row[0].name for row in children],
+                         sorted((p.name for p in persons[1:]), reverse=True))
+
+
+class CellTextCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.formatted = []
+        self.klist = ObjectList([Column('age', data_type=int,
+                                        format_func=self._format)])
+        self.klist.set_cell_text_cache(4)
+        self.klist.add_list(persons)
+        self.column = self.klist.get_column_by_name('age')
+
+    def _format(self, value):
+        self.formatted.append(value)
+        return str(value)
+
+    def testCached(self):
+        person = persons[0]
+        self.assertEqual(self.column._get_cell_text(person), '24')
+        self.assertEqual(self.column._get_cell_text(person), '24')
+        self.assertEqual(self.formatted, [24])
+
+    def testUpdate(self):
+        person = Person('Evandro', 24)
+        self.klist.append(person)
+        self.column._get_cell_text(person)
+        person.age = 25
+        self.assertEqual(self.column._get_cell_text(person), '24')
+        self.klist.update(person)
+        self.assertEqual(self.column._get_cell_text(person), '25')
+        self.klist.refresh()
+        self.assertEqual(self.column._get_cell_text(person), '25')
+        self.assertEqual(self.formatted, [24, 25, 25])
+
+    def testEviction(self):
+        for person in persons:
+            self.column._get_cell_text(person)
+        self.assertEqual(len(self.klist._cell_text_cache), 4)
+        self.column._get_cell_text(persons[0])
+        self.assertEqual(len(self.formatted), len(persons) + 1)
+
+
+class Status(enum):
+    (OPEN, CLOSED) = range(2)
+
+
+class CellDataTest(unittest.TestCase):
+    """The cell data functions specialized for a column must render
+    exactly like the generic ones"""
+
+    def setUp(self):
+        self.klist = ObjectList([
+            Column('price', data_type=float, format='%.2f'),
+            Column('age', data_type=int,
+                   format_func=lambda value: 'age %d' % value),
+            Column('name', data_type=str,
+                   format_func=lambda obj, data: data + obj.name,
+                   format_func_data='Mr. '),
+            Column('amount', data_type=currency),
+            Column('nick', data_type=str, editable_attribute='editable'),
+            Column('active', data_type=bool),
+            Column('status', data_type=Status)])
+        self.klist.add_list([
+            Settable(price=1.5, age=28, name='Kiko', amount=currency(10),
+                     nick='kiko', editable=True, active=True,
+                     status=Status.OPEN),
+            Settable(price=None, age=None, name=None, amount=ValueUnset,
+                     nick=None, editable=False, active=False,
+                     status=Status.CLOSED)])
+
+    def _render(self, attribute, specialized):
+        column = self.klist.get_column_by_name(attribute)
+        prop = column._renderer_prop
+        props = [prop]
+        if column.editable_attribute:
+            props.append('editable')
+        model = self.klist.get_model()
+        rendered = []
+        for row in model:
+            renderer = type(column._renderer)()
+            if issubclass(column.data_type, enum):
+                if specialized:
+                    func = column._create_cell_data_combo_func()
+                else:
+                    func = column._cell_data_combo_func
+            elif specialized:
+                func = column._create_cell_data_text_func(renderer, prop)
+            else:
+                func = column._cell_data_text_func
+            func(column.treeview_column, renderer, model, row.iter,
+                 (column, prop))
+            rendered.append(tuple(renderer.get_property(name)
+                                  for name in props))
+        return rendered
+
+    def _check(self, attribute, expected=None):
+        rendered = self._render(attribute, specialized=True)
+        self.assertEqual(rendered, self._render(attribute, specialized=False))
+        if expected is not None:
+            self.assertEqual(rendered, expected)
+
+    def testFormat(self):
+        self._check('price', [('1.50',), ('',)])
+
+    def testFormatFunc(self):
+        self._check('age', [('age 28',), ('',)])
+
+    def testFormatFuncData(self):
+        self._check('name', [('Mr. Kiko',), ('',)])
+
+    def testValueUnset(self):
+        self._check('amount')
+        self.assertEqual(self._render('amount', specialized=True)[1], ('',))
+
+    def testEditable(self):
+        self._check('nick', [('kiko', True), ('', False)])
+
+    def testBoolean(self):
+        self._check('active', [(True,), (False,)])
+
+    def testEnum(self):
+        self._check('status', [('Open',), ('Closed',)])
+
+    def testObjectListCellDataFunc(self):
+        self.klist.set_cell_data_func(
+            lambda column, renderer, obj, text: '<%s>' % text)
+        self._check('age', [('<age 28>',), ('<>',)])
+
+
+class NativeColumnsTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name'),
+                                 Column('age', data_type=int)],
+                                sortable=True)
+        self.klist.add_list(persons)
+        self.klist.set_native_columns(True)
+        self.model = self.klist.get_model()
+
+    def testModel(self):
+        self.assertTrue(self.klist.get_native_columns())
+        # object, name value, name text, age value, age text
+        self.assertEqual(self.model.get_n_columns(), 5)
+        row = self.model[0]
+        self.assertEqual(row[0], persons[0])
+        self.assertEqual(row[1], 'Johan')
+        self.assertEqual(row[3], 24)
+        self.assertEqual(row[4], '24')
+        self.assertEqual(list(self.klist), list(persons))
+
+    def testSort(self):
+        column = self.klist.get_column_by_name('age')
+        sort_column_id = column.treeview_column.get_sort_column_id()
+        self.assertEqual(sort_column_id, 3)
+        self.model.set_sort_column_id(sort_column_id,
+                                      Gtk.SortType.ASCENDING)
+        self.assertEqual([person.age for person in self.klist],
+                         sorted(p.age for p in persons))
+
+    def testUpdate(self):
+        person = Person('Evandro', 24)
+        self.klist.append(person)
+        person.age = 30
+        self.klist.update(person)
+        self.assertEqual(self.model[-1][3], 30)
+        self.assertEqual(self.model[-1][4], '30')
+
+    def testDefaultColumn(self):
+        # The default data type is str, even for other values
+        klist = ObjectList([Column('age')])
+        klist.set_native_columns(True)
+        klist.add_list(persons)
+        klist.update(persons[0])
+        self.assertEqual(klist.get_model()[0][1], '24')
+
+    def testDisable(self):
+        self.klist.set_native_columns(False)
+        self.assertEqual(self.klist.get_model().get_n_columns(), 1)
+        self.assertEqual(list(self.klist), list(persons))
+
+
+class FilterTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name'),
+                                 Column('age', data_type=int)])
+        self.klist.add_list(persons)
+        self.has_rows = []
+        self.klist.connect('has-rows',
+                           lambda klist, value: self.has_rows.append(value))
+
+    def _visible(self):
+        return [row[0].name for row in self.klist.get_treeview().get_model()]
+
+    def testPrefix(self):
+        self.klist.set_filter([PrefixFilter('name', 'k')])
+        self.assertEqual(self._visible(), ['Kiko'])
+        self.assertEqual(len(self.klist), len(persons))
+
+    def testSubstringAccents(self):
+        person = Person(u'J\xfalio', 30)
+        self.klist.append(person)
+        self.klist.set_filter([SubstringFilter('name', 'uli')])
+        self.assertEqual(self._visible(), [u'J\xfalio'])
+        self.klist.set_filter([SubstringFilter('name', 'uli',
+                                               ignore_accents=False)])
+        self.assertEqual(self._visible(), [])
+
+    def testRangeAndEquals(self):
+        self.klist.set_filter([RangeFilter('age', 24, 25)])
+        self.assertEqual(self._visible(), ['Johan', 'Gustavo', 'Salgado'])
+        self.klist.set_filter([RangeFilter('age', 24, 25),
+                               EqualsFilter('name', 'Salgado')])
+        self.assertEqual(self._visible(), ['Salgado'])
+
+    def testRefine(self):
+        self.klist.set_filter([SubstringFilter('name', 'o')])
+        self.assertEqual(self._visible(),
+                         ['Johan', 'Gustavo', 'Kiko', 'Salgado', 'Lorenzo'])
+        self.klist.set_filter([SubstringFilter('name', 'or')])
+        self.assertEqual(self._visible(), ['Lorenzo'])
+        self.klist.set_filter([SubstringFilter('name', 'o')])
+        self.assertEqual(len(self._visible()), 5)
+
+    def testHasRows(self):
+        self.klist.set_filter([PrefixFilter('name', 'x')])
+        self.assertEqual(self.has_rows, [False])
+        self.klist.set_filter(None)
+        self.assertEqual(self.has_rows, [False, True])
+        self.assertEqual(self.klist.get_filter(), [])
+
+    def testAppendAndUpdate(self):
+        self.klist.set_filter([PrefixFilter('name', 'ev')])
+        person = Person('Evandro', 24)
+        self.klist.append(person)
+        self.assertEqual(self._visible(), ['Evandro'])
+        person.name = 'Vandro'
+        self.klist.update(person)
+        self.assertEqual(self._visible(), [])
+        self.klist.remove(person)
+
+    def testIndexUpdatedInPlace(self):
+        self.klist.set_filter([PrefixFilter('name', 'k'),
+                               RangeFilter('age', 20, 30)])
+        self.assertEqual(self._visible(), ['Kiko'])
+        person = Person('Kleber', 22)
+        self.klist.append(person)
+        self.assertEqual(self._visible(), ['Kiko', 'Kleber'])
+        self.klist.remove(persons[2])
+        person.age = 40
+        self.klist.update(person)
+        self.assertEqual(self._visible(), [])
+        # Not narrower, the sorted texts and values are used
+        self.klist.set_filter([PrefixFilter('name', 'kl')])
+        self.assertEqual(self._visible(), ['Kleber'])
+        self.klist.set_filter([RangeFilter('age', 30)])
+        self.assertEqual(self._visible(), ['Kleber'])
+        self.klist.set_filter([EqualsFilter('age', 25)])
+        self.assertEqual(self._visible(), ['Gustavo', 'Salgado'])
+
+    def testIndexWithOtherRows(self):
+        row_filter = _RowFilter()
+        row_filter.set_filters([PrefixFilter('name', 'k')], persons)
+        # One row removed and one added which was not checked yet, the
+        # index has as many rows as the list but not the same ones
+        row_filter.invalidate(persons[0])
+        person = Person('Kleber', 22)
+        instances = persons[1:] + (person,)
+        row_filter.set_filters([PrefixFilter('name', 'kl')], instances)
+        self.assertEqual([p for p in instances if row_filter.is_visible(p)],
+                         [person])
+
+
+class AggregateTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name'),
+                                 Column('age', data_type=int)])
+        self.klist.add_list(persons)
+        self.aggregate = self.klist.get_aggregate('age')
+        self.changed = []
+        self.aggregate.connect('changed',
+                               lambda aggregate: self.changed.append(True))
+
+    def testValues(self):
+        ages = [person.age for person in persons]
+        self.assertEqual(self.aggregate.get_sum(), sum(ages))
+        self.assertEqual(self.aggregate.get_count(), len(ages))
+        self.assertEqual(self.aggregate.get_min(), min(ages))
+        self.assertEqual(self.aggregate.get_max(), max(ages))
+        self.assertEqual(self.aggregate.get_average(),
+                         decimal.Decimal(sum(ages)) / len(ages))
+
+    def testShared(self):
+        self.assertTrue(self.klist.get_aggregate('age') is self.aggregate)
+
+    def testChanges(self):
+        total = self.aggregate.get_sum()
+        person = Person('Evandro', 30)
+        self.klist.append(person)
+        self.assertEqual(self.aggregate.get_sum(), total + 30)
+        self.assertEqual(self.aggregate.get_max(), 30)
+
+        person.age = 20
+        self.klist.update(person)
+        self.assertEqual(self.aggregate.get_sum(), total + 20)
+        self.assertEqual(self.aggregate.get_min(), 20)
+
+        self.klist.remove(person)
+        self.assertEqual(self.aggregate.get_sum(), total)
+        self.assertEqual(self.aggregate.get_min(), 21)
+        self.assertEqual(len(self.changed), 3)
+
+    def testAddList(self):
+        self.klist.add_list(persons[:2])
+        self.assertEqual(self.aggregate.get_sum(), 49)
+        self.assertEqual(len(self.changed), 1)
+
+    def testExact(self):
+        klist = ObjectList([Column('value', data_type=float)])
+        klist.add_list([Settable(value=0.1) for i in range(10)])
+        self.assertEqual(klist.get_aggregate('value').get_sum(), 1.0)
+
+    def testSummaryLabel(self):
+        label = SummaryLabel(self.klist, 'age')
+        total = sum(person.age for person in persons)
+        self.assertEqual(label.get_value_widget().get_text(), str(total))
+        # Modified without update(), update_total() recalculates
+        persons[0].age += 10
+        try:
+            label.update_total()
+            self.assertEqual(label.get_value_widget().get_text(),
+                             str(total + 10))
+        finally:
+            persons[0].age -= 10
+
+    def testSetColumns(self):
+        self.klist.set_columns([Column('name'),
+                                Column('age', data_type=int)])
+        self.assertFalse(self.aggregate in self.klist._aggregates.values())
+        self.assertFalse(self.klist.get_aggregate('age') is self.aggregate)
+
+
+class ProgressiveLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name'), Column('age')])
+        self.progress = []
+        self.klist.connect('loading-progress',
+                           lambda klist, count, done:
+                           self.progress.append((count, done)))
+
+    def testGenerator(self):
+        instances = [Person('Name %d' % i, i) for i in range(2000)]
+        self.klist.add_list((i for i in instances), progressive=True)
+        self.assertTrue(len(self.klist) > 0)
+        while self.klist.is_loading():
+            refresh_gui()
+        self.assertEqual(list(self.klist), instances)
+        self.assertEqual(self.progress[-1], (2000, True))
+
+    def testSelectionRestored(self):
+        self.klist.add_list(persons)
+        self.klist.select(persons[1])
+        self.klist.add_list(iter(persons), progressive=True)
+        while self.klist.is_loading():
+            refresh_gui()
+        self.assertEqual(self.klist.get_selected(), persons[1])
+
+    def testAppendDuplicates(self):
+        # Like a non progressive append, the rows are always added
+        self.klist.add_list(persons)
+        self.klist.add_list(persons[:2], clear=False, progressive=True)
+        while self.klist.is_loading():
+            refresh_gui()
+        klist = ObjectList([Column('name'), Column('age')])
+        klist.add_list(persons)
+        klist.add_list(persons[:2], clear=False)
+        self.assertEqual(list(self.klist), list(klist))
+        self.assertEqual(len(self.klist), len(persons) + 2)
+
+    def testCancel(self):
+        instances = [Person('Name %d' % i, i) for i in range(100000)]
+        self.klist.add_list(instances, progressive=True)
+        self.assertTrue(self.klist.is_loading())
+        self.klist.clear()
+        self.assertFalse(self.klist.is_loading())
+        self.assertEqual(len(self.klist), 0)
+        refresh_gui()
+        self.assertEqual(len(self.klist), 0)
+
+
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.people = [Person('Name %d' % i, i) for i in range(500)]
+        self.klist = ObjectList([Column('name'),
+                                 Column('age', data_type=int)])
+        self.klist.add_list(self.people)
+        self.changed = []
+        self.klist.get_model().connect(
+            'row-changed',
+            lambda model, path, treeiter: self.changed.append(path[0]))
+
+    def testHidden(self):
+        # Nothing is displayed, so nothing is redrawn
+        self.klist.refresh()
+        self.assertEqual(self.changed, [])
+        self.klist.clear()
+        self.assertEqual(self.klist._dirty_rows, None)
+
+    def testVisibleRange(self):
+        win = Gtk.Window()
+        win.set_default_size(200, 200)
+        win.add(self.klist)
+        win.show_all()
+        refresh_gui()
+        self.klist.refresh()
+        self.assertTrue(0 < len(self.changed) < len(self.people))
+        self.assertEqual(self.changed, list(range(len(self.changed))))
+        win.destroy()
+
+    def testShownWithoutScrolling(self):
+        win = Gtk.Window()
+        win.set_default_size(200, 200)
+        win.add(self.klist)
+        win.show_all()
+        refresh_gui()
+        self.klist.refresh()
+        visible = len(self.changed)
+
+        # Removing rows above shows dirty rows at the bottom
+        for person in self.people[:5]:
+            self.klist.remove(person)
+        refresh_gui()
+        self.assertTrue(len(self.changed) > visible)
+
+        # So does making the list taller
+        visible = len(self.changed)
+        win.resize(200, 600)
+        refresh_gui()
+        self.assertTrue(len(self.changed) > visible)
+        win.destroy()
+
+    def testInstances(self):
+        self.klist.set_filter([RangeFilter('age', 0, 9)])
+        self.assertEqual(len(self.klist.get_treeview().get_model()), 10)
+        self.people[20].age = 5
+        self.klist.refresh(instances=[self.people[20]])
+        self.assertEqual(self.changed, [20])
+        self.assertEqual(len(self.klist.get_treeview().get_model()), 11)
+        self.assertRaises(ValueError, self.klist.refresh,
+                          instances=[Person('Other', 1)])
+
+    def testNative(self):
+        self.klist.set_native_columns(True)
+        model = self.klist.get_model()
+        model.connect('row-changed',
+                      lambda model, path, treeiter:
+                      self.changed.append(path[0]))
+        self.people[3].age = 1000
+        self.klist.refresh()
+        self.assertEqual(self.changed, [3])
+        self.assertTrue(1000 in list(model[3]))
+
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name'), Column('age')],
+                                mode=Gtk.SelectionMode.MULTIPLE)
+        self.klist.add_list(persons)
+        self.klist.add_index('age')
+
+    def testFindBy(self):
+        self.assertEqual(self.klist.find_by(age=25),
+                         [persons[1], persons[3]])
+        self.assertEqual(self.klist.find_by(age=25, name='Salgado'),
+                         [persons[3]])
+        self.assertEqual(self.klist.find_by(age=99), [])
+        # Not indexed
+        self.assertEqual(self.klist.find_by(name='Kiko'), [persons[2]])
+
+    def testChanges(self):
+        person = Person('Evandro', 25)
+        self.klist.append(person)
+        self.assertEqual(self.klist.find_by(age=25),
+                         [persons[1], persons[3], person])
+        person.age = 30
+        self.klist.update(person)
+        self.assertEqual(self.klist.find_by(age=30), [person])
+        self.klist.remove(person)
+        self.assertEqual(self.klist.find_by(age=30), [])
+        self.klist.clear()
+        self.assertEqual(self.klist.find_by(age=25), [])
+
+    def testSelectBy(self):
+        self.klist.select_by(age=25)
+        self.assertEqual(self.klist.get_selected_rows(),
+                         [persons[1], persons[3]])
+
+    def testIndexAndCount(self):
+        self.assertEqual(list(self.klist), list(persons))
+        self.assertEqual(self.klist.index(persons[2]), 2)
+        self.assertEqual(self.klist.index(persons[2], 1, 3), 2)
+        self.assertRaises(ValueError, self.klist.index, persons[2], 3)
+        self.assertEqual(self.klist.count(persons[2]), 1)
+        self.assertEqual(self.klist.count(Person('Kiko', 28)), 0)
+
+    def testCountEqual(self):
+        class Point(object):
+            def __init__(self, x):
+                self.x = x
+
+            def __eq__(self, other):
+                return getattr(other, 'x', None) == self.x
+
+            def __hash__(self):
+                return id(self)
+
+        klist = ObjectList([Column('x')])
+        klist.add_list([Point(1), Point(2), Point(1)])
+        # Equal but not identical
+        self.assertEqual(klist.count(Point(1)), 2)
+        # Unhashable
+        self.assertEqual(klist.count([]), 0)
+
+    def testRemoveMany(self):
+        self.klist.remove(persons[1])
+        self.assertEqual(self.klist.find_by(age=25), [persons[3]])
+        self.klist.remove(persons[3])
+        self.assertEqual(self.klist.find_by(age=25), [])
+
+
+class BulkSelectionTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name'), Column('age')],
+                                mode=Gtk.SelectionMode.MULTIPLE)
+        self.klist.add_list(persons)
+        self.emitted = []
+        self.klist.connect('selection-changed',
+                           lambda klist, selection:
+                           self.emitted.append(selection))
+
+    def testSelectRange(self):
+        self.klist.select_range(1, 3)
+        self.assertEqual(len(self.emitted), 1)
+        selection = self.emitted[0]
+        self.assertEqual(len(selection), 2)
+        self.assertTrue(persons[1] in selection)
+        self.assertFalse(persons[3] in selection)
+        self.assertEqual(selection, [persons[1], persons[2]])
+
+        self.klist.unselect_range(2, None)
+        self.assertEqual(self.klist.get_selected_rows(), [persons[1]])
+
+    def testSelectMany(self):
+        self.klist.select([persons[0], persons[4]])
+        self.assertEqual(len(self.emitted), 1)
+        self.assertEqual(self.klist.get_selected_rows(),
+                         [persons[0], persons[4]])
+        self.klist.unselect(set([persons[0]]))
+        self.assertEqual(self.klist.get_selected_rows(), [persons[4]])
+
+    def testSelectAllAndInvert(self):
+        self.klist.select_all()
+        self.assertEqual(len(self.klist.get_row_selection()), len(persons))
+        self.klist.unselect_range(1, 3)
+        self.klist.invert_selection()
+        self.assertEqual(self.klist.get_selected_rows(),
+                         [persons[1], persons[2]])
+        self.assertEqual(len(self.emitted), 3)
+
+    def testSelectOne(self):
+        self.klist.select_range(0, 2)
+        # A single instance gets the cursor, the other rows are unselected
+        self.klist.select(persons[3])
+        self.assertEqual(self.klist.get_selected_rows(), [persons[3]])
+        self.assertEqual(len(self.emitted), 2)
+
+    def testUnchanged(self):
+        self.klist.select([persons[0], persons[1]])
+        self.klist.select([persons[1], persons[0]])
+        self.klist.unselect_range(3, None)
+        self.assertEqual(len(self.emitted), 1)
+
+    def testSingleMode(self):
+        self.klist.set_selection_mode(Gtk.SelectionMode.SINGLE)
+        self.assertRaises(TypeError, self.klist.select_range, 0, 2)
+
+
+class AutosizeTest(unittest.TestCase):
+    def testSampled(self):
+        klist = ObjectList([Column('name'), Column('age', data_type=int),
+                            Column('name', title='Fixed', width=50)])
+        klist.append(Person('Kiko', 28))
+        name, age, fixed = [column.treeview_column
+                            for column in klist.get_columns()]
+        self.assertEqual(name.get_sizing(), Gtk.TreeViewColumnSizing.FIXED)
+        width = name.get_fixed_width()
+        self.assertTrue(width > 0)
+
+        # Still estimating while there are few rows
+        klist.append(Person('A much longer name than Kiko', 28))
+        self.assertTrue(name.get_fixed_width() > width)
+        self.assertEqual(fixed.get_fixed_width(), 50)
+
+    def testLoad(self):
+        klist = ObjectList([Column('name'), Column('age', data_type=int)])
+        klist.add_list(persons)
+        self.assertFalse(klist._autosize)
+        column = klist.get_columns()[0].treeview_column
+        width = column.get_fixed_width()
+        klist.append(Person('A much longer name than all the others', 28))
+        self.assertEqual(column.get_fixed_width(), width)
+
+    def testProgressiveLoad(self):
+        # Loaded in the first chunk
+        klist = ObjectList([Column('name'), Column('age', data_type=int)])
+        klist.add_list(persons, progressive=True)
+        self.assertFalse(klist.is_loading())
+        self.assertFalse(klist._autosize)
+        column = klist.get_columns()[0].treeview_column
+        self.assertEqual(column.get_sizing(), Gtk.TreeViewColumnSizing.FIXED)
+        self.assertTrue(column.get_fixed_width() > 0)
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name', title='Name'),
+                                 Column('age', data_type=int,
+                                        format_func=lambda age: '%d y' % age),
+                                 Column('hidden', visible=False)],
+                                sortable=True)
+        self.klist.add_list(persons)
+        self.progress = []
+        self.klist.connect('export-progress',
+                           lambda klist, rows, done:
+                           self.progress.append((rows, done)))
+
+    def testExport(self):
+        self.klist.sort_by_attribute('age')
+        self.klist.set_filter([RangeFilter('age', 25)])
+        fileobj = io.StringIO()
+        self.klist.export(fileobj, dialect='excel-tab', threaded=False)
+        self.assertEqual(fileobj.getvalue().splitlines(),
+                         ['Name\tAge',
+                          'Gustavo\t25 y',
+                          'Salgado\t25 y',
+                          'Lorenzo\t26 y',
+                          'Kiko\t28 y'])
+        self.assertEqual(self.progress[-1], (4, True))
+
+    def testThreaded(self):
+        fileobj = io.StringIO()
+        self.klist.export(fileobj, header=False)
+        self.assertTrue(self.klist.is_exporting())
+        while self.klist.is_exporting():
+            refresh_gui()
+        self.assertEqual(len(fileobj.getvalue().splitlines()), len(persons))
+        self.assertEqual(self.progress[-1], (len(persons), True))
+
+    def testCellContents(self):
+        self.assertEqual(list(self.klist.get_cell_contents()),
+                         [[person.name, person.age] for person in persons])
+        self.assertEqual(list(self.klist.get_cell_contents(persons[:1])),
+                         [['Johan', 24]])
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.klist = ObjectList([Column('name'), Column('age')])
+        self.people = [Person('Name %d' % i, i) for i in range(5)]
+        self.klist.add_list(self.people)
+        self.has_rows = []
+        self.klist.connect('has-rows',
+                           lambda klist, value: self.has_rows.append(value))
+
+    def testApplyOnExit(self):
+        new = Person('New', 10)
+        with self.klist.batch():
+            self.klist.append(new)
+            self.klist.remove(self.people[0])
+            self.assertEqual(list(self.klist), self.people)
+        self.assertEqual(list(self.klist), self.people[1:] + [new])
+
+    def testCollapse(self):
+        new = Person('New', 10)
+        with self.klist.batch():
+            self.klist.append(new)
+            self.klist.update(new)
+            self.klist.remove(new)
+            self.klist.remove(self.people[0])
+            self.klist.append(self.people[0])
+            self.assertRaises(ValueError, self.klist.update, new)
+        self.assertEqual(list(self.klist), self.people[1:] + self.people[:1])
+
+    def testHasRows(self):
+        with self.klist.batch():
+            for person in self.people:
+                self.klist.remove(person)
+            self.klist.append(self.people[0])
+            self.klist.remove(self.people[0])
+        self.assertEqual(len(self.klist), 0)
+        self.assertEqual(self.has_rows, [False])
+
+    def testNested(self):
+        with self.klist.batch():
+            with self.klist.batch():
+                self.klist.remove(self.people[0])
+            self.assertEqual(len(self.klist), 5)
+        self.assertEqual(len(self.klist), 4)
+
+
 if __name__ == '__main__':
     unittest.main()
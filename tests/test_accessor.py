@@ -0,0 +1,151 @@
+import unittest
+import warnings
+
+from kiwi.accessor import (kgetattr, kgetattr_many, ksetattr,
+                           clear_attr_cache, DefaultValue, _kgetattr_cache)
+
+
+class Person(object):
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.age = None
+
+    @property
+    def title(self):
+        return self.name.title()
+
+    def set_age(self, age):
+        self.age = age + 1
+
+
+class Forwarder(object):
+    def __init__(self, target):
+        self.target = target
+
+    def get_getter(self, name, cache):
+        if name == 'unknown':
+            raise DefaultValue
+        return (self.target, name)
+
+
+class Redirector(object):
+    """Redirects to another attribute depending on the instance"""
+
+    def __init__(self, first):
+        self.first = first
+        self.a = 'A'
+        self.b = 'B'
+
+    def get_getter(self, name, cache):
+        if self.first:
+            return (self, 'a')
+        return (self, 'b')
+
+    def get_setter(self, name, cache):
+        return self.get_getter(name, cache)
+
+
+class BoundRedirector(Redirector):
+    """Returns a different method bound to the instance depending on it"""
+
+    def get_a(self):
+        return self.a
+
+    def get_b(self):
+        return self.b
+
+    def set_a(self, value):
+        self.a = value
+
+    def set_b(self, value):
+        self.b = value
+
+    def get_getter(self, name, cache):
+        if self.first:
+            return self.get_a
+        return self.get_b
+
+    def get_setter(self, name, cache):
+        if self.first:
+            return self.set_a
+        return self.set_b
+
+
+class AccessorTest(unittest.TestCase):
+    def setUp(self):
+        clear_attr_cache()
+        warnings.simplefilter('ignore', DeprecationWarning)
+
+    def tearDown(self):
+        warnings.resetwarnings()
+
+    def testGet(self):
+        person = Person('johan', Person('kiko'))
+        self.assertEqual(kgetattr(person, 'name'), 'johan')
+        self.assertEqual(kgetattr(person, 'title'), 'Johan')
+        self.assertEqual(kgetattr(person, 'parent.name'), 'kiko')
+        self.assertEqual(kgetattr(person, 'missing', None), None)
+        self.assertEqual(kgetattr(person, 'parent.parent.name', 'x'), 'x')
+        self.assertRaises(AttributeError, kgetattr, person, 'missing')
+
+    def testSet(self):
+        person = Person('johan', Person('kiko'))
+        ksetattr(person, 'parent.name', 'christian')
+        self.assertEqual(person.parent.name, 'christian')
+        ksetattr(person, 'age', 30)
+        self.assertEqual(person.age, 31)
+
+    def testCachedPerClass(self):
+        for i in range(100):
+            kgetattr(Person(str(i)), 'name')
+        self.assertEqual(list(_kgetattr_cache), [Person])
+        self.assertEqual(list(_kgetattr_cache[Person]), ['name'])
+
+    def testGetGetter(self):
+        first = Forwarder(Person('johan'))
+        second = Forwarder(Person('kiko'))
+        self.assertEqual(kgetattr(first, 'name'), 'johan')
+        self.assertEqual(kgetattr(second, 'name'), 'kiko')
+        self.assertEqual(kgetattr(first, 'unknown', None), None)
+        self.assertRaises(DefaultValue, kgetattr, first, 'unknown')
+
+    def testGetMany(self):
+        kiko = Person('kiko')
+        people = [Person('johan', kiko), Forwarder(Person('christian')),
+                  Person('henrique')]
+        people[2].age = 3
+        self.assertEqual(kgetattr_many(people, 'name'),
+                         ['johan', 'christian', 'henrique'])
+        self.assertEqual(kgetattr_many(people, ['title', 'parent.name'],
+                                       None),
+                         [['Johan', 'Christian', 'Henrique'],
+                          ['kiko', None, None]])
+        self.assertEqual(kgetattr_many(people, 'unknown', 'x'),
+                         ['x', 'x', 'x'])
+        self.assertRaises(AttributeError, kgetattr_many, people, 'missing')
+        self.assertEqual(list(kgetattr_many([people[2]], 'age',
+                                            typecode='d')), [3.0])
+
+    def testGetGetterPerInstance(self):
+        self.assertEqual([kgetattr(Redirector(True), 'name'),
+                          kgetattr(Redirector(False), 'name')], ['A', 'B'])
+        self.assertEqual([kgetattr(BoundRedirector(True), 'name'),
+                          kgetattr(BoundRedirector(False), 'name')],
+                         ['A', 'B'])
+        self.assertEqual(
+            kgetattr_many([Redirector(True), Redirector(False)], 'name'),
+            ['A', 'B'])
+
+    def testGetSetterPerInstance(self):
+        for cls in [Redirector, BoundRedirector]:
+            first = cls(True)
+            second = cls(False)
+            ksetattr(first, 'name', 'x')
+            ksetattr(second, 'name', 'y')
+            self.assertEqual((first.a, first.b), ('x', 'B'))
+            self.assertEqual((second.a, second.b), ('A', 'y'))
+
+
+if __name__ == '__main__':
+    unittest.main()
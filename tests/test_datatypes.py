@@ -7,8 +7,9 @@ import unittest
 
 import mock
 from kiwi.datatypes import (converter, ValidationError, ValueUnset,
-                            BaseConverter)
-from kiwi.currency import currency
+                            BaseConverter, get_locale_snapshot,
+                            locale_changed)
+from kiwi.currency import currency, get_currency_formatter
 from kiwi.python import enum
 
 # pixbuf converter
@@ -48,6 +49,39 @@ class RegistryTest(unittest.TestCase):
         self.assertRaises(ValueError, converter.add, FakeConverter)
         converter.remove(FakeConverter)
         self.assertRaises(KeyError, converter.remove, FakeConverter)
+        self.assertRaises(KeyError, converter.get_converter, 'fake')
+
+    def testSubclass(self):
+        class MyDecimal(decimal.Decimal):
+            pass
+
+        conv = converter.get_converter(MyDecimal)
+        self.assertTrue(conv is converter.get_converter(decimal.Decimal))
+        self.assertTrue(converter.get_converter(currency) is not conv)
+        self.assertEqual(converter.check_supported(MyDecimal),
+                         decimal.Decimal)
+        self.assertRaises(KeyError, converter.get_converter, fake)
+
+    def testMany(self):
+        values, errors = converter.from_string_many(
+            int, ['1', '', 'x', '2.5'])
+        self.assertEqual(values, [1, ValueUnset, None, None])
+        self.assertEqual([index for index, error in errors], [2, 3])
+        values, errors = converter.from_string_many(float, ['1.5', '1.2.3'])
+        self.assertEqual(values, [1.5, None])
+        self.assertEqual([index for index, error in errors], [1])
+        self.assertEqual(converter.as_string_many(float, [1.0, 2.5]),
+                         (['1.0', '2.5'], []))
+        strings, errors = converter.as_string_many(int, [1, None, 'x', 3])
+        self.assertEqual(strings, ['1', None, None, '3'])
+        self.assertEqual([index for index, error in errors], [1, 2])
+        self.assertTrue(all(isinstance(error, ValidationError)
+                            for index, error in errors))
+        for data_type in [int, float, currency]:
+            conv = converter.get_converter(data_type)
+            strings, errors = conv.as_string_many([data_type(1), None])
+            self.assertEqual(strings[1], None)
+            self.assertEqual([index for index, error in errors], [1])
 
     def testGetConverters(self):
         converters = converter.get_converters((decimal.Decimal,))
@@ -267,6 +301,19 @@ class DateTest(unittest.TestCase):
         self.assertRaises(ValidationError, self.conv.as_string,
                           datetime.date(1899, 1, 1))
 
+    def testMany(self):
+        # Like the registry, None is reported
+        strings, errors = self.conv.as_string_many([self.date, None])
+        self.assertEqual(strings, ['02/12/79', None])
+        self.assertEqual([index for index, error in errors], [1])
+        self.assertEqual(self.conv.from_string_many(['02/12/79', '2/1/79',
+                                                     '']),
+                         ([self.date, datetime.date(1979, 2, 1), None], []))
+        values, errors = self.conv.from_string_many(['02/30/79', '02/12/79'])
+        self.assertEqual(values, [None, self.date])
+        self.assertEqual([index for index, error in errors], [0])
+        self.assertTrue(isinstance(errors[0][1], ValidationError))
+
 
 class CurrencyTest(unittest.TestCase):
     def setUp(self):
@@ -289,6 +336,16 @@ class CurrencyTest(unittest.TestCase):
         self.assertEqual(currency('1.996').format(), '$2')
         self.assertEqual(currency('1.996').format(), '$2')
 
+    def testFormatter(self):
+        formatter = get_currency_formatter()
+        self.assertTrue(get_currency_formatter() is formatter)
+        self.assertEqual(formatter.format_many([currency('1234567.5'),
+                                                decimal.Decimal('-0.05'),
+                                                0]),
+                         ['$1234567.50', '$ -0.05', '$ 0'])
+        self.assertEqual(get_currency_formatter(False, 2).format(1),
+                         '1.00')
+
     def testFormatBR(self):
         if not set_locale(locale.LC_ALL, 'pt_BR'):
             return
@@ -576,5 +633,29 @@ class EnumTest(unittest.TestCase):
         self.assertRaises(ValidationError, conv.from_string, 'FOO')
         self.assertRaises(ValidationError, conv.as_string, object())
 
+
+class LocaleSnapshotTest(unittest.TestCase):
+    def tearDown(self):
+        set_locale(locale.LC_ALL, 'C')
+
+    def testCached(self):
+        set_locale(locale.LC_ALL, 'C')
+        snapshot = get_locale_snapshot()
+        self.assertTrue(get_locale_snapshot() is snapshot)
+        self.assertEqual(snapshot.decimal_point, '.')
+        # The snapshot of a locale is reused
+        locale.setlocale(locale.LC_ALL, locale='C')
+        self.assertTrue(get_locale_snapshot() is snapshot)
+        locale_changed()
+        self.assertFalse(get_locale_snapshot() is snapshot)
+
+    def testSetLocale(self):
+        set_locale(locale.LC_ALL, 'C')
+        self.assertEqual(converter.from_string(float, '1.5'), 1.5)
+        if not set_locale(locale.LC_NUMERIC, 'pt_BR'):
+            return
+        self.assertEqual(get_locale_snapshot().decimal_point, ',')
+        self.assertEqual(converter.from_string(float, '1.234,5'), 1234.5)
+
 if __name__ == "__main__":
     unittest.main()